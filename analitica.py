@@ -0,0 +1,137 @@
+"""
+Analítica de ocupación con NumPy: un cubo booleano entidad × día × bloque
+(salas o docentes, DIAS_SEMANA, BLOQUES_HORARIOS) armado desde
+modulo_horarios con una consulta (una sola para salas y docentes). Las reducciones (uso por entidad y por
+día, mapa de calor, horas punta, rankings, entidades ociosas) son
+operaciones vectorizadas sobre el cubo.
+"""
+
+import time
+import logging
+
+import numpy as np
+
+from modelos import Slot, DIAS_SEMANA, BLOQUES_HORARIOS, DURACION_BLOQUE, a_minutos
+
+_INICIOS = np.array([a_minutos(b) for b in BLOQUES_HORARIOS])
+_DIA_INDICE = {dia: i for i, dia in enumerate(DIAS_SEMANA)}
+
+# tipo -> (columna de modulos, método del DAO con el catálogo)
+_ENTIDADES = {
+    'sala': ('sala_id', 'obtener_salas'),
+    'docente': ('docente_id', 'obtener_docentes'),
+}
+
+
+class CuboOcupacion:
+    """
+    cubo[e, d, b] es True si la entidad `entidades[e]` tiene clases el día
+    DIAS_SEMANA[d] en el bloque BLOQUES_HORARIOS[b]. Crear con
+    CuboOcupacion.cargar(dao, 'sala' | 'docente') o, para ambos tipos con una
+    sola consulta, CuboOcupacion.cargar_varios(dao).
+    """
+
+    def __init__(self, tipo, entidades, horarios):
+        """
+        `entidades`: filas del catálogo (con 'id'), también las que no tienen
+        clases. `horarios`: filas con la columna del tipo (sala_id o docente_id)
+        y dia/minuto_inicio/minuto_fin.
+        """
+        columna = _ENTIDADES[tipo][0]
+        self.tipo = tipo
+        self.entidades = tuple(entidades)
+        posicion = {e['id']: i for i, e in enumerate(self.entidades)}
+
+        filas_e, filas_d, inicios, fines = [], [], [], []
+        for horario in horarios:
+            slot = Slot.desde_fila(horario)
+            e, d = posicion.get(horario[columna]), _DIA_INDICE.get(slot.dia)
+            if e is None or d is None:
+                continue
+            filas_e.append(e)
+            filas_d.append(d)
+            inicios.append(slot.inicio)
+            fines.append(slot.fin)
+
+        inicios, fines = np.array(inicios, dtype=int), np.array(fines, dtype=int)
+        # Bloques que toca cada horario (filas × bloques), como mascara_rango
+        toca = (_INICIOS < fines[:, None]) & (inicios[:, None] < _INICIOS + DURACION_BLOQUE)
+        self.cubo = np.zeros((len(self.entidades), len(DIAS_SEMANA), len(BLOQUES_HORARIOS)), dtype=bool)
+        np.logical_or.at(self.cubo, (np.array(filas_e, dtype=int), np.array(filas_d, dtype=int)), toca)
+
+    @classmethod
+    def cargar(cls, dao, tipo='sala'):
+        """Cubo de salas o docentes: catálogo (en caché) más una consulta de horarios"""
+        return cls.cargar_varios(dao, (tipo,))[tipo]
+
+    @classmethod
+    def cargar_varios(cls, dao, tipos=('sala', 'docente')):
+        """{tipo: cubo} con los catálogos (en caché) y una sola consulta de horarios para todos"""
+        inicio = time.perf_counter()
+        columnas = [_ENTIDADES[tipo][0] for tipo in tipos]
+        query = f"""SELECT {', '.join(f'm.{c}' for c in columnas)}, mh.dia, mh.hora_inicio, mh.hora_fin,
+                           mh.minuto_inicio, mh.minuto_fin
+                    FROM modulo_horarios mh
+                    JOIN modulos m ON mh.modulo_id = m.id
+                    WHERE {' OR '.join(f'm.{c} IS NOT NULL' for c in columnas)}"""
+        horarios = dao.db.execute_query(query, fetch=True) or []
+        cubos = {tipo: cls(tipo, getattr(dao, _ENTIDADES[tipo][1])(), horarios) for tipo in tipos}
+        logging.info(f"Cubos de ocupación ({', '.join(tipos)}) armados en "
+                     f"{(time.perf_counter() - inicio) * 1000:.0f} ms: "
+                     + ', '.join(f"{c.cubo.shape[0]} {t}s" for t, c in cubos.items()))
+        return cubos
+
+    # --- Reducciones ---
+
+    def utilizacion(self):
+        """% de bloques de la semana con clases, por entidad"""
+        return self.cubo.mean(axis=(1, 2)) * 100
+
+    def utilizacion_por_dia(self):
+        """% de bloques con clases por entidad y día (entidades × días)"""
+        return self.cubo.mean(axis=2) * 100
+
+    def utilizacion_promedio(self):
+        """% de bloques usados sobre todas las entidades"""
+        return float(self.cubo.mean() * 100) if self.cubo.size else 0.0
+
+    def mapa_calor(self, porcentaje=False):
+        """Entidades ocupadas por día y bloque (días × bloques), o su % del total"""
+        ocupadas = self.cubo.sum(axis=0)
+        if porcentaje:
+            return ocupadas / max(len(self.entidades), 1) * 100
+        return ocupadas
+
+    def horas_punta(self, n=5):
+        """[(dia, bloque, entidades ocupadas)] de los `n` bloques más usados de la semana"""
+        mapa = self.mapa_calor()
+        orden = np.argsort(mapa, axis=None, kind='stable')[::-1][:n]
+        return [(DIAS_SEMANA[d], BLOQUES_HORARIOS[b], int(mapa[d, b]))
+                for d, b in zip(*np.unravel_index(orden, mapa.shape)) if mapa[d, b]]
+
+    def ranking(self, n=10, menos_usadas=False):
+        """[(entidad, %)] de las `n` entidades más (o menos) usadas"""
+        uso = self.utilizacion()
+        orden = np.argsort(uso, kind='stable')
+        if not menos_usadas:
+            orden = orden[::-1]
+        return [(self.entidades[i], float(uso[i])) for i in orden[:n]]
+
+    def ociosas(self, umbral=10.0):
+        """
+        [(entidad, %)] con uso menor o igual a `umbral`%, las menos usadas
+        primero y, a igual uso, las de mayor capacidad (salas)
+        """
+        uso = self.utilizacion()
+        ociosas = [(self.entidades[i], float(uso[i])) for i in np.flatnonzero(uso <= umbral)]
+        ociosas.sort(key=lambda par: (par[1], -(par[0].get('capacidad') or 0)))
+        return ociosas
+
+    def resumen(self, umbral_ociosas=10.0):
+        """Indicadores para el dashboard: uso promedio, hora punta y cantidad de ociosas"""
+        punta = self.horas_punta(1)
+        return {
+            'uso_promedio': self.utilizacion_promedio(),
+            'hora_punta': punta[0] if punta else None,
+            'ociosas': len(self.ociosas(umbral_ociosas)),
+        }
@@ -0,0 +1,130 @@
+"""
+Índice de búsqueda en memoria por trigramas, insensible a tildes y mayúsculas,
+para nombres de docentes, carreras, salas y módulos (nombre y código).
+"""
+
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+_RE_NO_ALFANUM = re.compile(r"[^0-9a-z]+")
+
+# Consultas normalizadas más cortas sólo tienen trigramas de inicio de palabra
+# (no encuentran 'ez' en 'martinez'); para ellas conviene buscar por subcadena
+LARGO_MINIMO_INDICE = 3
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni signos: 'Martínez-Ñuñoa' -> 'martinez nunoa'"""
+    if not texto:
+        return ""
+    sin_tildes = ''.join(c for c in unicodedata.normalize('NFD', str(texto))
+                         if unicodedata.category(c) != 'Mn')
+    return _RE_NO_ALFANUM.sub(' ', sin_tildes.lower()).strip()
+
+
+def _trigramas_texto(normalizado):
+    """Trigramas de cada palabra, con relleno al inicio y al final ('  ab', 'bc ')"""
+    trigramas = set()
+    for palabra in normalizado.split():
+        relleno = f"  {palabra} "
+        trigramas.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return trigramas
+
+
+def _trigramas_consulta(normalizado):
+    """
+    Trigramas internos de cada palabra de la consulta; las palabras de menos
+    de 3 letras usan los de inicio de palabra (búsqueda por prefijo). Así,
+    si la consulta aparece tal cual en un texto, comparte todos sus trigramas.
+    """
+    trigramas = set()
+    for palabra in normalizado.split():
+        if len(palabra) >= 3:
+            trigramas.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+        else:
+            relleno = f"  {palabra}"
+            trigramas.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return trigramas
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido trigrama -> claves. Las claves son (tipo, id), p. ej.
+    ('docente', 7). Seguro entre hilos; admite altas, cambios y bajas sueltas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._textos = {}      # clave -> texto normalizado
+        self._trigramas = {}   # clave -> trigramas del texto
+        self._postings = {}    # trigrama -> set de claves
+
+    def __len__(self):
+        return len(self._textos)
+
+    def agregar(self, tipo, id_, *textos):
+        """Indexa (o reindexa) la entidad con la concatenación de `textos` (nombre, código...)"""
+        clave = (tipo, id_)
+        normalizado = normalizar(' '.join(str(t) for t in textos if t))
+        trigramas = _trigramas_texto(normalizado)
+        with self._lock:
+            self._quitar(clave)
+            self._textos[clave] = normalizado
+            self._trigramas[clave] = trigramas
+            for trigrama in trigramas:
+                self._postings.setdefault(trigrama, set()).add(clave)
+
+    def eliminar(self, tipo, id_):
+        with self._lock:
+            self._quitar((tipo, id_))
+
+    def _quitar(self, clave):
+        for trigrama in self._trigramas.pop(clave, ()):
+            claves = self._postings.get(trigrama)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._postings[trigrama]
+        self._textos.pop(clave, None)
+
+    def buscar(self, consulta, tipo=None, limite=20, umbral=0.6):
+        """
+        Coincidencias ordenadas de mejor a peor como [(puntaje, id)] si se da
+        `tipo`, o [(puntaje, (tipo, id))] si no.
+
+        Puntaje 1.0 si la consulta normalizada aparece en el texto; si no, la
+        fracción de trigramas de la consulta presentes en él (tolera errores
+        de tipeo). Se descartan las menores a `umbral`. `limite=None` no corta.
+        """
+        q = normalizar(consulta)
+        trigramas_q = _trigramas_consulta(q)
+        if not trigramas_q:
+            return []
+        necesarios = len(trigramas_q)
+
+        with self._lock:
+            conteo = Counter()
+            for trigrama in trigramas_q:
+                conteo.update(self._postings.get(trigrama, ()))
+            candidatos = [
+                (clave, comunes, self._textos[clave]) for clave, comunes in conteo.items()
+                if (tipo is None or clave[0] == tipo) and comunes / necesarios >= umbral
+            ]
+
+        resultados = []
+        for clave, comunes, texto in candidatos:
+            if q in texto:
+                puntaje = 1.0
+                prefijo = texto.startswith(q) or f" {q}" in texto
+            else:
+                puntaje = comunes / necesarios
+                prefijo = False
+            resultados.append((puntaje, prefijo, -len(texto), clave))
+        resultados.sort(reverse=True)
+        if limite is not None:
+            resultados = resultados[:limite]
+        if tipo is not None:
+            return [(puntaje, clave[1]) for puntaje, _, _, clave in resultados]
+        return [(puntaje, clave) for puntaje, _, _, clave in resultados]
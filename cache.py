@@ -0,0 +1,97 @@
+"""
+Caché en memoria con expiración (TTL) y desalojo LRU, usada por SistemaDAO
+para los catálogos (salas, docentes, carreras y sus relaciones).
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Caché clave -> valor, segura entre hilos.
+
+    Las claves son tuplas cuyo primer elemento es la tabla de origen, así
+    invalidar('salas') descarta ('salas',) y también ('salas', 3).
+    Cada entrada vence `ttl` segundos después de cargarse; al superar
+    `max_entradas` se desaloja la usada hace más tiempo.
+    """
+
+    def __init__(self, ttl=30, max_entradas=256, reloj=time.monotonic):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()  # clave -> (vence, valor)
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expiradas = 0
+        self.desalojadas = 0
+        self.invalidadas = 0
+
+    @property
+    def activa(self):
+        return self.ttl > 0 and self.max_entradas > 0
+
+    def obtener(self, clave, cargar):
+        """Valor en caché para `clave`, o `cargar()` (que se guarda) si no está o venció"""
+        if not self.activa:
+            return cargar()
+        ahora = self._reloj()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                if entrada[0] > ahora:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[1]
+                del self._datos[clave]
+                self.expiradas += 1
+            self.fallos += 1
+            generacion = self._generacion
+
+        # La carga va fuera del lock para no bloquear a otros lectores
+        valor = cargar()
+
+        with self._lock:
+            # Si hubo una invalidación mientras se cargaba, el valor puede ser viejo
+            if generacion == self._generacion:
+                self._datos[clave] = (self._reloj() + self.ttl, valor)
+                self._datos.move_to_end(clave)
+                while len(self._datos) > self.max_entradas:
+                    self._datos.popitem(last=False)
+                    self.desalojadas += 1
+        return valor
+
+    def invalidar(self, *tablas):
+        """Descarta las entradas de las tablas dadas (o todas si no se indica ninguna)"""
+        with self._lock:
+            self._generacion += 1
+            if not tablas:
+                self.invalidadas += len(self._datos)
+                self._datos.clear()
+                return
+            for clave in [c for c in self._datos if c[0] in tablas]:
+                del self._datos[clave]
+                self.invalidadas += 1
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+                'expiradas': self.expiradas,
+                'desalojadas': self.desalojadas,
+                'invalidadas': self.invalidadas,
+                'ttl': self.ttl,
+                'max_entradas': self.max_entradas,
+            }
+
+    def reset_estadisticas(self):
+        with self._lock:
+            self.aciertos = self.fallos = self.expiradas = self.desalojadas = self.invalidadas = 0
@@ -10,9 +10,10 @@ from typing import Optional, Dict, List
 import os
 from dotenv import load_dotenv
 
-import unicodedata
 import difflib
 
+from busqueda import normalizar
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -136,12 +137,10 @@ Haz clic en los links para navegar a cada sección."
     
     def normalize_text(self, text: str) -> str:
         """Normaliza el texto eliminando tildes y convirtiendo a minúsculas"""
-        if not text:
-            return ""
-        return ''.join(c for c in unicodedata.normalize('NFD', text)
-                      if unicodedata.category(c) != 'Mn').lower()
+        return normalizar(text)
 
-    def fuzzy_search(self, query: str, items: List[Dict], key_field: str, threshold: float = 0.6) -> List[Dict]:
+    def fuzzy_search(self, query: str, items: List[Dict], key_field: str, threshold: float = 0.6,
+                     tipo: Optional[str] = None) -> List[Dict]:
         """
         Realiza una búsqueda difusa en una lista de diccionarios.
         
@@ -150,12 +149,21 @@ Haz clic en los links para navegar a cada sección."
             items: Lista de items (diccionarios)
             key_field: Campo del diccionario donde buscar (ej: 'nombre')
             threshold: Umbral de similitud (0.0 a 1.0)
+            tipo: 'docente', 'carrera', 'sala' o 'modulo'; si se indica y se
+                busca por nombre, se usa el índice de búsqueda del DAO
             
         Returns:
             Lista de items que coinciden
         """
         if not query:
             return items
+
+        if tipo and key_field == 'nombre':
+            # Índice de trigramas: sin recorrer ni comparar cada item
+            por_id = {item['id']: item for item in items}
+            return [por_id[id_] for _, id_ in
+                    self.dao.buscar_texto(query, tipo=tipo, limite=None, umbral=threshold)
+                    if id_ in por_id]
             
         query_norm = self.normalize_text(query)
         matches = []
@@ -184,16 +192,18 @@ Haz clic en los links para navegar a cada sección."
             docentes = self.dao.obtener_docentes()
             
             if nombre:
-                docentes = self.fuzzy_search(nombre, docentes, 'nombre')
+                docentes = self.fuzzy_search(nombre, docentes, 'nombre', tipo='docente')
             
             if not docentes:
                 return f"No se encontraron docentes similares a '{nombre}'"
             
             resultado = f"Encontré {len(docentes)} docente(s) para '{nombre}':\n\n"
+            carga_docentes = self.dao.obtener_carga_docentes()
             for d in docentes[:10]:  # Limitar a 10 resultados
-                horas_asignadas = self.dao.obtener_horas_asignadas_docente(d['id'])
+                carga = carga_docentes.get(d['id'], {})
+                horas_asignadas = carga.get('horas_asignadas', 0)
                 horas_contratadas = d.get('horas_contratadas', 0)
-                porcentaje = (horas_asignadas / horas_contratadas * 100) if horas_contratadas > 0 else 0
+                porcentaje = carga.get('porcentaje', 0)
                 
                 # Usar link markdown
                 resultado += f"• [{d['nombre']}](docente://{d['id']})\n"
@@ -209,17 +219,18 @@ Haz clic en los links para navegar a cada sección."
     def buscar_carreras(self, nombre: str = "") -> str:
         """Busca carreras por nombre usando búsqueda difusa"""
         try:
-            carreras = self.dao.obtener_carreras()
+            snapshot = self.dao.obtener_snapshot()
+            carreras = snapshot.carreras
             
             if nombre:
-                carreras = self.fuzzy_search(nombre, carreras, 'nombre')
+                carreras = self.fuzzy_search(nombre, carreras, 'nombre', tipo='carrera')
             
             if not carreras:
                 return f"No se encontraron carreras similares a '{nombre}'"
             
             resultado = f"Encontré {len(carreras)} carrera(s):\n\n"
             for c in carreras:
-                modulos = self.dao.obtener_modulos_carrera(c['id'])
+                modulos = snapshot.modulos_carrera(c['id'])
                 resultado += f"• {c['nombre']}\n"
                 resultado += f"  - Jornada: {c.get('jornada', 'N/A')}\n"
                 resultado += f"  - Alumnos proyectados: {c.get('alumnos_proyectados', 0)}\n"
@@ -234,17 +245,15 @@ Haz clic en los links para navegar a cada sección."
     def buscar_modulos(self, nombre: str = "", carrera_id: int = None) -> str:
         """Busca módulos por nombre y/o carrera usando búsqueda difusa"""
         try:
+            snapshot = self.dao.obtener_snapshot()
             if carrera_id:
-                modulos = self.dao.obtener_modulos_carrera(carrera_id)
+                modulos = snapshot.modulos_carrera(carrera_id)
             else:
-                # Obtener todos los módulos de todas las carreras
-                carreras = self.dao.obtener_carreras()
-                modulos = []
-                for c in carreras:
-                    modulos.extend(self.dao.obtener_modulos_carrera(c['id']))
+                # Todos los módulos que pertenecen a alguna carrera
+                modulos = [m for m in snapshot.modulos if m['carrera_id'] in snapshot.carrera_por_id]
             
             if nombre:
-                modulos = self.fuzzy_search(nombre, modulos, 'nombre')
+                modulos = self.fuzzy_search(nombre, modulos, 'nombre', tipo='modulo')
             
             if not modulos:
                 return "No se encontraron módulos con esos criterios"
@@ -267,7 +276,7 @@ Haz clic en los links para navegar a cada sección."
             salas = self.dao.obtener_salas()
             
             if nombre:
-                salas = self.fuzzy_search(nombre, salas, 'nombre')
+                salas = self.fuzzy_search(nombre, salas, 'nombre', tipo='sala')
             
             if not salas:
                 return f"No se encontraron salas similares a '{nombre}'"
@@ -288,8 +297,8 @@ Haz clic en los links para navegar a cada sección."
         """Obtiene los docentes que imparten en una carrera específica"""
         try:
             # Buscar la carrera
-            carreras = self.dao.obtener_carreras()
-            carreras_match = self.fuzzy_search(nombre_carrera, carreras, 'nombre')
+            snapshot = self.dao.obtener_snapshot()
+            carreras_match = self.fuzzy_search(nombre_carrera, snapshot.carreras, 'nombre', tipo='carrera')
             
             if not carreras_match:
                 return f"No se encontró la carrera '{nombre_carrera}'"
@@ -297,7 +306,7 @@ Haz clic en los links para navegar a cada sección."
             carrera = carreras_match[0]
             
             # Obtener módulos de la carrera
-            modulos = self.dao.obtener_modulos_carrera(carrera['id'])
+            modulos = snapshot.modulos_carrera(carrera['id'])
             
             if not modulos:
                 return f"La carrera '{carrera['nombre']}' no tiene módulos asignados"
@@ -339,8 +348,8 @@ Haz clic en los links para navegar a cada sección."
         """Obtiene los módulos de una carrera con información detallada"""
         try:
             # Buscar la carrera
-            carreras = self.dao.obtener_carreras()
-            carreras_match = self.fuzzy_search(nombre_carrera, carreras, 'nombre')
+            snapshot = self.dao.obtener_snapshot()
+            carreras_match = self.fuzzy_search(nombre_carrera, snapshot.carreras, 'nombre', tipo='carrera')
             
             if not carreras_match:
                 return f"No se encontró la carrera '{nombre_carrera}'"
@@ -348,7 +357,7 @@ Haz clic en los links para navegar a cada sección."
             carrera = carreras_match[0]
             
             # Obtener módulos de la carrera
-            modulos = self.dao.obtener_modulos_carrera(carrera['id'])
+            modulos = snapshot.modulos_carrera(carrera['id'])
             
             if not modulos:
                 return f"La carrera '{carrera['nombre']}' no tiene módulos registrados"
@@ -380,14 +389,14 @@ Haz clic en los links para navegar a cada sección."
     def obtener_info_docente(self, docente_id: int) -> str:
         """Obtiene información detallada de un docente"""
         try:
-            docentes = self.dao.obtener_docentes()
-            docente = next((d for d in docentes if d['id'] == docente_id), None)
+            snapshot = self.dao.obtener_snapshot()
+            docente = snapshot.docente_por_id.get(docente_id)
             
             if not docente:
                 return f"No se encontró el docente con ID {docente_id}"
             
-            modulos = self.dao.obtener_modulos_docente(docente_id)
-            horas_asignadas = self.dao.obtener_horas_asignadas_docente(docente_id)
+            modulos = snapshot.modulos_docente(docente_id)
+            horas_asignadas = snapshot.carga_docente(docente_id)['horas_asignadas']
             horas_contratadas = docente.get('horas_contratadas', 0)
             porcentaje = (horas_asignadas / horas_contratadas * 100) if horas_contratadas > 0 else 0
             
@@ -412,21 +421,18 @@ Haz clic en los links para navegar a cada sección."
     def obtener_estadisticas(self) -> str:
         """Obtiene estadísticas generales del sistema"""
         try:
-            docentes = self.dao.obtener_docentes()
-            carreras = self.dao.obtener_carreras()
+            snapshot = self.dao.obtener_snapshot()
+            docentes = snapshot.docentes
+            carreras = snapshot.carreras
             
-            total_modulos = 0
-            for c in carreras:
-                total_modulos += len(self.dao.obtener_modulos_carrera(c['id']))
+            total_modulos = sum(len(snapshot.modulos_carrera(c['id'])) for c in carreras)
             
             # Calcular docentes por carga
             docentes_sobrecargados = 0
             docentes_disponibles = 0
             
-            for d in docentes:
-                horas_asignadas = self.dao.obtener_horas_asignadas_docente(d['id'])
-                horas_contratadas = d.get('horas_contratadas', 0)
-                porcentaje = (horas_asignadas / horas_contratadas * 100) if horas_contratadas > 0 else 0
+            for carga in snapshot.carga_por_docente.values():
+                porcentaje = carga['porcentaje']
                 
                 if porcentaje >= 90:
                     docentes_sobrecargados += 1
@@ -449,12 +455,14 @@ Haz clic en los links para navegar a cada sección."
         """Obtiene un ranking de docentes por carga horaria o evaluación"""
         try:
             docentes = self.dao.obtener_docentes()
+            carga_docentes = self.dao.obtener_carga_docentes()
             ranking = []
             
             for d in docentes:
-                horas_asignadas = self.dao.obtener_horas_asignadas_docente(d['id'])
+                carga = carga_docentes.get(d['id'], {})
+                horas_asignadas = carga.get('horas_asignadas', 0)
                 horas_contratadas = d.get('horas_contratadas', 0)
-                porcentaje = (horas_asignadas / horas_contratadas * 100) if horas_contratadas > 0 else 0
+                porcentaje = carga.get('porcentaje', 0)
                 evaluacion = d.get('evaluacion', 0.0)
                 
                 ranking.append({
@@ -494,19 +502,20 @@ Haz clic en los links para navegar a cada sección."
     def generar_reporte_docente(self, docente_id: int) -> str:
         """Genera un reporte PDF de un docente"""
         try:
-            docentes = self.dao.obtener_docentes()
-            docente = next((d for d in docentes if d['id'] == docente_id), None)
+            snapshot = self.dao.obtener_snapshot()
+            docente = snapshot.docente_por_id.get(docente_id)
             
             if not docente:
                 return f"No se encontró el docente con ID {docente_id}"
             
             # Obtener módulos con horarios
-            modulos = self.dao.obtener_modulos_docente(docente_id)
-            for m in modulos:
-                m['horarios'] = self.dao.obtener_horarios_modulo(m['id'])
+            modulos = [
+                dict(m, horarios=list(snapshot.horarios_modulo(m['id'])))
+                for m in snapshot.modulos_docente(docente_id)
+            ]
             
             # Generar reporte
-            filepath = self.report_generator.generar_reporte_docente(docente, modulos)
+            filepath = self.report_generator.generar_reporte_docente(dict(docente), modulos)
             
             return f"✅ Reporte generado exitosamente para {docente['nombre']}\n📄 Archivo: {filepath}\n[OPEN_PDF:{filepath}]"
         except Exception as e:
@@ -516,34 +525,21 @@ Haz clic en los links para navegar a cada sección."
     def generar_reporte_carrera(self, carrera_id: int) -> str:
         """Genera un reporte PDF de una carrera"""
         try:
-            carreras = self.dao.obtener_carreras()
-            carrera = next((c for c in carreras if c['id'] == carrera_id), None)
+            snapshot = self.dao.obtener_snapshot()
+            carrera = snapshot.carrera_por_id.get(carrera_id)
             
             if not carrera:
                 return f"No se encontró la carrera con ID {carrera_id}"
             
-            # Obtener módulos con información de docentes y salas
-            modulos = self.dao.obtener_modulos_carrera(carrera_id)
-            
-            # Enriquecer datos
-            docentes_list = self.dao.obtener_docentes()
-            salas_list = self.dao.obtener_salas()
-            
-            for m in modulos:
-                if m.get('docente_id'):
-                    docente = next((d for d in docentes_list if d['id'] == m['docente_id']), None)
-                    m['docente_nombre'] = docente['nombre'] if docente else 'Sin asignar'
-                else:
-                    m['docente_nombre'] = 'Sin asignar'
-                
-                if m.get('sala_id'):
-                    sala = next((s for s in salas_list if s['id'] == m['sala_id']), None)
-                    m['sala_nombre'] = sala['nombre'] if sala else 'Sin asignar'
-                else:
-                    m['sala_nombre'] = 'Sin asignar'
+            # Módulos con nombres de docente y sala (ya resueltos en la foto)
+            modulos = [
+                dict(m, docente_nombre=m['docente_nombre'] or 'Sin asignar',
+                     sala_nombre=m['sala_nombre'] or 'Sin asignar')
+                for m in snapshot.modulos_carrera(carrera_id)
+            ]
             
             # Generar reporte
-            filepath = self.report_generator.generar_reporte_carrera(carrera, modulos)
+            filepath = self.report_generator.generar_reporte_carrera(dict(carrera), modulos)
             
             return f"✅ Reporte generado exitosamente para {carrera['nombre']}\n📄 Archivo: {filepath}\n[OPEN_PDF:{filepath}]"
         except Exception as e:
@@ -556,12 +552,14 @@ Haz clic en los links para navegar a cada sección."
         try:
             contexto = "=== CONTEXTO DE LA BASE DE DATOS ===\n\n"
             
+            snapshot = self.dao.obtener_snapshot()
+            
             # Docentes
-            docentes = self.dao.obtener_docentes()
+            docentes = snapshot.docentes
             contexto += f"## DOCENTES ({len(docentes)} total):\n"
             for d in docentes:
-                horas_asignadas = self.dao.obtener_horas_asignadas_docente(d['id'])
-                modulos = self.dao.obtener_modulos_docente(d['id'])
+                horas_asignadas = snapshot.carga_docente(d['id'])['horas_asignadas']
+                modulos = snapshot.modulos_docente(d['id'])
                 contexto += f"\n• {d['nombre']} (ID: {d['id']})\n"
                 contexto += f"  - Título: {d.get('titulo', 'N/A')}\n"
                 contexto += f"  - Email: {d.get('email', 'N/A')}\n"
@@ -572,30 +570,33 @@ Haz clic en los links para navegar a cada sección."
                     contexto += f"  - Módulos: {', '.join([m['nombre'] for m in modulos])}\n"
             
             # Carreras
-            carreras = self.dao.obtener_carreras()
+            carreras = snapshot.carreras
             contexto += f"\n## CARRERAS ({len(carreras)} total):\n"
             for c in carreras:
-                modulos = self.dao.obtener_modulos_carrera(c['id'])
+                modulos = snapshot.modulos_carrera(c['id'])
                 contexto += f"\n• {c['nombre']} (ID: {c['id']})\n"
                 contexto += f"  - Jornada: {c.get('jornada', 'N/A')}\n"
                 contexto += f"  - Alumnos proyectados: {c.get('alumnos_proyectados', 0)}\n"
                 contexto += f"  - Módulos: {len(modulos)}\n"
             
-            # Módulos (resumido por carrera)
+            # Módulos (resumido por carrera; la foto los trae ordenados por carrera)
             contexto += f"\n## MÓDULOS POR CARRERA:\n"
-            for c in carreras:
-                modulos = self.dao.obtener_modulos_carrera(c['id'])
-                if modulos:
-                    contexto += f"\n### {c['nombre']}:\n"
-                    for m in modulos:
-                        contexto += f"  • {m['nombre']} ({m.get('codigo', 'N/A')})\n"
-                        contexto += f"    - Semestre: {m.get('semestre', 'N/A')}\n"
-                        contexto += f"    - Horas: {m.get('horas_teoricas', 0)}T + {m.get('horas_practicas', 0)}P\n"
-                        contexto += f"    - Docente: {m.get('docente_nombre', 'Sin asignar')}\n"
-                        contexto += f"    - Sala: {m.get('sala_nombre', 'Sin asignar')}\n"
+            nombres_carrera = {c['id']: c['nombre'] for c in carreras}
+            carrera_actual = None
+            for m in snapshot.modulos:
+                if m['carrera_id'] not in nombres_carrera:
+                    continue
+                if m['carrera_id'] != carrera_actual:
+                    carrera_actual = m['carrera_id']
+                    contexto += f"\n### {nombres_carrera[carrera_actual]}:\n"
+                contexto += f"  • {m['nombre']} ({m.get('codigo', 'N/A')})\n"
+                contexto += f"    - Semestre: {m.get('semestre', 'N/A')}\n"
+                contexto += f"    - Horas: {m.get('horas_teoricas', 0)}T + {m.get('horas_practicas', 0)}P\n"
+                contexto += f"    - Docente: {m.get('docente_nombre', 'Sin asignar')}\n"
+                contexto += f"    - Sala: {m.get('sala_nombre', 'Sin asignar')}\n"
             
             # Salas
-            salas = self.dao.obtener_salas()
+            salas = snapshot.salas
             contexto += f"\n## SALAS ({len(salas)} total):\n"
             for s in salas:
                 contexto += f"• {s['nombre']} - Capacidad: {s.get('capacidad', 'N/A')} - Tipo: {s.get('tipo', 'N/A')}\n"
@@ -640,7 +641,7 @@ Haz clic en los links para navegar a cada sección."
                     if nombre_busqueda:
                         # Buscar docente
                         docentes = self.dao.obtener_docentes()
-                        matches = self.fuzzy_search(nombre_busqueda, docentes, 'nombre', threshold=0.4)
+                        matches = self.fuzzy_search(nombre_busqueda, docentes, 'nombre', threshold=0.4, tipo='docente')
                         
                         if matches:
                             docente = matches[0]
@@ -659,7 +660,7 @@ Haz clic en los links para navegar a cada sección."
                     if nombre_busqueda:
                         # Buscar carrera
                         carreras = self.dao.obtener_carreras()
-                        matches = self.fuzzy_search(nombre_busqueda, carreras, 'nombre', threshold=0.4)
+                        matches = self.fuzzy_search(nombre_busqueda, carreras, 'nombre', threshold=0.4, tipo='carrera')
                         
                         if matches:
                             carrera = matches[0]
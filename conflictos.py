@@ -0,0 +1,387 @@
+"""
+Motor de detección de topes de horario.
+
+Mantiene, por docente, por sala y por (carrera, paridad de semestre), los
+bloques ocupados de cada día ordenados por inicio. Una consulta de solape
+hace una búsqueda binaria acotada por la duración máxima de los bloques del
+día, así que cuesta O(log n + k) y retorna todos los módulos que topan, no
+sólo el primero.
+
+RegistroConflictos guarda los conflictos vigentes de cada módulo y, ante un
+cambio, recalcula sólo los módulos que comparten docente, sala o grupo de
+semestre con el módulo modificado.
+
+Además cada día lleva su ocupación en la grilla de la interfaz como máscara
+de bits (ver modelos.BLOQUES_HORARIOS): un AND descarta de inmediato los
+bloques nuevos que no tocan nada. Ocupacion expone esa representación para
+las grillas (¿bloque libre?, ¿qué choca?, bloques libres del día).
+"""
+
+import threading
+from bisect import bisect_left, insort
+from typing import NamedTuple, Any
+
+from modelos import (Slot, DIAS_SEMANA, BLOQUES_HORARIOS, mascara_rango, dentro_de_grilla,
+                     indice_bloque, bloques_de_mascara)
+
+
+class Conflicto(NamedTuple):
+    """Un tope: `slot` nuevo contra `horario` (fila con 'slot') del `modulo` existente"""
+    tipo: str        # 'docente', 'sala' o 'semestre'
+    slot: Slot
+    modulo: Any
+    horario: Any
+
+    @property
+    def mensaje(self):
+        m, h = self.modulo, self.horario
+        if self.tipo == 'docente':
+            return f"Conflicto de horario: El docente ya dicta '{m['nombre']}' ({m['codigo']}) el {h['dia']} a las {h['hora_inicio']}"
+        if self.tipo == 'sala':
+            return f"Conflicto de sala: La sala ya está ocupada por '{m['nombre']}' ({m['codigo']}) el {h['dia']} a las {h['hora_inicio']}"
+        paridad = "par" if m['semestre'] % 2 == 0 else "impar"
+        return (f"Conflicto de Semestre: El módulo '{m['nombre']}' es del semestre {m['semestre']} ({paridad}) "
+                f"y tiene tope de horario el {h['dia']} a las {h['hora_inicio']}.")
+
+
+class ParConflicto(NamedTuple):
+    """Dos módulos existentes que topan; `slot` es el tramo en que se solapan"""
+    tipo: str
+    slot: Slot
+    modulo_a: Any
+    horario_a: Any
+    modulo_b: Any
+    horario_b: Any
+
+    def conflicto_de(self, modulo_id):
+        """El tope visto desde `modulo_id` (uno de los dos), como Conflicto contra el otro"""
+        if modulo_id == self.modulo_a['id']:
+            return Conflicto(self.tipo, self.slot, self.modulo_b, self.horario_b)
+        return Conflicto(self.tipo, self.slot, self.modulo_a, self.horario_a)
+
+
+class Ocupacion:
+    """
+    Ocupación semanal en la grilla: un int por día cuyo bit i indica que
+    algún horario toca el bloque BLOQUES_HORARIOS[i]. Los bloques se pueden
+    dar como 'HH:MM' o como índice.
+    """
+
+    def __init__(self, mascaras=None):
+        self.mascaras = dict(mascaras or {})   # dia -> int
+        self._ocupantes = {}                   # (dia, bloque) -> [horarios]
+        self._horarios = []
+
+    @classmethod
+    def desde_horarios(cls, horarios):
+        """Desde filas con 'slot' (o dia/hora_inicio/hora_fin)"""
+        ocupacion = cls()
+        for horario in horarios or ():
+            ocupacion.agregar(horario)
+        return ocupacion
+
+    def agregar(self, horario):
+        slot = horario.get('slot') or Slot.desde_horario(horario)
+        mascara = slot.mascara
+        self._horarios.append(horario)
+        self.mascaras[slot.dia] = self.mascaras.get(slot.dia, 0) | mascara
+        for i in bloques_de_mascara(mascara):
+            self._ocupantes.setdefault((slot.dia, i), []).append(horario)
+
+    def mascara(self, dia):
+        return self.mascaras.get(str(dia).upper(), 0)
+
+    def esta_libre(self, dia, bloque):
+        return not self.mascara(dia) >> indice_bloque(bloque) & 1
+
+    def choca_con(self, horarios):
+        """{dia: máscara de los bloques de `horarios` que ya están ocupados}, sólo días con choque"""
+        choques = {}
+        for slot in map(Slot.desde_horario, horarios):
+            comun = slot.mascara & self.mascara(slot.dia)
+            if comun:
+                choques[slot.dia] = choques.get(slot.dia, 0) | comun
+        return choques
+
+    def bloques_libres(self, dia):
+        """Bloques ('HH:MM') libres del día"""
+        mascara = self.mascara(dia)
+        return [b for i, b in enumerate(BLOQUES_HORARIOS) if not mascara >> i & 1]
+
+    def ocupantes(self, dia, bloque):
+        """Horarios que tocan el bloque"""
+        return self._ocupantes.get((str(dia).upper(), indice_bloque(bloque)), [])
+
+    def ocupante_rango(self, dia, inicio, fin):
+        """Primer horario que se solapa con [inicio, fin) ('HH:MM' o minutos), o None"""
+        rango = Slot.crear(dia, inicio, fin)
+        if dentro_de_grilla(rango.inicio, rango.fin):
+            mascara = rango.mascara & self.mascara(rango.dia)
+            candidatos = (h for i in bloques_de_mascara(mascara) for h in self._ocupantes[(rango.dia, i)])
+        else:
+            candidatos = self._horarios
+        for horario in candidatos:
+            if (horario.get('slot') or Slot.desde_horario(horario)).se_solapa(rango):
+                return horario
+        return None
+
+
+def matriz_estados(propia, docente, sala, disponibilidad=None, dias=DIAS_SEMANA):
+    """
+    Estado de cada celda de la grilla de un módulo, con operaciones de bits
+    sobre las máscaras de cada día. `propia`, `docente` y `sala` son
+    Ocupacion (la del módulo y las de otros módulos del docente y la sala);
+    `disponibilidad` es {dia: {hora: bool}} del docente.
+
+    Retorna {dia: [(estado, info)]} en el orden de BLOQUES_HORARIOS, con
+    estado 'CONFLICT' (propio y ocupado), 'LOCKED' (ocupado por otro),
+    'SELECTED', 'UNAVAILABLE' o 'AVAILABLE'; `info` nombra al módulo que
+    bloquea (primero el del docente, luego el de la sala) o es None.
+    """
+    disponibilidad = disponibilidad or {}
+    matriz = {}
+    for dia in dias:
+        mia, del_docente, de_sala = propia.mascara(dia), docente.mascara(dia), sala.mascara(dia)
+        horas = disponibilidad.get(dia, {})
+        no_disponible = sum(1 << i for i, b in enumerate(BLOQUES_HORARIOS) if not horas.get(b, True))
+        ocupada = del_docente | de_sala
+        libres = ~(mia | ocupada)
+        estados = (
+            ('CONFLICT', mia & ocupada),
+            ('LOCKED', ocupada & ~mia),
+            ('SELECTED', mia & ~ocupada),
+            ('UNAVAILABLE', no_disponible & libres),
+            ('AVAILABLE', ~no_disponible & libres),
+        )
+        fila = []
+        for i in range(len(BLOQUES_HORARIOS)):
+            estado = next(e for e, mascara in estados if mascara >> i & 1)
+            info = None
+            if del_docente >> i & 1:
+                info = f"Docente ocupado en {docente.ocupantes(dia, i)[0]['modulo_nombre']}"
+            elif de_sala >> i & 1:
+                info = f"Sala ocupada por {sala.ocupantes(dia, i)[0]['modulo_nombre']}"
+            fila.append((estado, info))
+        matriz[dia] = fila
+    return matriz
+
+
+class _BloquesDia:
+    """Bloques de un día ordenados por (inicio, fin, modulo_id), con su máscara en la grilla"""
+
+    __slots__ = ('entradas', 'max_duracion', 'mascara')
+
+    def __init__(self):
+        self.entradas = []        # (inicio, fin, modulo_id, horario)
+        self.max_duracion = 0
+        self.mascara = 0
+
+    def agregar(self, slot, modulo_id, horario):
+        insort(self.entradas, (slot.inicio, slot.fin, modulo_id, horario), key=lambda e: e[:3])
+        self.max_duracion = max(self.max_duracion, slot.duracion)
+        self.mascara |= slot.mascara
+
+    def quitar(self, modulo_id):
+        self.entradas = [e for e in self.entradas if e[2] != modulo_id]
+        self.mascara = 0
+        for inicio, fin, _, _ in self.entradas:
+            self.mascara |= mascara_rango(inicio, fin)
+
+    def solapes(self, inicio, fin):
+        """Entradas con inicio < fin y fin > inicio (un bloque no empieza antes de inicio - max_duracion)"""
+        entradas = self.entradas
+        desde = bisect_left(entradas, inicio - self.max_duracion, key=lambda e: e[0])
+        for i in range(desde, len(entradas)):
+            entrada = entradas[i]
+            if entrada[0] >= fin:
+                break
+            if entrada[1] > inicio:
+                yield entrada
+
+
+class MotorConflictos:
+    """
+    Índice de bloques ocupados para validar horarios. Se arma con
+    desde_snapshot() o agregando módulos; admite altas y bajas sueltas.
+    """
+
+    def __init__(self):
+        self._bloques = {}   # clave -> {dia: _BloquesDia}
+        self._modulos = {}   # modulo_id -> (modulo, claves, horarios)
+
+    @classmethod
+    def desde_snapshot(cls, snapshot):
+        motor = cls()
+        for modulo in snapshot.modulos:
+            motor.agregar_modulo(modulo, snapshot.horarios_modulo(modulo['id']))
+        return motor
+
+    @staticmethod
+    def _claves(modulo):
+        claves = []
+        if modulo.get('docente_id'):
+            claves.append(('docente', modulo['docente_id']))
+        if modulo.get('sala_id'):
+            claves.append(('sala', modulo['sala_id']))
+        if modulo.get('carrera_id') and modulo.get('semestre') is not None:
+            claves.append(('semestre', modulo['carrera_id'], int(modulo['semestre']) % 2))
+        return claves
+
+    def agregar_modulo(self, modulo, horarios):
+        """Indexa (o reindexa) `modulo` con sus horarios (filas con 'slot' o dia/hora_inicio/hora_fin)"""
+        self.quitar_modulo(modulo['id'])
+        claves = self._claves(modulo)
+        horarios = list(horarios)
+        self._modulos[modulo['id']] = (modulo, claves, horarios)
+        for horario in horarios:
+            slot = horario.get('slot') or Slot.desde_horario(horario)
+            for clave in claves:
+                dias = self._bloques.setdefault(clave, {})
+                dias.setdefault(slot.dia, _BloquesDia()).agregar(slot, modulo['id'], horario)
+
+    def quitar_modulo(self, modulo_id):
+        modulo, claves, _ = self._modulos.pop(modulo_id, (None, (), ()))
+        for clave in claves:
+            for bloques in self._bloques.get(clave, {}).values():
+                bloques.quitar(modulo_id)
+
+    def modulo(self, modulo_id):
+        entrada = self._modulos.get(modulo_id)
+        return entrada[0] if entrada else None
+
+    def horarios(self, modulo_id):
+        entrada = self._modulos.get(modulo_id)
+        return entrada[2] if entrada else ()
+
+    def modulo_ids(self):
+        return list(self._modulos)
+
+    def relacionados(self, modulo_id):
+        """
+        Ids de los módulos (con horarios) que pueden topar con `modulo_id`:
+        mismo docente, misma sala o semestre de paridad opuesta de la carrera
+        """
+        entrada = self._modulos.get(modulo_id)
+        ids = set()
+        for clave in entrada[1] if entrada else ():
+            if clave[0] == 'semestre':
+                clave = ('semestre', clave[1], 1 - clave[2])
+            for bloques in self._bloques.get(clave, {}).values():
+                ids.update(e[2] for e in bloques.entradas)
+        return ids
+
+    def ocupacion(self, clave):
+        """
+        Ocupacion de ('docente', id), ('sala', id) o ('semestre', carrera_id,
+        paridad), con los horarios de sus módulos como ocupantes
+        """
+        ocupacion = Ocupacion()
+        for bloques in self._bloques.get(clave, {}).values():
+            for _, _, _, horario in bloques.entradas:
+                ocupacion.agregar(horario)
+        return ocupacion
+
+    def _buscar(self, tipo, clave, horarios, excluir=None):
+        dias = self._bloques.get(clave)
+        if not dias:
+            return []
+        conflictos = []
+        for slot in map(Slot.desde_horario, horarios):
+            bloques = dias.get(slot.dia)
+            if bloques is None:
+                continue
+            # Sin bloques de la grilla en común no puede haber solape
+            if not slot.mascara & bloques.mascara and dentro_de_grilla(slot.inicio, slot.fin):
+                continue
+            for _, _, modulo_id, horario in bloques.solapes(slot.inicio, slot.fin):
+                if modulo_id != excluir:
+                    conflictos.append(Conflicto(tipo, slot, self._modulos[modulo_id][0], horario))
+        return conflictos
+
+    def conflictos_docente(self, docente_id, horarios, excluir=None):
+        """Topes de `horarios` con otros módulos del docente (excepto el módulo `excluir`)"""
+        if not docente_id:
+            return []
+        return self._buscar('docente', ('docente', docente_id), horarios, excluir)
+
+    def conflictos_sala(self, sala_id, horarios, excluir=None):
+        if not sala_id:
+            return []
+        return self._buscar('sala', ('sala', sala_id), horarios, excluir)
+
+    def conflictos_semestre(self, carrera_id, semestre, horarios, excluir=None):
+        """Topes con módulos de la carrera de semestres de paridad opuesta (impar contra par)"""
+        if not carrera_id or not semestre:
+            return []
+        paridad_opuesta = 0 if int(semestre) % 2 else 1
+        return self._buscar('semestre', ('semestre', carrera_id, paridad_opuesta), horarios, excluir)
+
+
+class RegistroConflictos:
+    """
+    Conflictos vigentes por módulo: el primero de cada tipo, con las reglas
+    de los validadores (módulos con docente y sala; el de semestre sólo si
+    el módulo tiene semestre). Consultarlo es O(1); actualizar_modulo y
+    quitar_modulo recalculan sólo los módulos relacionados.
+    """
+
+    def __init__(self, motor=None):
+        self._lock = threading.Lock()
+        self._motor = motor or MotorConflictos()
+        self._conflictos = {}   # modulo_id -> [Conflicto]
+        for modulo_id in self._motor.modulo_ids():
+            self._recalcular(modulo_id)
+
+    @classmethod
+    def desde_snapshot(cls, snapshot):
+        return cls(MotorConflictos.desde_snapshot(snapshot))
+
+    def __len__(self):
+        return len(self._conflictos)
+
+    def conflictos(self, modulo_id):
+        return self._conflictos.get(modulo_id, [])
+
+    def tiene_conflictos(self, modulo_id):
+        return modulo_id in self._conflictos
+
+    def por_modulo(self):
+        """{modulo_id: [Conflicto]} de los módulos con conflictos"""
+        with self._lock:
+            return dict(self._conflictos)
+
+    def actualizar_modulo(self, modulo, horarios):
+        """Registra el estado nuevo de `modulo` (alta o cambio)"""
+        with self._lock:
+            afectados = self._motor.relacionados(modulo['id'])
+            self._motor.agregar_modulo(modulo, horarios)
+            afectados |= self._motor.relacionados(modulo['id'])
+            afectados.add(modulo['id'])
+            for modulo_id in afectados:
+                self._recalcular(modulo_id)
+
+    def quitar_modulo(self, modulo_id):
+        with self._lock:
+            afectados = self._motor.relacionados(modulo_id)
+            self._motor.quitar_modulo(modulo_id)
+            self._conflictos.pop(modulo_id, None)
+            afectados.discard(modulo_id)
+            for otro_id in afectados:
+                self._recalcular(otro_id)
+
+    def _recalcular(self, modulo_id):
+        motor = self._motor
+        modulo, horarios = motor.modulo(modulo_id), motor.horarios(modulo_id)
+        conflictos = []
+        if modulo is not None and modulo.get('docente_id') and modulo.get('sala_id') and horarios:
+            for encontrados in (
+                motor.conflictos_docente(modulo['docente_id'], horarios, modulo_id),
+                motor.conflictos_sala(modulo['sala_id'], horarios, modulo_id),
+                motor.conflictos_semestre(modulo.get('carrera_id'), modulo.get('semestre'), horarios, modulo_id),
+            ):
+                if encontrados:
+                    conflictos.append(encontrados[0])
+        if conflictos:
+            self._conflictos[modulo_id] = conflictos
+        else:
+            self._conflictos.pop(modulo_id, None)
@@ -1,65 +1,895 @@
 import os
+import time
 import logging
+import threading
+from collections import deque, Counter
+from contextlib import contextmanager
+import sqlite3
 import pymysql
-from pymysql.err import Error
 from dotenv import load_dotenv
+import metricas
+from dialectos import Error, crear_dialecto
+from modelos import Slot, Sala, Carrera, Docente, Modulo, Horario
+from snapshot import SistemaSnapshot
+from cache import CacheTTL
+from busqueda import IndiceBusqueda
+from conflictos import MotorConflictos, Ocupacion, ParConflicto, RegistroConflictos, matriz_estados
 
 # Cargar variables de entorno si existen
 load_dotenv()
 
+
+class DatabaseError(Exception):
+    """Error base de la capa de acceso a datos"""
+
+
+class ConexionError(DatabaseError):
+    """No se pudo establecer o mantener la conexión con el servidor"""
+
+
+class PoolAgotadoError(ConexionError):
+    """No se pudo obtener una conexión del pool dentro del tiempo de espera"""
+
+
+class ConsultaError(DatabaseError):
+    """El servidor rechazó la consulta (sintaxis, restricción, tabla inexistente...)"""
+
+
+# Códigos de pymysql/MySQL que indican una conexión caída y no un error de la
+# consulta: no se pudo conectar, "server has gone away", conexión perdida
+# durante la consulta, socket cerrado y desconexión por inactividad.
+CODIGOS_CONEXION = {2003, 2006, 2013, 2055, 4031}
+
+
+def es_error_de_conexion(error):
+    """Indica si `error` corresponde a una conexión caída (reintentable)"""
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    if isinstance(error, pymysql.err.OperationalError):
+        codigo = error.args[0] if error.args else None
+        return codigo in CODIGOS_CONEXION
+    if isinstance(error, sqlite3.ProgrammingError):
+        # "Cannot operate on a closed database"
+        return 'closed' in str(error)
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones acotado y seguro para hilos.
+
+    Entrega conexiones con checkout/return: como máximo `max_size` conexiones
+    abiertas a la vez; los hilos que no consiguen una esperan en cola hasta
+    `wait_timeout` segundos. Las conexiones ociosas por más de `idle_timeout`
+    segundos se cierran al próximo checkout.
+
+    Si se entrega `validate`, las conexiones que estuvieron ociosas más de
+    `ping_after` segundos se validan antes de prestarlas y se descartan si
+    fallan. Tras un fallo al conectar, los nuevos intentos fallan de inmediato
+    durante una ventana de espera que crece exponencialmente (hasta
+    `backoff_max`), en vez de pagar el connect_timeout completo cada vez.
+    """
+
+    def __init__(self, factory, max_size=10, idle_timeout=300, wait_timeout=10,
+                 validate=None, ping_after=30, backoff_base=0.5, backoff_max=30):
+        self._factory = factory
+        self._validate = validate
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.ping_after = ping_after
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # Estado de fallos de conexión
+        self._fallos_consecutivos = 0
+        self._bloqueado_hasta = 0.0
+        self._ultimo_error = None
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()  # (conexion, momento_de_retorno)
+        self._total = 0       # conexiones abiertas (ociosas + prestadas)
+
+        # Métricas
+        self._checkouts = 0
+        self._creadas = 0
+        self._cerradas_inactivas = 0
+        self._esperando = 0
+        self._max_esperando = 0
+        self._esperas = 0
+        self._tiempo_espera_total = 0.0
+        self._tiempo_espera_max = 0.0
+        self._timeouts = 0
+        self._validaciones = 0
+        self._descartadas = 0
+        self._fallos_conexion = 0
+        self._rechazos_rapidos = 0
+
+    def _cerrar(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _purgar_inactivas(self):
+        """Cierra conexiones ociosas vencidas. Requiere tener el lock."""
+        limite = time.monotonic() - self.idle_timeout
+        # Las más antiguas quedan a la izquierda (el checkout es LIFO)
+        while self._idle and self._idle[0][1] < limite:
+            connection, _ = self._idle.popleft()
+            self._total -= 1
+            self._cerradas_inactivas += 1
+            self._cerrar(connection)
+
+    def acquire(self, timeout=None):
+        """Obtiene una conexión del pool, creando una nueva si hay cupo"""
+        timeout = self.wait_timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        deadline = inicio + timeout
+
+        while True:
+            connection, ociosa_desde = self._reservar(inicio, deadline, timeout)
+            if connection is None:
+                return self._crear()
+
+            if self._validate is None or time.monotonic() - ociosa_desde < self.ping_after:
+                return connection
+
+            # Conexión ociosa por mucho tiempo: verificar que siga viva
+            try:
+                self._validate(connection)
+                with self._cond:
+                    self._validaciones += 1
+                return connection
+            except Exception as e:
+                logging.warning(f"Conexión inactiva descartada: {e}")
+                with self._cond:
+                    self._validaciones += 1
+                    self._descartadas += 1
+                    self._checkouts -= 1
+                self.release(connection, discard=True)
+
+    def _reservar(self, inicio, deadline, timeout):
+        """
+        Toma una conexión ociosa o reserva un cupo para crear una nueva.
+        Retorna (conexion, momento_de_retorno) o (None, None) si hay que crearla.
+        """
+        espero = False
+        with self._cond:
+            while True:
+                self._purgar_inactivas()
+                if self._idle:
+                    connection, ociosa_desde = self._idle.pop()
+                    break
+                if self._total < self.max_size:
+                    ahora = time.monotonic()
+                    if ahora < self._bloqueado_hasta:
+                        self._rechazos_rapidos += 1
+                        raise ConexionError(
+                            f"Servidor no disponible (reintento en {self._bloqueado_hasta - ahora:.1f}s): "
+                            f"{self._ultimo_error}"
+                        )
+                    # Reservar el cupo y crear la conexión fuera del lock
+                    self._total += 1
+                    connection, ociosa_desde = None, None
+                    break
+
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    self._timeouts += 1
+                    raise PoolAgotadoError(
+                        f"Pool agotado: {self.max_size} conexiones en uso tras esperar {timeout}s"
+                    )
+                espero = True
+                self._esperando += 1
+                self._max_esperando = max(self._max_esperando, self._esperando)
+                try:
+                    self._cond.wait(restante)
+                finally:
+                    self._esperando -= 1
+
+            self._checkouts += 1
+            if espero:
+                esperado = time.monotonic() - inicio
+                self._esperas += 1
+                self._tiempo_espera_total += esperado
+                self._tiempo_espera_max = max(self._tiempo_espera_max, esperado)
+        return connection, ociosa_desde
+
+    def _crear(self):
+        """Abre una conexión en un cupo ya reservado"""
+        try:
+            connection = self._factory()
+        except Exception as e:
+            with self._cond:
+                self._total -= 1
+                self._checkouts -= 1
+                self._fallos_conexion += 1
+                self._fallos_consecutivos += 1
+                espera = min(self.backoff_base * 2 ** (self._fallos_consecutivos - 1), self.backoff_max)
+                self._bloqueado_hasta = time.monotonic() + espera
+                self._ultimo_error = e
+                self._cond.notify()
+            raise ConexionError(f"No se pudo conectar: {e}") from e
+        with self._cond:
+            self._creadas += 1
+            self._fallos_consecutivos = 0
+            self._bloqueado_hasta = 0.0
+            self._ultimo_error = None
+        return connection
+
+    def release(self, connection, discard=False):
+        """Devuelve una conexión al pool (o la descarta si está rota)"""
+        if connection is None:
+            return
+        if not discard and not getattr(connection, 'open', True):
+            discard = True
+        with self._cond:
+            if discard:
+                self._total -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._cerrar(connection)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager que presta una conexión y la devuelve al salir"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, discard=not getattr(connection, 'open', True))
+            raise
+        else:
+            self.release(connection)
+
+    def close_all(self):
+        """Cierra todas las conexiones ociosas"""
+        with self._cond:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._total -= 1
+                self._cerrar(connection)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Retorna una instantánea de las métricas del pool"""
+        with self._cond:
+            en_uso = self._total - len(self._idle)
+            return {
+                'max_size': self.max_size,
+                'abiertas': self._total,
+                'en_uso': en_uso,
+                'ociosas': len(self._idle),
+                'checkouts': self._checkouts,
+                'creadas': self._creadas,
+                'cerradas_inactivas': self._cerradas_inactivas,
+                'esperando': self._esperando,
+                'max_esperando': self._max_esperando,
+                'esperas': self._esperas,
+                'timeouts': self._timeouts,
+                'validaciones': self._validaciones,
+                'descartadas': self._descartadas,
+                'fallos_conexion': self._fallos_conexion,
+                'rechazos_rapidos': self._rechazos_rapidos,
+                'espera_promedio_ms': (self._tiempo_espera_total / self._esperas * 1000) if self._esperas else 0.0,
+                'espera_max_ms': self._tiempo_espera_max * 1000,
+            }
+
+
+# Un pool por destino (host, puerto, base, usuario) compartido por todas las
+# sesiones del proceso, para que el límite de conexiones sea global.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool(clave, factory, validate=None):
+    """Retorna el pool compartido para `clave`, creándolo si no existe"""
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = ConnectionPool(
+                factory,
+                max_size=int(os.getenv('DB_POOL_SIZE', 10)),
+                idle_timeout=float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300)),
+                wait_timeout=float(os.getenv('DB_POOL_WAIT_TIMEOUT', 10)),
+                validate=validate,
+                ping_after=float(os.getenv('DB_PING_AFTER', 30)),
+                backoff_max=float(os.getenv('DB_RECONNECT_BACKOFF_MAX', 30)),
+            )
+            _pools[clave] = pool
+        return pool
+
+
+class _Transaccion:
+    """Estado de la transacción en curso de un hilo"""
+    __slots__ = ('connection', 'nivel', 'al_confirmar')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.nivel = 0
+        # Callbacks a ejecutar tras el commit del bloque más externo
+        self.al_confirmar = []
+
+
 class Database:
     def __init__(self):
         self.host = os.getenv('DB_HOST', 'localhost')
         self.database = os.getenv('DB_NAME', 'sistema_gestion_academica')
         self.user = os.getenv('DB_USER', 'root')
         self.password = os.getenv('DB_PASSWORD', '')
-        self.connection = None
-    
+        self.port = int(os.getenv('DB_PORT', 3306))
+        self.connect_timeout = int(os.getenv('DB_CONNECT_TIMEOUT', 5))
+        # Reintentos de lecturas ante conexiones caídas (backoff exponencial acotado)
+        self.read_retries = int(os.getenv('DB_READ_RETRIES', 3))
+        self.retry_base = float(os.getenv('DB_RETRY_BASE', 0.1))
+        self.retry_max = float(os.getenv('DB_RETRY_MAX', 2))
+        # Filas por lote al iterar con cursores del lado del servidor
+        self.chunk_size = int(os.getenv('DB_STREAM_CHUNK', 500))
+        self.dialecto = crear_dialecto(self)
+        self.pool = obtener_pool(
+            (self.dialecto.nombre, self.host, self.port, self.database, self.user),
+            self._conectar,
+            validate=self._validar,
+        )
+        # Transacción en curso por hilo (ver transaction())
+        self._local = threading.local()
+
+    def _conectar(self):
+        return self.dialecto.conectar()
+
+    @staticmethod
+    def _validar(connection):
+        # Sin reconnect: si el ping falla el pool descarta la conexión y abre otra
+        connection.ping(reconnect=False)
+
     def get_connection(self):
-        if self.connection is None or not self.connection.open:
+        """
+        Presta una conexión del pool. Debe devolverse con release_connection().
+        Lanza ConexionError si no se puede obtener.
+        """
+        try:
+            return self.pool.acquire()
+        except ConexionError as e:
+            logging.error(f"Error al conectar: {e}")
+            raise
+
+    def release_connection(self, connection, discard=False):
+        """Devuelve al pool una conexión obtenida con get_connection()"""
+        self.pool.release(connection, discard=discard)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unidad de trabajo: `with db.transaction() as connection:`.
+
+        El bloque más externo toma una conexión del pool, abre la transacción
+        y hace un único commit al salir (o rollback ante cualquier excepción).
+        Los bloques anidados en el mismo hilo se unen a esa transacción con
+        un SAVEPOINT, de modo que un error interno sólo deshace su parte.
+        Mientras dure, execute_query/execute_insert usan la misma conexión.
+        """
+        tx = getattr(self._local, 'tx', None)
+        if tx is not None:
+            tx.nivel += 1
+            savepoint = f"sp_{tx.nivel}"
             try:
-                self.connection = pymysql.connect(
-                    host=self.host,
-                    database=self.database,
-                    user=self.user,
-                    password=self.password,
-                    port=int(os.getenv('DB_PORT', 3306)),
-                    connect_timeout=5,  # 5 second timeout
-                    charset='utf8mb4',
-                    cursorclass=pymysql.cursors.DictCursor
-                )
+                with tx.connection.cursor() as cursor:
+                    cursor.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    yield tx.connection
+                except BaseException:
+                    if tx.connection.open:
+                        with tx.connection.cursor() as cursor:
+                            cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                    raise
+                with tx.connection.cursor() as cursor:
+                    cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+            finally:
+                tx.nivel -= 1
+            return
+
+        connection = self.get_connection()
+        self._local.tx = tx = _Transaccion(connection)
+        try:
+            connection.begin()
+            yield connection
+            connection.commit()
+        except BaseException:
+            try:
+                connection.rollback()
+            except Exception as e:
+                logging.error(f"Error revirtiendo transacción: {e}")
+            raise
+        finally:
+            self._local.tx = None
+            self.release_connection(connection)
+
+        for callback in tx.al_confirmar:
+            try:
+                callback()
             except Exception as e:
+                logging.error(f"Error en callback posterior al commit: {e}")
+
+    def _transaccion_actual(self):
+        return getattr(self._local, 'tx', None)
+
+    def en_transaccion(self):
+        """True si el hilo actual está dentro de un bloque transaction()"""
+        return self._transaccion_actual() is not None
+
+    def al_confirmar(self, callback):
+        """
+        Ejecuta `callback` cuando lo escrito quede confirmado: tras el commit
+        de la transacción en curso (se descarta si hay rollback) o de
+        inmediato si no hay transacción.
+        """
+        tx = self._transaccion_actual()
+        if tx is None:
+            callback()
+        else:
+            tx.al_confirmar.append(callback)
+
+    def cursor(self, connection, cursorclass=None):
+        """Abre un cursor sobre `connection` que registra métricas de cada consulta"""
+        cursor = connection.cursor(cursorclass) if cursorclass else connection.cursor()
+        llamador = metricas.metodo_llamador(__name__, Database) if metricas.registro.activo else None
+        return metricas.CursorInstrumentado(cursor, metricas.registro, llamador)
+
+    def estadisticas_consultas(self, top=10, orden='total_ms'):
+        """Snapshot de las consultas más costosas registradas en el proceso"""
+        return metricas.registro.snapshot(top=top, orden=orden)
+
+    def _espera_reintento(self, intento):
+        return min(self.retry_base * 2 ** intento, self.retry_max)
+
+    def execute_query(self, query, params=None, fetch=False, registro=None):
+        """
+        Ejecuta una consulta. Con fetch=True retorna las filas; si no, la
+        cantidad de filas afectadas. Con `registro` (una clase de
+        modelos.Registro) las filas se leen como tuplas y se retornan como
+        registros de esa clase.
+
+        Las lecturas (fetch=True) se reintentan ante conexiones caídas; las
+        escrituras no, porque no se sabe si alcanzaron a aplicarse. Lanza
+        ConexionError o ConsultaError en vez de retornar None.
+        """
+        tx = self._transaccion_actual()
+        if tx is not None:
+            return self._ejecutar_en_transaccion(tx, query, params, fetch, registro=registro)
+
+        intentos = self.read_retries + 1 if fetch else 1
+        for intento in range(intentos):
+            ultimo_intento = intento == intentos - 1
+            try:
+                connection = self.pool.acquire()
+            except PoolAgotadoError as e:
                 logging.error(f"Error al conectar: {e}")
-                return None
-        return self.connection
-    
-    
-    def execute_query(self, query, params=None, fetch=False):
+                raise
+            except ConexionError as e:
+                if ultimo_intento:
+                    logging.error(f"Error al conectar: {e}")
+                    raise
+                time.sleep(self._espera_reintento(intento))
+                continue
+
+            cursor = None
+            descartar = False
+            try:
+                cursor = self.cursor(connection, self.dialecto.cursor_tuplas if registro else None)
+                cursor.execute(query, params or ())
+                
+                if registro:
+                    return registro.desde_tuplas(cursor.description, cursor.fetchall())
+                if fetch:
+                    result = cursor.fetchall()
+                    return result
+                else:
+                    connection.commit()
+                    return cursor.rowcount
+            except Exception as e:
+                if not es_error_de_conexion(e):
+                    logging.error(f"Error ejecutando consulta: {e}")
+                    raise ConsultaError(str(e)) from e
+                descartar = True
+                if ultimo_intento:
+                    logging.error(f"Conexión perdida ejecutando consulta: {e}")
+                    raise ConexionError(f"Conexión perdida: {e}") from e
+                espera = self._espera_reintento(intento)
+                logging.warning(f"Conexión perdida ({e}); reintentando lectura en {espera:.2f}s")
+            finally:
+                if cursor:
+                    try:
+                        cursor.close()
+                    except Exception:
+                        pass
+                self.release_connection(connection, discard=descartar)
+            time.sleep(espera)
+
+    def _ejecutar_en_transaccion(self, tx, query, params=None, fetch=False, insert=False, registro=None):
+        """Ejecuta sobre la conexión de la transacción en curso, sin commit ni reintentos"""
+        try:
+            with self.cursor(tx.connection, self.dialecto.cursor_tuplas if registro else None) as cursor:
+                cursor.execute(query, params or ())
+                if registro:
+                    return registro.desde_tuplas(cursor.description, cursor.fetchall())
+                if fetch:
+                    return cursor.fetchall()
+                return cursor.lastrowid if insert else cursor.rowcount
+        except Exception as e:
+            logging.error(f"Error ejecutando consulta en transacción: {e}")
+            if es_error_de_conexion(e):
+                raise ConexionError(f"Conexión perdida: {e}") from e
+            raise ConsultaError(str(e)) from e
+
+    def iter_query(self, query, params=None, chunk_size=None, registro=None):
+        """
+        Itera las filas de una consulta sin cargar el resultado completo en
+        memoria, usando un cursor sin buffer del lado del servidor que trae
+        lotes de `chunk_size` filas (como registros de la clase `registro`
+        si se indica, ver execute_query).
+
+        La conexión queda prestada hasta agotar o cerrar el generador, y
+        mientras tanto no admite otras consultas. No se reintenta: si la
+        conexión cae a mitad de camino se lanza ConexionError. Usa su propia
+        conexión aunque haya una transacción en curso.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        connection = self.get_connection()
+
+        cursor = None
+        descartar = False
+        try:
+            if registro:
+                cursor = self.cursor(connection, self.dialecto.cursor_tuplas_streaming)
+            else:
+                cursor = self.cursor(connection, self.dialecto.cursor_streaming)
+            cursor.execute(query, params or ())
+            crear = registro.constructor([col[0] for col in cursor.description]) if registro else None
+            while True:
+                filas = cursor.fetchmany(chunk_size)
+                if not filas:
+                    break
+                if crear:
+                    yield from map(crear, filas)
+                else:
+                    yield from filas
+        except Exception as e:
+            logging.error(f"Error iterando consulta: {e}")
+            if es_error_de_conexion(e):
+                descartar = True
+                raise ConexionError(f"Conexión perdida: {e}") from e
+            raise ConsultaError(str(e)) from e
+        finally:
+            if cursor:
+                try:
+                    # En un cursor sin buffer, close() descarta las filas pendientes
+                    cursor.close()
+                except Exception:
+                    descartar = True
+            self.release_connection(connection, discard=descartar)
+
+    def execute_insert(self, query, params=None):
+        """Ejecuta un INSERT y retorna el id generado (en la misma conexión)"""
+        tx = self._transaccion_actual()
+        if tx is not None:
+            return self._ejecutar_en_transaccion(tx, query, params, insert=True)
+
         connection = self.get_connection()
-        if connection is None:
-            return None
         
         cursor = None
+        descartar = False
         try:
-            cursor = connection.cursor()  # Already DictCursor from get_connection
+            cursor = self.cursor(connection)
             cursor.execute(query, params or ())
-            
-            if fetch:
-                result = cursor.fetchall()
-                return result
-            else:
-                connection.commit()
-                return cursor.rowcount
+            connection.commit()
+            return cursor.lastrowid
         except Exception as e:
-            logging.error(f"Error ejecutando consulta: {e}")
-            return None
+            logging.error(f"Error ejecutando inserción: {e}")
+            if es_error_de_conexion(e):
+                descartar = True
+                raise ConexionError(f"Conexión perdida: {e}") from e
+            raise ConsultaError(str(e)) from e
         finally:
             if cursor:
-                cursor.close()
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            self.release_connection(connection, discard=descartar)
+
+# Tablas con contador en version_datos. Cada escritura de SistemaDAO sube la
+# versión de lo que toca dentro de la misma transacción, así otras sesiones o
+# procesos detectan cambios con una sola consulta a esa tabla.
+TABLAS_VERSIONADAS = (
+    'salas', 'carreras', 'docentes', 'modulos', 'modulo_horarios',
+    'carrera_semestres', 'carrera_salas', 'disponibilidad_docentes',
+)
+
+# Clase de registro (modelos.Registro) de cada catálogo
+_REGISTROS_CATALOGO = {'salas': Sala, 'carreras': Carrera, 'docentes': Docente}
+
+# Entradas de caché que además dependen de otra tabla (salas_carrera trae filas
+# de salas; el resumen de utilización se arma con módulos, horarios y catálogos)
+_DEPENDENCIAS_CACHE = {
+    'salas': ('carrera_salas', 'utilizacion'),
+    'docentes': ('utilizacion',),
+    'modulos': ('utilizacion',),
+    'modulo_horarios': ('utilizacion',),
+}
+
+# Tablas cuyos nombres (y códigos) van al índice de búsqueda, con el tipo de entidad
+_CONSULTAS_INDICE = {
+    'docentes': ('docente', "SELECT id, nombre FROM docentes"),
+    'carreras': ('carrera', "SELECT id, nombre FROM carreras"),
+    'salas': ('sala', "SELECT id, nombre FROM salas"),
+    'modulos': ('modulo', "SELECT id, nombre, codigo FROM modulos"),
+}
+
+# Módulos (con docente y sala) con algún tope: mismo docente, misma sala o,
+# en la misma carrera, semestre de paridad opuesta. Mismo criterio que
+# validar_modulo.
+_CONSULTA_MODULOS_CON_CONFLICTO = """
+    SELECT COUNT(DISTINCT m1.id)
+    FROM modulos m1
+    JOIN modulo_horarios h1 ON h1.modulo_id = m1.id
+    JOIN modulo_horarios h2 ON h2.dia = h1.dia AND h2.modulo_id <> m1.id
+         AND h2.minuto_inicio < h1.minuto_fin AND h1.minuto_inicio < h2.minuto_fin
+    JOIN modulos m2 ON m2.id = h2.modulo_id
+    WHERE m1.docente_id IS NOT NULL AND m1.sala_id IS NOT NULL
+      AND (m2.docente_id = m1.docente_id
+           OR m2.sala_id = m1.sala_id
+           OR (m1.carrera_id IS NOT NULL AND m1.semestre <> 0
+               AND m2.carrera_id = m1.carrera_id
+               AND m2.semestre_paridad = 1 - m1.semestre_paridad))
+"""
+
+
+# Pares de módulos que topan, con un self-join de modulo_horarios por día y
+# solape de minutos (índice dia, minuto_inicio, minuto_fin) por cada regla.
+# Cada par sale una vez: a < b en docente/sala, a impar y b par en semestre.
+_COLUMNAS_PAR = ", ".join(
+    f"{m}.{c} AS {m}_{c}" for m in ('ma', 'mb')
+    for c in ('id', 'nombre', 'codigo', 'semestre', 'carrera_id', 'docente_id', 'sala_id')
+) + ", " + ", ".join(
+    f"{t}{m[1]}.nombre AS {m}_{n}_nombre" for m in ('ma', 'mb')
+    for t, n in (('d', 'docente'), ('s', 'sala'), ('c', 'carrera'))
+) + """, ha.dia AS dia,
+    ha.hora_inicio AS ha_hora_inicio, ha.hora_fin AS ha_hora_fin,
+    ha.minuto_inicio AS ha_minuto_inicio, ha.minuto_fin AS ha_minuto_fin,
+    hb.hora_inicio AS hb_hora_inicio, hb.hora_fin AS hb_hora_fin,
+    hb.minuto_inicio AS hb_minuto_inicio, hb.minuto_fin AS hb_minuto_fin"""
+
+_REGLAS_CONFLICTO = {
+    'docente': "mb.docente_id = ma.docente_id AND ma.id < mb.id",
+    'sala': "mb.sala_id = ma.sala_id AND ma.id < mb.id",
+    'semestre': "mb.carrera_id = ma.carrera_id AND ma.semestre_paridad = 1 AND mb.semestre_paridad = 0",
+}
+
+_CONSULTA_PARES_EN_CONFLICTO = " UNION ALL ".join(f"""
+    SELECT '{tipo}' AS tipo, {_COLUMNAS_PAR}
+    FROM modulo_horarios ha
+    JOIN modulos ma ON ma.id = ha.modulo_id
+    JOIN modulo_horarios hb ON hb.dia = ha.dia AND hb.modulo_id <> ha.modulo_id
+         AND hb.minuto_inicio < ha.minuto_fin AND ha.minuto_inicio < hb.minuto_fin
+    JOIN modulos mb ON mb.id = hb.modulo_id AND {regla}
+    LEFT JOIN docentes da ON da.id = ma.docente_id
+    LEFT JOIN docentes db ON db.id = mb.docente_id
+    LEFT JOIN salas sa ON sa.id = ma.sala_id
+    LEFT JOIN salas sb ON sb.id = mb.sala_id
+    LEFT JOIN carreras ca ON ca.id = ma.carrera_id
+    LEFT JOIN carreras cb ON cb.id = mb.carrera_id
+""" for tipo, regla in _REGLAS_CONFLICTO.items())
+
+
+def _par_conflicto(fila):
+    """ParConflicto desde una fila de _CONSULTA_PARES_EN_CONFLICTO"""
+    partes = {}
+    for columna, valor in fila.items():
+        prefijo, _, nombre = columna.partition('_')
+        if prefijo in ('ma', 'mb', 'ha', 'hb'):
+            partes.setdefault(prefijo, {})[nombre] = valor
+    ma, mb = partes['ma'], partes['mb']
+    ha = dict(partes['ha'], dia=fila['dia'], modulo_id=ma['id'])
+    hb = dict(partes['hb'], dia=fila['dia'], modulo_id=mb['id'])
+    slot_a, slot_b = Slot.desde_fila(ha), Slot.desde_fila(hb)
+    ha['slot'], hb['slot'] = slot_a, slot_b
+    solape = Slot(slot_a.dia, max(slot_a.inicio, slot_b.inicio), min(slot_a.fin, slot_b.fin))
+    return ParConflicto(fila['tipo'], solape, ma, ha, mb, hb)
+
+
+def _patron_like(texto, prefijo=False):
+    """Patrón LIKE (con ESCAPE '!') que busca `texto` literal: al inicio o en cualquier parte"""
+    escapado = texto.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+    return f"{escapado}%" if prefijo else f"%{escapado}%"
+
+
+def _con_slots(filas):
+    """Agrega a cada fila de horario su Slot normalizado en la clave 'slot'"""
+    for fila in filas or ():
+        fila['slot'] = Slot.desde_fila(fila)
+    return filas
+
 
 class SistemaDAO:
     def __init__(self):
         self.db = Database()
+        # Caché de catálogos (salas, docentes, carreras); DB_CACHE_TTL=0 la desactiva
+        self.cache = CacheTTL(
+            ttl=float(os.getenv('DB_CACHE_TTL', 30)),
+            max_entradas=int(os.getenv('DB_CACHE_MAX', 256)),
+        )
+        # Cada cuántos segundos la caché revisa version_datos por escrituras
+        # de otros procesos (0 = en cada lectura)
+        self.intervalo_versiones = float(os.getenv('DB_VERSION_CHECK', 1))
+        self._versiones_lock = threading.Lock()
+        self._versiones_vistas = None
+        self._ultima_revision = 0.0
+        # Subidas de versión confirmadas por este proceso desde la última revisión
+        self._cambios_propios = Counter()
+        self._snapshot = None
+        self._indice = None
+        self._indice_generacion = 0
+        self._indice_lock = threading.Lock()
+        self._registro_conflictos = None
+        self._registro_generacion = 0
+        self._registro_lock = threading.Lock()
+
+    def transaction(self):
+        """
+        Agrupa varias escrituras del DAO en una sola transacción:
+
+            with dao.transaction():
+                dao.guardar_docente(...)
+                dao.guardar_disponibilidad_docente(...)
+
+        Las llamadas anidadas se unen a la transacción externa (un solo commit).
+        """
+        return self.db.transaction()
+
+    def _cacheado(self, clave, cargar):
+        """Lectura a través de la caché; dentro de una transacción va directo a la base"""
+        if self.db.en_transaccion():
+            return cargar()
+        self._revisar_versiones()
+        return self.cache.obtener(clave, cargar)
+
+    def _invalidar(self, *tablas):
+        """Invalida la caché de esas tablas (todas si no se indica) cuando la escritura quede confirmada"""
+        for tabla in list(tablas):
+            tablas += _DEPENDENCIAS_CACHE.get(tabla, ())
+        self.db.al_confirmar(lambda: self.cache.invalidar(*tablas))
+
+    def _registrar_cambio(self, *tablas, cursor=None):
+        """
+        Sube la versión de `tablas` (todas si no se indica) en la transacción
+        en curso, con `cursor` si se da, e invalida la caché local tras el commit.
+        """
+        if not tablas:
+            # Cambio masivo: el índice de búsqueda y el registro de conflictos
+            # se reconstruyen en la próxima lectura
+            self.db.al_confirmar(self._descartar_indice)
+            self.db.al_confirmar(self._descartar_registro_conflictos)
+        tablas = tablas or TABLAS_VERSIONADAS
+        query = f"UPDATE version_datos SET version = version + 1 WHERE tabla IN ({', '.join(['%s'] * len(tablas))})"
+        if cursor is not None:
+            cursor.execute(query, tablas)
+        else:
+            self.db.execute_query(query, tablas)
+        self._invalidar(*tablas)
+        self.db.al_confirmar(lambda: self._contar_cambios_propios(tablas))
+
+    def _contar_cambios_propios(self, tablas):
+        with self._versiones_lock:
+            self._cambios_propios.update(tablas)
+
+    def versiones_datos(self):
+        """
+        {tabla: versión} con una sola consulta. Dos lecturas iguales garantizan
+        que ninguna escritura del DAO se confirmó entre ambas. None si la tabla
+        version_datos aún no existe.
+        """
+        try:
+            filas = self.db.execute_query("SELECT tabla, version FROM version_datos", fetch=True)
+        except ConsultaError:
+            return None
+        return {fila['tabla']: fila['version'] for fila in filas or []}
+
+    def hay_cambios(self, versiones, tablas=None):
+        """True si alguna de `tablas` (todas si no se indica) cambió desde `versiones`"""
+        actuales = self.versiones_datos()
+        if actuales is None or versiones is None:
+            return True
+        return any(actuales.get(t) != versiones.get(t) for t in (tablas or actuales))
+
+    def _revisar_versiones(self):
+        """Invalida la caché de las tablas que otro proceso modificó (a lo más cada intervalo_versiones)"""
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < self.intervalo_versiones:
+            return
+        self._ultima_revision = ahora
+        actuales = self.versiones_datos()
+        if actuales is None:
+            return
+        with self._versiones_lock:
+            previas, self._versiones_vistas = self._versiones_vistas, actuales
+            propios, self._cambios_propios = self._cambios_propios, Counter()
+        if previas is None:
+            return
+        # Las escrituras propias ya invalidaron al confirmarse; ante la duda
+        # (un commit propio aún sin contar) se trata como externa
+        cambiadas = tuple(t for t, v in actuales.items() if previas.get(t, 0) + propios[t] != v)
+        if cambiadas:
+            if any(t in _CONSULTAS_INDICE for t in cambiadas):
+                self._descartar_indice()
+            if 'modulos' in cambiadas or 'modulo_horarios' in cambiadas:
+                self._descartar_registro_conflictos()
+            for tabla in list(cambiadas):
+                cambiadas += _DEPENDENCIAS_CACHE.get(tabla, ())
+            logging.info(f"Datos modificados externamente ({', '.join(cambiadas)}); se invalida la caché")
+            self.cache.invalidar(*cambiadas)
+
+    def estadisticas_cache(self):
+        """Aciertos, fallos, desalojos, etc. de la caché de catálogos"""
+        return self.cache.estadisticas()
+
+    # --- Índice de búsqueda (ver busqueda.py) ---
+
+    def indice_busqueda(self):
+        """
+        Índice de búsqueda por nombre/código de docentes, carreras, salas y
+        módulos. Se construye en la primera búsqueda, se actualiza con cada
+        guardado o borrado de este DAO y se reconstruye si otro proceso
+        modifica esas tablas.
+        """
+        self._revisar_versiones()
+        indice = self._indice
+        if indice is not None:
+            return indice
+
+        with self._indice_lock:
+            generacion = self._indice_generacion
+        inicio = time.perf_counter()
+        indice = IndiceBusqueda()
+        for tipo, query in _CONSULTAS_INDICE.values():
+            for fila in self.db.execute_query(query, fetch=True) or []:
+                indice.agregar(tipo, fila['id'], fila['nombre'], fila.get('codigo'))
+        logging.info(f"Índice de búsqueda construido en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+                     f"({len(indice)} entradas)")
+        with self._indice_lock:
+            # Un cambio confirmado durante la construcción puede no estar incluido
+            if generacion == self._indice_generacion:
+                self._indice = indice
+        return indice
+
+    def buscar_texto(self, texto, tipo=None, limite=20, umbral=0.6):
+        """
+        Búsqueda insensible a tildes y mayúsculas con tolerancia a errores de
+        tipeo. `tipo`: 'docente', 'carrera', 'sala' o 'modulo'. Retorna
+        [(puntaje, id)] (o [(puntaje, (tipo, id))] sin `tipo`), mejores primero.
+        """
+        return self.indice_busqueda().buscar(texto, tipo=tipo, limite=limite, umbral=umbral)
+
+    def _descartar_indice(self):
+        with self._indice_lock:
+            self._indice_generacion += 1
+            self._indice = None
+
+    def _reindexar(self, tipo, id_, *textos):
+        """Actualiza la entrada del índice tras el commit; sin `textos` la elimina"""
+        def aplicar():
+            with self._indice_lock:
+                self._indice_generacion += 1
+                indice = self._indice
+            if indice is None:
+                return
+            if textos:
+                indice.agregar(tipo, id_, *textos)
+            else:
+                indice.eliminar(tipo, id_)
+        self.db.al_confirmar(aplicar)
 
     def inicializar_base_de_datos(self):
         logging.info("Inicializando base de datos...")
@@ -67,135 +897,15 @@ class SistemaDAO:
         db_tiene_datos = False
         
         try:
-            # Add connection timeout to prevent freezing
-            conn = pymysql.connect(
-                host=self.db.host,
-                user=self.db.user,
-                password=self.db.password,
-                connect_timeout=5,  # 5 second timeout
-                charset='utf8mb4'
-            )
-            cursor = conn.cursor()
-            
-            # Verificar si la base de datos existe
-            cursor.execute(f"SHOW DATABASES LIKE '{self.db.database}'")
-            db_existe = cursor.fetchone() is not None
-            
-            if db_existe:
-                logging.info(f"Base de datos '{self.db.database}' ya existe.")
-            else:
-                logging.info(f"Base de datos '{self.db.database}' no existe. Creando...")
-                cursor.execute(f"CREATE DATABASE {self.db.database} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-                logging.info(f"Base de datos '{self.db.database}' creada exitosamente.")
-            
-            cursor.close()
-            conn.close()
+            db_existe = self.db.dialecto.asegurar_base_de_datos()
         except Exception as e:
             error_msg = f"FATAL: No se pudo crear o asegurar la base de datos: {e}"
             logging.error(error_msg)
-            raise Exception(f"Error de conexión a MySQL. Asegúrate de que XAMPP esté corriendo.\\nDetalle: {e}")
-
-        logging.info("Creando/verificando tablas...")
-        tablas_sql = [
-            """
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                nombre VARCHAR(255),
-                rol VARCHAR(50)
-            ) ENGINE=InnoDB;
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS salas (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(255) NOT NULL,
-                capacidad INT,
-                tipo VARCHAR(100)
-            ) ENGINE=InnoDB;
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS carreras (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(255) NOT NULL,
-                jornada VARCHAR(50),
-                alumnos_proyectados INT
-            ) ENGINE=InnoDB;
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS docentes (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(255) NOT NULL,
-                titulo VARCHAR(255),
-                contrato VARCHAR(50),
-                horas_contratadas INT,
-                email VARCHAR(255) UNIQUE,
-                evaluacion DECIMAL(3,2)
-            ) ENGINE=InnoDB;
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS modulos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(255) NOT NULL,
-                codigo VARCHAR(50),
-                horas_teoricas INT,
-                horas_practicas INT,
-                alumnos_proyectados INT,
-                semestre INT,
-                carrera_id INT,
-                docente_id INT,
-                sala_id INT,
-                FOREIGN KEY (carrera_id) REFERENCES carreras(id) ON DELETE SET NULL,
-                FOREIGN KEY (docente_id) REFERENCES docentes(id) ON DELETE SET NULL,
-                FOREIGN KEY (sala_id) REFERENCES salas(id) ON DELETE SET NULL
-            ) ENGINE=InnoDB;
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS carrera_semestres (
-                carrera_id INT,
-                semestre INT,
-                PRIMARY KEY (carrera_id, semestre),
-                FOREIGN KEY (carrera_id) REFERENCES carreras(id) ON DELETE CASCADE
-            ) ENGINE=InnoDB;
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS carrera_salas (
-                carrera_id INT,
-                sala_id INT,
-                PRIMARY KEY (carrera_id, sala_id),
-                FOREIGN KEY (carrera_id) REFERENCES carreras(id) ON DELETE CASCADE,
-                FOREIGN KEY (sala_id) REFERENCES salas(id) ON DELETE CASCADE
-            ) ENGINE=InnoDB;
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS modulo_horarios (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                modulo_id INT,
-                dia VARCHAR(20),
-                hora_inicio VARCHAR(10),
-                hora_fin VARCHAR(10),
-                FOREIGN KEY (modulo_id) REFERENCES modulos(id) ON DELETE CASCADE
-            ) ENGINE=InnoDB;
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS disponibilidad_docentes (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                docente_id INT,
-                dia VARCHAR(20),
-                hora VARCHAR(10),
-                estado VARCHAR(20),
-                FOREIGN KEY (docente_id) REFERENCES docentes(id) ON DELETE CASCADE
-            ) ENGINE=InnoDB;
-            """
-        ]
-        
-        for tabla_query in tablas_sql:
-            try:
-                self.db.execute_query(tabla_query)
-            except Exception as e:
-                logging.error(f"Error creando tabla: {e} | Query: {tabla_query[:50]}...")
+            raise Exception(f"Error de conexión a la base de datos ({self.db.dialecto.nombre}). Asegúrate de que XAMPP esté corriendo.\\nDetalle: {e}")
 
-        logging.info("Tablas creadas o verificadas exitosamente.")
+        # Esquema: migraciones versionadas (no ejecuta DDL si ya está al día)
+        from migraciones import migrar
+        migrar(self.db)
 
         # Verificar si existe el usuario admin
         try:
@@ -270,8 +980,13 @@ class SistemaDAO:
                         
                         for row in rows:
                             values = [row[col] for col in columns]
-                            self.db.execute_query(query, tuple(values))
+                            try:
+                                self.db.execute_query(query, tuple(values))
+                            except ConsultaError:
+                                # Fila inválida o duplicada: se omite y se sigue con el resto
+                                continue
                             
+                self._registrar_cambio()
                 logging.info("Datos iniciales cargados exitosamente.")
                 return True
             except Exception as e:
@@ -299,6 +1014,7 @@ class SistemaDAO:
         self._completar_disponibilidad_docentes()
         self._completar_horarios_modulos()
         self._completar_codigos_modulos()
+        self._registrar_cambio()
         
         logging.info("Población de datos de prueba completada.")
     
@@ -367,15 +1083,12 @@ class SistemaDAO:
         ]
         
         for nombre, jornada, alumnos, duracion, salas_ids in carreras:
-            # Insertar carrera
-            result = self.db.execute_query(
+            # Insertar carrera y obtener su ID en la misma conexión
+            carrera_id = self.db.execute_insert(
                 "INSERT INTO carreras (nombre, jornada, alumnos_proyectados) VALUES (%s, %s, %s)",
                 (nombre, jornada, alumnos)
             )
             
-            # Obtener el ID de la carrera recién creada
-            carrera_id = self.db.execute_query("SELECT LAST_INSERT_ID() as id", fetch=True)[0]['id']
-            
             # Insertar semestres
             for sem in range(1, duracion + 1):
                 self.db.execute_query(
@@ -502,37 +1215,65 @@ class SistemaDAO:
         result = self.db.execute_query(query, (email, password), fetch=True)
         return result[0] if result else None
     
+    def _catalogo(self, tabla):
+        """(filas ordenadas por nombre, {id: fila}) de un catálogo, vía caché"""
+        def cargar():
+            filas = self.db.execute_query(f"SELECT * FROM {tabla} ORDER BY nombre", fetch=True,
+                                          registro=_REGISTROS_CATALOGO[tabla])
+            return filas, {fila['id']: fila for fila in filas}
+        return self._cacheado((tabla,), cargar)
+
+    def _fila_catalogo(self, tabla, fila_id):
+        fila = self._catalogo(tabla)[1].get(fila_id)
+        return fila.copy() if fila else None
+
+    # Se entregan copias: quien las reciba puede modificarlas sin tocar la caché
     def obtener_salas(self):
-        query = "SELECT * FROM salas ORDER BY nombre"
-        return self.db.execute_query(query, fetch=True)
+        return [fila.copy() for fila in self._catalogo('salas')[0]]
     
     def obtener_docentes(self):
-        query = "SELECT * FROM docentes ORDER BY nombre"
-        return self.db.execute_query(query, fetch=True)
+        return [fila.copy() for fila in self._catalogo('docentes')[0]]
     
     def obtener_carreras(self):
-        query = "SELECT * FROM carreras ORDER BY nombre"
-        return self.db.execute_query(query, fetch=True)
+        return [fila.copy() for fila in self._catalogo('carreras')[0]]
+
+    def obtener_sala_por_id(self, sala_id):
+        """Obtiene una sala por su ID"""
+        return self._fila_catalogo('salas', sala_id)
+
+    def obtener_carrera_por_id(self, carrera_id):
+        """Obtiene una carrera por su ID"""
+        return self._fila_catalogo('carreras', carrera_id)
 
     def obtener_semestres_carrera(self, carrera_id):
         """Obtiene los semestres de una carrera específica"""
-        query = """SELECT semestre FROM carrera_semestres 
-                  WHERE carrera_id = %s ORDER BY semestre"""
-        result = self.db.execute_query(query, (carrera_id,), fetch=True)
-        return [item['semestre'] for item in result] if result else []
+        def cargar():
+            query = """SELECT semestre FROM carrera_semestres 
+                      WHERE carrera_id = %s ORDER BY semestre"""
+            result = self.db.execute_query(query, (carrera_id,), fetch=True)
+            return [item['semestre'] for item in result] if result else []
+        return list(self._cacheado(('carrera_semestres', carrera_id), cargar))
 
     def obtener_salas_carrera(self, carrera_id):
         """Obtiene las salas asignadas a una carrera"""
-        query = """SELECT s.* FROM salas s 
-                  INNER JOIN carrera_salas cs ON s.id = cs.sala_id
-                  WHERE cs.carrera_id = %s ORDER BY s.nombre"""
-        return self.db.execute_query(query, (carrera_id,), fetch=True)
+        def cargar():
+            query = """SELECT s.* FROM salas s 
+                      INNER JOIN carrera_salas cs ON s.id = cs.sala_id
+                      WHERE cs.carrera_id = %s ORDER BY s.nombre"""
+            return self.db.execute_query(query, (carrera_id,), fetch=True, registro=Sala)
+        return [fila.copy() for fila in self._cacheado(('carrera_salas', carrera_id), cargar)]
 
-    def obtener_horarios_modulo(self, modulo_id):
-        """Obtiene los horarios de un módulo"""
-        query = """SELECT dia, hora_inicio, hora_fin FROM modulo_horarios 
-                  WHERE modulo_id = %s ORDER BY dia, hora_inicio"""
-        return self.db.execute_query(query, (modulo_id,), fetch=True)
+    def obtener_snapshot(self):
+        """
+        Foto inmutable de todo el sistema con índices por entidad (ver snapshot.py).
+        Se reutiliza la última mientras version_datos no cambie: revalidarla
+        cuesta una consulta de pocas filas.
+        """
+        actual = self._snapshot
+        if actual is not None and actual.versiones is not None and not self.hay_cambios(actual.versiones):
+            return actual
+        self._snapshot = SistemaSnapshot.cargar(self)
+        return self._snapshot
 
     def obtener_modulos_carrera(self, carrera_id):
         """Obtiene todos los módulos de una carrera específica"""
@@ -541,7 +1282,7 @@ class SistemaDAO:
                    LEFT JOIN docentes d ON m.docente_id = d.id 
                    LEFT JOIN salas s ON m.sala_id = s.id 
                    WHERE m.carrera_id = %s"""
-        return self.db.execute_query(query, (carrera_id,), fetch=True)
+        return self.db.execute_query(query, (carrera_id,), fetch=True, registro=Modulo)
 
     def obtener_modulos(self):
         """Obtiene todos los módulos registrados"""
@@ -549,7 +1290,109 @@ class SistemaDAO:
                    FROM modulos m 
                    LEFT JOIN docentes d ON m.docente_id = d.id 
                    LEFT JOIN salas s ON m.sala_id = s.id"""
-        return self.db.execute_query(query, fetch=True)
+        return self.db.execute_query(query, fetch=True, registro=Modulo)
+
+    def _pagina(self, columnas, desde, condiciones, params, limite, despues, con_total, alias):
+        """
+        Una página ordenada por (nombre, id) con cursor keyset: `despues` es el
+        (nombre, id) de la última fila de la página anterior, así cada página
+        cuesta lo mismo sin importar cuántas se hayan leído.
+        """
+        limite = max(1, int(limite))
+        where = " WHERE " + " AND ".join(condiciones) if condiciones else ""
+
+        total = None
+        if con_total:
+            fila = self.db.execute_query(f"SELECT COUNT(*) AS total FROM {desde}{where}", tuple(params), fetch=True)
+            total = fila[0]['total'] if fila else 0
+
+        condiciones_pagina, params_pagina = list(condiciones), list(params)
+        if despues is not None:
+            condiciones_pagina.append(f"({alias}.nombre > %s OR ({alias}.nombre = %s AND {alias}.id > %s))")
+            params_pagina.extend((despues[0], despues[0], despues[1]))
+        query = f"SELECT {columnas} FROM {desde}"
+        if condiciones_pagina:
+            query += " WHERE " + " AND ".join(condiciones_pagina)
+        # Una fila extra indica si hay página siguiente
+        query += f" ORDER BY {alias}.nombre, {alias}.id LIMIT {limite + 1}"
+        filas = self.db.execute_query(query, tuple(params_pagina), fetch=True) or []
+
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = (filas[-1]['nombre'], filas[-1]['id'])
+        return {'filas': filas, 'total': total, 'siguiente': siguiente}
+
+    def buscar_docentes_pagina(self, filtro="", limite=50, despues=None, prefijo=False, con_total=True):
+        """
+        Docentes cuyo nombre contiene `filtro` (o empieza con él si `prefijo`),
+        filtrados en el servidor y paginados por nombre.
+        Retorna {'filas', 'total', 'siguiente'}; pasar 'siguiente' como
+        `despues` para la página que sigue (None si no hay más).
+        """
+        condiciones, params = [], []
+        if filtro:
+            condiciones.append("d.nombre LIKE %s ESCAPE '!'")
+            params.append(_patron_like(filtro, prefijo))
+        return self._pagina("d.*", "docentes d", condiciones, params,
+                            limite, despues, con_total, alias='d')
+
+    def buscar_modulos_pagina(self, texto="", limite=50, despues=None, carrera_id=None, prefijo=False, con_total=True):
+        """
+        Módulos cuyo nombre o código contiene `texto` (o empieza con él si
+        `prefijo`), con nombres de carrera, docente y sala, paginados por
+        nombre. Mismo formato de retorno que buscar_docentes_pagina.
+        """
+        condiciones, params = [], []
+        if texto:
+            patron = _patron_like(texto, prefijo)
+            condiciones.append("(m.nombre LIKE %s ESCAPE '!' OR m.codigo LIKE %s ESCAPE '!')")
+            params.extend((patron, patron))
+        if carrera_id is not None:
+            condiciones.append("m.carrera_id = %s")
+            params.append(carrera_id)
+        columnas = "m.*, c.nombre as carrera_nombre, d.nombre as docente_nombre, s.nombre as sala_nombre"
+        desde = """modulos m
+                   LEFT JOIN carreras c ON m.carrera_id = c.id
+                   LEFT JOIN docentes d ON m.docente_id = d.id
+                   LEFT JOIN salas s ON m.sala_id = s.id"""
+        return self._pagina(columnas, desde, condiciones, params, limite, despues, con_total, alias='m')
+
+    def buscar_indice_pagina(self, texto, tipo, limite=50, despues=None, umbral=0.6):
+        """
+        Página de resultados del índice de búsqueda (ver buscar_texto), por
+        relevancia. Mismo formato que _pagina, con `siguiente` = posición desde
+        la que sigue. Los módulos traen carrera_nombre, docente_nombre y sala_nombre.
+        """
+        ids = [id_ for _, id_ in self.buscar_texto(texto, tipo=tipo, limite=None, umbral=umbral)]
+        desde = despues or 0
+        if tipo == 'modulo':
+            por_id = self.obtener_snapshot().modulo_por_id
+        else:
+            por_id = self._catalogo(f"{tipo}s")[1]
+        filas = [dict(por_id[i]) for i in ids[desde:desde + limite] if i in por_id]
+        siguiente = desde + limite if desde + limite < len(ids) else None
+        return {'filas': filas, 'total': len(ids), 'siguiente': siguiente}
+
+    def iter_modulos(self, chunk_size=None):
+        """Itera todos los módulos (ordenados por carrera y semestre) sin cargarlos en memoria"""
+        query = """SELECT m.*, d.nombre as docente_nombre, s.nombre as sala_nombre 
+                   FROM modulos m 
+                   LEFT JOIN docentes d ON m.docente_id = d.id 
+                   LEFT JOIN salas s ON m.sala_id = s.id
+                   ORDER BY m.carrera_id, m.semestre, m.id"""
+        return self.db.iter_query(query, chunk_size=chunk_size, registro=Modulo)
+
+    def iter_horarios_modulos(self, chunk_size=None):
+        """Itera los horarios de todos los módulos, ordenados por módulo"""
+        query = "SELECT * FROM modulo_horarios ORDER BY modulo_id, id"
+        return self.db.iter_query(query, chunk_size=chunk_size, registro=Horario)
+
+    def iter_disponibilidad_docentes(self, chunk_size=None):
+        """Itera la disponibilidad de todos los docentes, ordenada por docente"""
+        query = """SELECT docente_id, dia, hora, estado FROM disponibilidad_docentes
+                   ORDER BY docente_id, id"""
+        return self.db.iter_query(query, chunk_size=chunk_size)
 
     def obtener_disponibilidad_docente(self, docente_id):
         """Obtiene la disponibilidad horaria de un docente"""
@@ -567,40 +1410,36 @@ class SistemaDAO:
                 disponibilidad[dia][hora] = (row['estado'] == 'disponible')
         return disponibilidad
 
-    def guardar_modulo(self, modulo_data, horarios, modulo_id=None):
+    def guardar_modulo(self, modulo_data, horarios, modulo_id=None, _reintento=False):
         """Guarda un módulo (nuevo o existente) con sus horarios"""
-        connection = self.db.get_connection()
-        if not connection:
-            return None
-        
-        cursor = None
+        modulo_id_original = modulo_id
         try:
-            cursor = connection.cursor()
-            
-            if modulo_id:
-                # Actualizar módulo
-                query = """UPDATE modulos SET nombre = %s, codigo = %s, horas_teoricas = %s,
-                          horas_practicas = %s, alumnos_proyectados = %s, carrera_id = %s,
-                          semestre = %s, docente_id = %s, sala_id = %s WHERE id = %s"""
-                cursor.execute(query, (*modulo_data, modulo_id))
-            else:
-                # Insertar nuevo módulo
-                query = """INSERT INTO modulos (nombre, codigo, horas_teoricas, horas_practicas,
-                          alumnos_proyectados, carrera_id, semestre, docente_id, sala_id) 
-                          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-                cursor.execute(query, modulo_data)
-                modulo_id = cursor.lastrowid
-            
-            # Actualizar horarios
-            cursor.execute("DELETE FROM modulo_horarios WHERE modulo_id = %s", (modulo_id,))
-            horario_data = [(modulo_id, horario['dia'], horario['hora_inicio'], horario['hora_fin']) 
-                           for horario in horarios]
-            if horario_data:
-                cursor.executemany("""INSERT INTO modulo_horarios 
-                                    (modulo_id, dia, hora_inicio, hora_fin) 
-                                    VALUES (%s, %s, %s, %s)""", horario_data)
-            
-            connection.commit()
+            with self.transaction() as connection, self.db.cursor(connection) as cursor:
+                if modulo_id:
+                    # Actualizar módulo
+                    query = """UPDATE modulos SET nombre = %s, codigo = %s, horas_teoricas = %s,
+                              horas_practicas = %s, alumnos_proyectados = %s, carrera_id = %s,
+                              semestre = %s, docente_id = %s, sala_id = %s WHERE id = %s"""
+                    cursor.execute(query, (*modulo_data, modulo_id))
+                else:
+                    # Insertar nuevo módulo
+                    query = """INSERT INTO modulos (nombre, codigo, horas_teoricas, horas_practicas,
+                              alumnos_proyectados, carrera_id, semestre, docente_id, sala_id) 
+                              VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+                    cursor.execute(query, modulo_data)
+                    modulo_id = cursor.lastrowid
+                
+                # Actualizar horarios
+                cursor.execute("DELETE FROM modulo_horarios WHERE modulo_id = %s", (modulo_id,))
+                horario_data = [(modulo_id, horario['dia'], horario['hora_inicio'], horario['hora_fin']) 
+                               for horario in horarios]
+                if horario_data:
+                    cursor.executemany("""INSERT INTO modulo_horarios 
+                                        (modulo_id, dia, hora_inicio, hora_fin) 
+                                        VALUES (%s, %s, %s, %s)""", horario_data)
+                self._registrar_cambio('modulos', 'modulo_horarios', cursor=cursor)
+                self._reindexar('modulo', modulo_id, modulo_data[0], modulo_data[1])
+                self._actualizar_registro_conflictos(modulo_id)
             return modulo_id
             
         except Error as e:
@@ -614,7 +1453,9 @@ class SistemaDAO:
                 if isinstance(e.args[0], int):
                     error_code = e.args[0]
             
-            if error_code == 1146 and "modulo_horarios" in str(e):
+            # El CREATE TABLE hace commit implícito: sólo fuera de una transacción externa
+            if (error_code == 1146 and "modulo_horarios" in str(e) and not _reintento
+                    and self.db._transaccion_actual() is None):
                 logging.warning("⚠️ Tabla 'modulo_horarios' no existe. Creando automáticamente...")
                 try:
                     create_table_query = """
@@ -627,267 +1468,271 @@ class SistemaDAO:
                         FOREIGN KEY (modulo_id) REFERENCES modulos(id) ON DELETE CASCADE
                     ) ENGINE=InnoDB;
                     """
-                    cursor.execute(create_table_query)
-                    connection.commit()
+                    self.db.execute_query(create_table_query)
                     logging.info("✅ Tabla 'modulo_horarios' creada exitosamente. Reintentando guardado...")
-                    
-                    # Retry insertion
-                    cursor.execute("DELETE FROM modulo_horarios WHERE modulo_id = %s", (modulo_id,))
-                    if horario_data:
-                        cursor.executemany("""INSERT INTO modulo_horarios 
-                                            (modulo_id, dia, hora_inicio, hora_fin) 
-                                            VALUES (%s, %s, %s, %s)""", horario_data)
-                    connection.commit()
-                    logging.info(f"✅ Guardado exitoso después de crear tabla. modulo_id={modulo_id}")
-                    return modulo_id
                 except Exception as ex:
                     logging.error(f"❌ Error fatal creando/guardando en modulo_horarios: {ex}")
-                    connection.rollback()
                     return None
+                return self.guardar_modulo(modulo_data, horarios, modulo_id_original, _reintento=True)
             
             logging.error(f"Error guardando módulo (no es tabla faltante): {e}")
-            connection.rollback()
             return None
+        except DatabaseError:
+            raise
         except Exception as e:
             logging.error(f"Error inesperado en guardar_modulo: {type(e).__name__} - {str(e)}")
-            if connection:
-                connection.rollback()
             return None
-        finally:
-            if cursor:
-                cursor.close()
 
     def eliminar_modulo(self, modulo_id):
         """Elimina un módulo y sus horarios asociados"""
-        connection = self.db.get_connection()
-        if not connection:
-            return False
-        
-        cursor = None
         try:
-            cursor = connection.cursor()
-            
-            # 1. Eliminar horarios asociados
-            cursor.execute("DELETE FROM modulo_horarios WHERE modulo_id = %s", (modulo_id,))
-            
-            # 2. Eliminar el módulo
-            cursor.execute("DELETE FROM modulos WHERE id = %s", (modulo_id,))
-            
-            connection.commit()
+            with self.transaction() as connection, self.db.cursor(connection) as cursor:
+                # 1. Eliminar horarios asociados
+                cursor.execute("DELETE FROM modulo_horarios WHERE modulo_id = %s", (modulo_id,))
+                
+                # 2. Eliminar el módulo
+                cursor.execute("DELETE FROM modulos WHERE id = %s", (modulo_id,))
+                self._registrar_cambio('modulos', 'modulo_horarios', cursor=cursor)
+                self._reindexar('modulo', modulo_id)
+                self._actualizar_registro_conflictos(modulo_id)
             return True
             
         except Error as e:
             logging.error(f"Error eliminando módulo: {e}")
-            connection.rollback()
             return False
-        finally:
-            if cursor:
-                cursor.close()
 
-    def obtener_horas_asignadas_docente(self, docente_id):
-        """Calcula el total de horas asignadas a un docente"""
+    def obtener_carga_docentes(self, docente_ids=None):
+        """
+        Carga de todos los docentes (o sólo de `docente_ids`) en una sola consulta.
+        Retorna {docente_id: {'horas_asignadas', 'horas_cronologicas',
+        'horas_contratadas', 'porcentaje', 'modulos'}}; 'porcentaje' compara
+        horas académicas asignadas con las contratadas, como en la vista de docentes.
+        """
         query = """
-            SELECT SUM(horas_teoricas + horas_practicas) as total_horas
-            FROM modulos
-            WHERE docente_id = %s
+            SELECT d.id AS docente_id, d.horas_contratadas,
+                   COUNT(m.id) AS modulos,
+                   SUM(m.horas_teoricas + m.horas_practicas) AS total_horas
+            FROM docentes d
+            LEFT JOIN modulos m ON m.docente_id = d.id
         """
-        result = self.db.execute_query(query, (docente_id,), fetch=True)
-        if result and result[0]['total_horas'] is not None:
-            return int(result[0]['total_horas'])
-        return 0
-
-    def guardar_disponibilidad_docente(self, docente_id, disponibilidad):
-        """Guarda la disponibilidad horaria de un docente"""
-        connection = self.db.get_connection()
-        if not connection:
-            return False
-        
-        cursor = None
-        try:
-            cursor = connection.cursor()
-            
-            # Eliminar disponibilidad existente
-            cursor.execute("DELETE FROM disponibilidad_docentes WHERE docente_id = %s", (docente_id,))
-            
-            # Insertar nueva disponibilidad
-            insert_data = []
-            for dia, horas in disponibilidad.items():
-                for hora, disponible in horas.items():
-                    insert_data.append((docente_id, dia, hora, disponible))
-            
-            if insert_data:
-                cursor.executemany("""INSERT INTO disponibilidad_docentes 
-                                    (docente_id, dia, hora, disponible) 
-                                    VALUES (%s, %s, %s, %s)""", insert_data)
-            
-            connection.commit()
-            return True
-            
-        except Error as e:
-            logging.error(f"Error guardando disponibilidad: {e}")
-            connection.rollback()
-            return False
-        finally:
-            if cursor:
-                cursor.close()
+        params = ()
+        if docente_ids is not None:
+            params = tuple(dict.fromkeys(docente_ids))
+            if not params:
+                return {}
+            query += f" WHERE d.id IN ({', '.join(['%s'] * len(params))})"
+        query += " GROUP BY d.id, d.horas_contratadas"
+        carga = {}
+        for fila in self.db.execute_query(query, params, fetch=True) or []:
+            asignadas = int(fila['total_horas'] or 0)
+            contratadas = fila['horas_contratadas'] or 0
+            carga[fila['docente_id']] = {
+                'horas_asignadas': asignadas,
+                # Hora académica = 45 minutos
+                'horas_cronologicas': asignadas * 0.75,
+                'horas_contratadas': contratadas,
+                'porcentaje': (asignadas / contratadas * 100) if contratadas > 0 else 0,
+                'modulos': fila['modulos'],
+            }
+        return carga
+
+    def obtener_kpis_dashboard(self):
+        """
+        Indicadores del dashboard en una sola consulta: totales por entidad,
+        módulos sin docente o sin sala, docentes sobrecargados (más horas
+        asignadas que contratadas), salas al límite (algún módulo con tantos
+        alumnos proyectados como capacidad o más) y módulos con conflicto.
+        """
+        query = f"""
+            SELECT
+                (SELECT COUNT(*) FROM salas) AS salas,
+                (SELECT COUNT(*) FROM carreras) AS carreras,
+                (SELECT COUNT(*) FROM docentes) AS docentes,
+                (SELECT COUNT(*) FROM modulos) AS modulos,
+                (SELECT COUNT(*) FROM modulos WHERE docente_id IS NULL) AS modulos_sin_docente,
+                (SELECT COUNT(*) FROM modulos WHERE sala_id IS NULL) AS modulos_sin_sala,
+                (SELECT COUNT(*) FROM (
+                    SELECT d.id FROM docentes d
+                    JOIN modulos m ON m.docente_id = d.id
+                    WHERE d.horas_contratadas > 0
+                    GROUP BY d.id, d.horas_contratadas
+                    HAVING SUM(COALESCE(m.horas_teoricas, 0) + COALESCE(m.horas_practicas, 0)) > d.horas_contratadas
+                ) sobrecargados) AS docentes_sobrecargados,
+                (SELECT COUNT(DISTINCT s.id) FROM salas s
+                    JOIN modulos m ON m.sala_id = s.id
+                    WHERE m.alumnos_proyectados >= s.capacidad) AS salas_al_limite,
+                ({_CONSULTA_MODULOS_CON_CONFLICTO}) AS modulos_con_conflicto
+        """
+        fila = self.db.execute_query(query, fetch=True)[0]
+        return {clave: int(valor or 0) for clave, valor in fila.items()}
+
+    def obtener_cubo_ocupacion(self, tipo='sala'):
+        """
+        Cubo de ocupación (analitica.CuboOcupacion) de salas o docentes por
+        día y bloque de la grilla, para heatmaps y rankings de utilización
+        """
+        # NumPy se importa sólo cuando se pide analítica
+        from analitica import CuboOcupacion
+        return CuboOcupacion.cargar(self, tipo)
+
+    def obtener_cubos_ocupacion(self):
+        """{'sala': cubo, 'docente': cubo} con una sola consulta de horarios"""
+        from analitica import CuboOcupacion
+        return CuboOcupacion.cargar_varios(self)
+
+    def resumen_utilizacion(self, umbral_ociosas=10.0):
+        """
+        {'salas': ..., 'docentes': ...} con uso promedio (%), hora punta
+        (dia, bloque, ocupadas) y cantidad con uso <= `umbral_ociosas`%.
+        En caché hasta que cambien módulos, horarios, salas o docentes.
+        """
+        def cargar():
+            return {f"{tipo}s": cubo.resumen(umbral_ociosas)
+                    for tipo, cubo in self.obtener_cubos_ocupacion().items()}
+        return self._cacheado(('utilizacion', umbral_ociosas), cargar)
 
     def guardar_docente(self, docente_data, docente_id=None):
         """Guarda un docente (nuevo o existente)"""
-        connection = self.db.get_connection()
-        if not connection:
-            return None
-        
-        cursor = None
         try:
-            cursor = connection.cursor()
-            
-            if docente_id:
-                # Actualizar docente existente
-                query = """UPDATE docentes SET nombre = %s, titulo = %s, contrato = %s,
-                          horas_contratadas = %s, email = %s, evaluacion = %s WHERE id = %s"""
-                cursor.execute(query, (*docente_data, docente_id))
-            else:
-                # Insertar nuevo docente
-                query = """INSERT INTO docentes (nombre, titulo, contrato, horas_contratadas, email, evaluacion) 
-                          VALUES (%s, %s, %s, %s, %s, %s)"""
-                cursor.execute(query, docente_data)
-                docente_id = cursor.lastrowid
-            
-            connection.commit()
+            with self.transaction() as connection, self.db.cursor(connection) as cursor:
+                if docente_id:
+                    # Actualizar docente existente
+                    query = """UPDATE docentes SET nombre = %s, titulo = %s, contrato = %s,
+                              horas_contratadas = %s, email = %s, evaluacion = %s WHERE id = %s"""
+                    cursor.execute(query, (*docente_data, docente_id))
+                else:
+                    # Insertar nuevo docente
+                    query = """INSERT INTO docentes (nombre, titulo, contrato, horas_contratadas, email, evaluacion) 
+                              VALUES (%s, %s, %s, %s, %s, %s)"""
+                    cursor.execute(query, docente_data)
+                    docente_id = cursor.lastrowid
+                self._registrar_cambio('docentes', cursor=cursor)
+                self._reindexar('docente', docente_id, docente_data[0])
             return docente_id
             
         except Error as e:
             logging.error(f"Error guardando docente: {e}")
-            connection.rollback()
             return None
-        finally:
-            if cursor:
-                cursor.close()
 
     def guardar_carrera(self, carrera_data, semestres_seleccionados, salas_seleccionadas, carrera_id=None):
         """Guarda una carrera (nueva o existente) - VERSIÓN CORREGIDA"""
-        connection = self.db.get_connection()
-        if not connection:
-            return None
-        
-        cursor = None
         try:
-            cursor = connection.cursor()
-            
-            if carrera_id:
-                # Actualizar carrera existente
-                query = """UPDATE carreras SET nombre = %s, jornada = %s, alumnos_proyectados = %s 
-                          WHERE id = %s"""
-                cursor.execute(query, (*carrera_data, carrera_id))
-            else:
-                # Insertar nueva carrera
-                query = """INSERT INTO carreras (nombre, jornada, alumnos_proyectados) 
-                          VALUES (%s, %s, %s)"""
-                cursor.execute(query, carrera_data)
-                carrera_id = cursor.lastrowid
+            with self.transaction() as connection, self.db.cursor(connection) as cursor:
+                if carrera_id:
+                    # Actualizar carrera existente
+                    query = """UPDATE carreras SET nombre = %s, jornada = %s, alumnos_proyectados = %s 
+                              WHERE id = %s"""
+                    cursor.execute(query, (*carrera_data, carrera_id))
+                else:
+                    # Insertar nueva carrera
+                    query = """INSERT INTO carreras (nombre, jornada, alumnos_proyectados) 
+                              VALUES (%s, %s, %s)"""
+                    cursor.execute(query, carrera_data)
+                    carrera_id = cursor.lastrowid
             
-            # ACTUALIZACIÓN CORREGIDA: Manejo inteligente de semestres
-            # Primero obtenemos los semestres actuales
-            cursor.execute("SELECT semestre FROM carrera_semestres WHERE carrera_id = %s", (carrera_id,))
-            semestres_actuales = [row['semestre'] for row in cursor.fetchall()]
+                # ACTUALIZACIÓN CORREGIDA: Manejo inteligente de semestres
+                # Primero obtenemos los semestres actuales
+                cursor.execute("SELECT semestre FROM carrera_semestres WHERE carrera_id = %s", (carrera_id,))
+                semestres_actuales = [row['semestre'] for row in cursor.fetchall()]
             
-            # Identificar semestres a eliminar y a agregar
-            semestres_a_eliminar = [sem for sem in semestres_actuales if sem not in semestres_seleccionados]
-            semestres_a_agregar = [sem for sem in semestres_seleccionados if sem not in semestres_actuales]
+                # Identificar semestres a eliminar y a agregar
+                semestres_a_eliminar = [sem for sem in semestres_actuales if sem not in semestres_seleccionados]
+                semestres_a_agregar = [sem for sem in semestres_seleccionados if sem not in semestres_actuales]
             
-            # Eliminar semestres que ya no están seleccionados
-            if semestres_a_eliminar:
-                placeholders = ','.join(['%s'] * len(semestres_a_eliminar))
-                query_eliminar = f"DELETE FROM carrera_semestres WHERE carrera_id = %s AND semestre IN ({placeholders})"
-                cursor.execute(query_eliminar, (carrera_id, *semestres_a_eliminar))
+                # Eliminar semestres que ya no están seleccionados
+                if semestres_a_eliminar:
+                    placeholders = ','.join(['%s'] * len(semestres_a_eliminar))
+                    query_eliminar = f"DELETE FROM carrera_semestres WHERE carrera_id = %s AND semestre IN ({placeholders})"
+                    cursor.execute(query_eliminar, (carrera_id, *semestres_a_eliminar))
             
-            # Agregar nuevos semestres (usando INSERT IGNORE para evitar duplicados)
-            for semestre in semestres_a_agregar:
-                cursor.execute("INSERT IGNORE INTO carrera_semestres (carrera_id, semestre) VALUES (%s, %s)", 
-                              (carrera_id, semestre))
+                # Agregar nuevos semestres (usando INSERT IGNORE para evitar duplicados)
+                for semestre in semestres_a_agregar:
+                    cursor.execute("INSERT IGNORE INTO carrera_semestres (carrera_id, semestre) VALUES (%s, %s)", 
+                                  (carrera_id, semestre))
             
-            # ACTUALIZACIÓN CORREGIDA: Manejo inteligente de salas
-            # Primero obtenemos las salas actuales
-            cursor.execute("SELECT sala_id FROM carrera_salas WHERE carrera_id = %s", (carrera_id,))
-            salas_actuales = [row['sala_id'] for row in cursor.fetchall()]
+                # ACTUALIZACIÓN CORREGIDA: Manejo inteligente de salas
+                # Primero obtenemos las salas actuales
+                cursor.execute("SELECT sala_id FROM carrera_salas WHERE carrera_id = %s", (carrera_id,))
+                salas_actuales = [row['sala_id'] for row in cursor.fetchall()]
             
-            # Identificar salas a eliminar y a agregar
-            salas_a_eliminar = [sala_id for sala_id in salas_actuales if sala_id not in salas_seleccionadas]
-            salas_a_agregar = [sala_id for sala_id in salas_seleccionadas if sala_id not in salas_actuales]
+                # Identificar salas a eliminar y a agregar
+                salas_a_eliminar = [sala_id for sala_id in salas_actuales if sala_id not in salas_seleccionadas]
+                salas_a_agregar = [sala_id for sala_id in salas_seleccionadas if sala_id not in salas_actuales]
             
-            # Eliminar salas que ya no están seleccionadas
-            if salas_a_eliminar:
-                placeholders = ','.join(['%s'] * len(salas_a_eliminar))
-                query_eliminar = f"DELETE FROM carrera_salas WHERE carrera_id = %s AND sala_id IN ({placeholders})"
-                cursor.execute(query_eliminar, (carrera_id, *salas_a_eliminar))
+                # Eliminar salas que ya no están seleccionadas
+                if salas_a_eliminar:
+                    placeholders = ','.join(['%s'] * len(salas_a_eliminar))
+                    query_eliminar = f"DELETE FROM carrera_salas WHERE carrera_id = %s AND sala_id IN ({placeholders})"
+                    cursor.execute(query_eliminar, (carrera_id, *salas_a_eliminar))
             
-            # Agregar nuevas salas (usando INSERT IGNORE para evitar duplicados)
-            for sala_id in salas_a_agregar:
-                cursor.execute("INSERT IGNORE INTO carrera_salas (carrera_id, sala_id) VALUES (%s, %s)", 
-                              (carrera_id, sala_id))
-            
-            connection.commit()
+                # Agregar nuevas salas (usando INSERT IGNORE para evitar duplicados)
+                for sala_id in salas_a_agregar:
+                    cursor.execute("INSERT IGNORE INTO carrera_salas (carrera_id, sala_id) VALUES (%s, %s)", 
+                                  (carrera_id, sala_id))
+                self._registrar_cambio('carreras', 'carrera_semestres', 'carrera_salas', cursor=cursor)
+                self._reindexar('carrera', carrera_id, carrera_data[0])
             return carrera_id
             
         except Error as e:
             logging.error(f"Error guardando carrera: {e}")
-            connection.rollback()
             return None
-        finally:
-            if cursor:
-                cursor.close()
 
     def guardar_sala(self, sala_data, sala_id=None):
         """Guarda una sala (nueva o existente)"""
-        connection = self.db.get_connection()
-        if not connection:
-            return None
-        
-        cursor = None
         try:
-            cursor = connection.cursor()
-            
-            if sala_id:
-                # Actualizar sala existente
-                query = "UPDATE salas SET nombre = %s, capacidad = %s, tipo = %s WHERE id = %s"
-                cursor.execute(query, (*sala_data, sala_id))
-            else:
-                # Insertar nueva sala
-                query = "INSERT INTO salas (nombre, capacidad, tipo) VALUES (%s, %s, %s)"
-                cursor.execute(query, sala_data)
-                sala_id = cursor.lastrowid
-            
-            connection.commit()
+            with self.transaction() as connection, self.db.cursor(connection) as cursor:
+                if sala_id:
+                    # Actualizar sala existente
+                    query = "UPDATE salas SET nombre = %s, capacidad = %s, tipo = %s WHERE id = %s"
+                    cursor.execute(query, (*sala_data, sala_id))
+                else:
+                    # Insertar nueva sala
+                    query = "INSERT INTO salas (nombre, capacidad, tipo) VALUES (%s, %s, %s)"
+                    cursor.execute(query, sala_data)
+                    sala_id = cursor.lastrowid
+                self._registrar_cambio('salas', cursor=cursor)
+                self._reindexar('sala', sala_id, sala_data[0])
             return sala_id
             
         except Error as e:
             logging.error(f"Error guardando sala: {e}")
-            connection.rollback()
             return None
-        finally:
-            if cursor:
-                cursor.close()
 
+    # Las claves foráneas propagan el borrado (CASCADE / SET NULL) a las
+    # tablas relacionadas, que también cambian de versión.
     def eliminar_sala(self, sala_id):
         """Elimina una sala por su id"""
         query = "DELETE FROM salas WHERE id = %s"
-        return self.db.execute_query(query, (sala_id,))
+        with self.transaction():
+            resultado = self.db.execute_query(query, (sala_id,))
+            self._registrar_cambio('salas', 'carrera_salas', 'modulos')
+            self._reindexar('sala', sala_id)
+            self.db.al_confirmar(self._descartar_registro_conflictos)
+        return resultado
 
     def eliminar_carrera(self, carrera_id):
         """Elimina una carrera por su id."""
         query = "DELETE FROM carreras WHERE id = %s"
-        return self.db.execute_query(query, (carrera_id,))
+        with self.transaction():
+            resultado = self.db.execute_query(query, (carrera_id,))
+            self._registrar_cambio('carreras', 'carrera_semestres', 'carrera_salas', 'modulos')
+            self._reindexar('carrera', carrera_id)
+            self.db.al_confirmar(self._descartar_registro_conflictos)
+        return resultado
 
     def eliminar_docente(self, docente_id):
         """Elimina un docente por su id."""
         query = "DELETE FROM docentes WHERE id = %s"
-        return self.db.execute_query(query, (docente_id,))
+        with self.transaction():
+            resultado = self.db.execute_query(query, (docente_id,))
+            self._registrar_cambio('docentes', 'modulos', 'disponibilidad_docentes')
+            self._reindexar('docente', docente_id)
+            self.db.al_confirmar(self._descartar_registro_conflictos)
+        return resultado
 
     def obtener_docente_por_id(self, docente_id):
         """Obtiene un docente por su ID"""
-        query = "SELECT * FROM docentes WHERE id = %s"
-        result = self.db.execute_query(query, (docente_id,), fetch=True)
-        return result[0] if result else None
+        return self._fila_catalogo('docentes', docente_id)
 
     def obtener_modulos_docente(self, docente_id):
         """Obtiene todos los módulos asignados a un docente específico"""
@@ -896,12 +1741,53 @@ class SistemaDAO:
                LEFT JOIN carreras c ON m.carrera_id = c.id 
                LEFT JOIN salas s ON m.sala_id = s.id
                WHERE m.docente_id = %s"""
-        return self.db.execute_query(query, (docente_id,), fetch=True)
+        return self.db.execute_query(query, (docente_id,), fetch=True, registro=Modulo)
 
     def obtener_horarios_modulo(self, modulo_id):
-        """Obtiene los horarios asignados a un módulo"""
-        query = "SELECT * FROM modulo_horarios WHERE modulo_id = %s"
-        return self.db.execute_query(query, (modulo_id,), fetch=True)
+        """Obtiene los horarios asignados a un módulo (cada fila con su 'slot')"""
+        return self.obtener_horarios_modulos([modulo_id]).get(modulo_id, [])
+
+    def obtener_horarios_modulos(self, modulo_ids=None, carrera_id=None, docente_id=None, sala_id=None):
+        """
+        Horarios de muchos módulos en una sola consulta, agrupados por módulo.
+        Filtra por una lista de ids y/o por la carrera, docente o sala del módulo
+        (sin filtros trae todos). Retorna {modulo_id: [horarios con 'slot']};
+        los módulos sin horarios no aparecen.
+        """
+        filtros_modulo = [('carrera_id', carrera_id), ('docente_id', docente_id), ('sala_id', sala_id)]
+        condiciones, params = [], []
+        for columna, valor in filtros_modulo:
+            if valor is not None:
+                condiciones.append(f"m.{columna} = %s")
+                params.append(valor)
+
+        query = "SELECT mh.* FROM modulo_horarios mh"
+        if condiciones:
+            query += " JOIN modulos m ON m.id = mh.modulo_id"
+
+        if modulo_ids is None:
+            lotes = [None]
+        else:
+            ids = list(dict.fromkeys(modulo_ids))
+            if not ids:
+                return {}
+            # Listas IN acotadas para no exceder límites de parámetros del motor
+            lotes = [ids[i:i + 500] for i in range(0, len(ids), 500)]
+
+        agrupados = {}
+        for lote in lotes:
+            condiciones_lote, params_lote = list(condiciones), list(params)
+            if lote is not None:
+                condiciones_lote.append(f"mh.modulo_id IN ({', '.join(['%s'] * len(lote))})")
+                params_lote.extend(lote)
+            consulta = query
+            if condiciones_lote:
+                consulta += " WHERE " + " AND ".join(condiciones_lote)
+            consulta += " ORDER BY mh.modulo_id, mh.id"
+            filas = self.db.execute_query(consulta, tuple(params_lote), fetch=True, registro=Horario)
+            for fila in _con_slots(filas):
+                agrupados.setdefault(fila['modulo_id'], []).append(fila)
+        return agrupados
 
     def obtener_disponibilidad_docente(self, docente_id):
         """Obtiene la disponibilidad de un docente"""
@@ -932,108 +1818,196 @@ class SistemaDAO:
             docente_id: ID del docente
             disponibilidad_dict: Diccionario en formato {dia: {hora: bool}}
         """
-        connection = self.db.get_connection()
-        if not connection:
-            return False
-        
-        cursor = None
         try:
-            cursor = connection.cursor()
-            
-            # Primero eliminar la disponibilidad existente
-            cursor.execute("DELETE FROM disponibilidad_docentes WHERE docente_id = %s", (docente_id,))
-            
-            # Insertar la nueva disponibilidad
-            for dia, horas_dict in disponibilidad_dict.items():
-                for hora, disponible in horas_dict.items():
+            with self.transaction() as connection, self.db.cursor(connection) as cursor:
+                # Primero eliminar la disponibilidad existente
+                cursor.execute("DELETE FROM disponibilidad_docentes WHERE docente_id = %s", (docente_id,))
+                
+                # Insertar la nueva disponibilidad
+                filas = [
                     # Convertir booleano a string para la columna 'estado'
-                    estado = 'disponible' if disponible else 'no_disponible'
-                    cursor.execute(
+                    (docente_id, dia, hora, 'disponible' if disponible else 'no_disponible')
+                    for dia, horas_dict in disponibilidad_dict.items()
+                    for hora, disponible in horas_dict.items()
+                ]
+                if filas:
+                    cursor.executemany(
                         "INSERT INTO disponibilidad_docentes (docente_id, dia, hora, estado) VALUES (%s, %s, %s, %s)",
-                        (docente_id, dia, hora, estado)
+                        filas
                     )
-            
-            connection.commit()
+                self._registrar_cambio('disponibilidad_docentes', cursor=cursor)
             return True
             
         except Error as e:
             logging.error(f"Error guardando disponibilidad: {e}")
-            connection.rollback()
             return False
-        finally:
-            if cursor:
-                cursor.close()
 
-    def validar_conflicto_horario_docente(self, docente_id, nuevos_horarios, modulo_id_actual=None):
+    def escanear_conflictos(self):
         """
-        Valida que no haya conflictos de horario para un docente.
-        Retorna (tiene_conflicto, mensaje_error, modulo_conflicto)
+        Todos los topes entre módulos existentes (docente, sala y semestres
+        par/impar de una carrera) como ParConflicto, en una sola consulta. Cada
+        módulo trae también docente_nombre, sala_nombre y carrera_nombre
         """
-        if not docente_id or not nuevos_horarios:
-            return (False, "", None)
-        
-        # Obtener módulos del docente
-        query = """
-            SELECT m.id, m.nombre, m.codigo
-            FROM modulos m
-            WHERE m.docente_id = %s
+        inicio = time.perf_counter()
+        pares = [_par_conflicto(f) for f in self.db.execute_query(_CONSULTA_PARES_EN_CONFLICTO, fetch=True) or ()]
+        logging.info(f"Escaneo de conflictos: {len(pares)} pares en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        return pares
+
+    def iter_conflictos(self, chunk_size=None):
         """
-        if modulo_id_actual:
-            query += " AND m.id != %s"
-            modulos = self.db.execute_query(query, (docente_id, modulo_id_actual), fetch=True)
-        else:
-            modulos = self.db.execute_query(query, (docente_id,), fetch=True)
-        
-        if not modulos:
-            return (False, "", None)
-        
-        # Helper para convertir hora a minutos
-        def hora_a_minutos(hora_str):
-            if hasattr(hora_str, 'total_seconds'):
-                return int(hora_str.total_seconds() // 60)
-            partes = str(hora_str).split(':')[:2]
-            return int(partes[0]) * 60 + int(partes[1])
-        
-        # Helper para verificar solapamiento
-        def se_solapan(dia1, inicio1, fin1, dia2, inicio2, fin2):
-            if dia1.upper() != dia2.upper():
-                return False
-            
-            inicio1_min = hora_a_minutos(inicio1)
-            fin1_min = hora_a_minutos(fin1)
-            inicio2_min = hora_a_minutos(inicio2)
-            fin2_min = hora_a_minutos(fin2)
-            
-            # Verificar solapamiento
-            return not (fin1_min <= inicio2_min or fin2_min <= inicio1_min)
-        
-        # Verificar cada nuevo horario contra horarios existentes
-        for nuevo_h in nuevos_horarios:
-            nuevo_dia = nuevo_h['dia'] if isinstance(nuevo_h, dict) else nuevo_h[0]
-            nuevo_inicio = nuevo_h['hora_inicio'] if isinstance(nuevo_h, dict) else nuevo_h[1]
-            nuevo_fin = nuevo_h['hora_fin'] if isinstance(nuevo_h, dict) else nuevo_h[2]
-            
-            for modulo in modulos:
-                horarios_existentes = self.obtener_horarios_modulo(modulo['id'])
-                if not horarios_existentes:
+        Como escanear_conflictos, pero leyendo por lotes con un cursor sin
+        buffer (ver Database.iter_query): memoria acotada con muchos pares
+        """
+        for fila in self.db.iter_query(_CONSULTA_PARES_EN_CONFLICTO, chunk_size=chunk_size):
+            yield _par_conflicto(fila)
+
+    def conflictos_por_modulo(self, pares=None):
+        """
+        {modulo_id: [Conflicto]} con el primer tope de cada tipo por módulo:
+        sólo módulos con docente y sala, y el de semestre sólo si el módulo
+        tiene semestre
+        """
+        resultado = {}
+        for par in self.escanear_conflictos() if pares is None else pares:
+            for modulo in (par.modulo_a, par.modulo_b):
+                if not modulo['docente_id'] or not modulo['sala_id']:
                     continue
-                
-                for h_exist in horarios_existentes:
-                    if se_solapan(nuevo_dia, nuevo_inicio, nuevo_fin,
-                                h_exist['dia'], h_exist['hora_inicio'], h_exist['hora_fin']):
-                        mensaje = f"Conflicto de horario: El docente ya dicta '{modulo['nombre']}' ({modulo['codigo']}) el {h_exist['dia']} a las {h_exist['hora_inicio']}"
-                        return (True, mensaje, modulo)
-        
-        return (False, "", None)
+                if par.tipo == 'semestre' and not modulo['semestre']:
+                    continue
+                conflictos = resultado.setdefault(modulo['id'], [])
+                if all(c.tipo != par.tipo for c in conflictos):
+                    conflictos.append(par.conflicto_de(modulo['id']))
+        return resultado
+
+    def validar_modulo(self, modulo_data, horarios, modulo_id=None):
+        """
+        Todas las reglas de guardado de un módulo con una sola consulta: horas
+        del docente (en horas cronológicas contra las contratadas) y topes de
+        docente, sala y semestres par/impar. `modulo_data` tiene el orden de
+        guardar_modulo. Retorna [(tipo, mensaje)] con tipo 'horas', 'semestre',
+        'docente' o 'sala'; vacía si el módulo se puede guardar.
+        """
+        horas_t, horas_p, carrera_id, semestre, docente_id, sala_id = (
+            modulo_data[2], modulo_data[3], *modulo_data[5:9])
+        paridad_opuesta = (0 if int(semestre) % 2 else 1) if carrera_id and semestre else None
+
+        # Fila base con el docente (aunque no tenga módulos) y luego los
+        # módulos relacionados con sus horarios, cada grupo por su índice
+        # (un OR en el JOIN obliga a recorrer todos los módulos)
+        relacionados = """
+            SELECT NULL, m.id, m.nombre, m.codigo, m.semestre, m.carrera_id, m.docente_id, m.sala_id,
+                   m.horas_teoricas, m.horas_practicas,
+                   h.dia, h.hora_inicio, h.hora_fin, h.minuto_inicio, h.minuto_fin
+            FROM modulos m
+            LEFT JOIN modulo_horarios h ON h.modulo_id = m.id
+            WHERE {condicion}
+        """
+        query = """
+            SELECT horas_contratadas AS docente_horas_contratadas,
+                   NULL AS id, NULL AS nombre, NULL AS codigo, NULL AS semestre, NULL AS carrera_id,
+                   NULL AS docente_id, NULL AS sala_id, NULL AS horas_teoricas, NULL AS horas_practicas,
+                   NULL AS dia, NULL AS hora_inicio, NULL AS hora_fin, NULL AS minuto_inicio, NULL AS minuto_fin
+            FROM docentes WHERE id = %s
+        """ + " UNION ".join([""] + [relacionados.format(condicion=c) for c in (
+            "m.docente_id = %s", "m.sala_id = %s", "m.carrera_id = %s AND m.semestre_paridad = %s")])
+        params = (docente_id, docente_id, sala_id, carrera_id, paridad_opuesta)
+        filas = self.db.execute_query(query, params, fetch=True) or []
+
+        horas_contratadas = None
+        modulos, horarios_por_modulo = {}, {}
+        for fila in filas:
+            if fila['id'] is None:
+                horas_contratadas = fila['docente_horas_contratadas']
+                continue
+            if fila['id'] == modulo_id:
+                continue
+            modulos.setdefault(fila['id'], fila)
+            if fila['dia'] is not None:
+                horarios_por_modulo.setdefault(fila['id'], []).append(fila)
+
+        violaciones = []
+        if docente_id and horas_contratadas is not None:
+            asignadas = sum((m['horas_teoricas'] or 0) + (m['horas_practicas'] or 0)
+                            for m in modulos.values() if m['docente_id'] == docente_id)
+            # Hora académica = 45 minutos
+            if (asignadas + horas_t + horas_p) * 0.75 > horas_contratadas:
+                disponibles = horas_contratadas - asignadas * 0.75
+                violaciones.append(('horas', f"Conflicto de horas: El docente solo tiene "
+                                             f"{disponibles:.1f}h cronológicas disponibles."))
+
+        if horarios:
+            motor = MotorConflictos()
+            for id_, modulo in modulos.items():
+                motor.agregar_modulo(modulo, horarios_por_modulo.get(id_, ()))
+            conflictos = (motor.conflictos_semestre(carrera_id, semestre, horarios, modulo_id)
+                          + motor.conflictos_docente(docente_id, horarios, modulo_id)
+                          + motor.conflictos_sala(sala_id, horarios, modulo_id))
+            violaciones += [(c.tipo, c.mensaje) for c in conflictos]
+        return violaciones
+
+    # --- Registro incremental de conflictos (ver conflictos.RegistroConflictos) ---
+
+    def registro_conflictos(self):
+        """
+        Conflictos vigentes de todos los módulos. Se arma desde la foto en la
+        primera lectura, se actualiza con cada guardado o borrado de módulo de
+        este DAO y se reconstruye si otro proceso modifica módulos u horarios.
+        """
+        self._revisar_versiones()
+        registro = self._registro_conflictos
+        if registro is not None:
+            return registro
+
+        with self._registro_lock:
+            generacion = self._registro_generacion
+        inicio = time.perf_counter()
+        registro = RegistroConflictos.desde_snapshot(self.obtener_snapshot())
+        logging.info(f"Registro de conflictos construido en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+                     f"({len(registro)} módulos con conflictos)")
+        with self._registro_lock:
+            # Un cambio confirmado durante la construcción puede no estar incluido
+            if generacion == self._registro_generacion:
+                self._registro_conflictos = registro
+        return registro
+
+    def conflictos_modulo(self, modulo_id):
+        """[Conflicto] vigentes del módulo (el primero de cada tipo)"""
+        return self.registro_conflictos().conflictos(modulo_id)
+
+    def tiene_conflictos(self, modulo_id):
+        return self.registro_conflictos().tiene_conflictos(modulo_id)
+
+    def _descartar_registro_conflictos(self):
+        with self._registro_lock:
+            self._registro_generacion += 1
+            self._registro_conflictos = None
+
+    def _actualizar_registro_conflictos(self, modulo_id):
+        """Tras el commit, recarga el módulo (si sigue existiendo) y lo aplica al registro"""
+        def aplicar():
+            with self._registro_lock:
+                self._registro_generacion += 1
+                registro = self._registro_conflictos
+            if registro is None:
+                return
+            filas = self.db.execute_query(
+                "SELECT id, nombre, codigo, semestre, carrera_id, docente_id, sala_id FROM modulos WHERE id = %s",
+                (modulo_id,), fetch=True)
+            if filas:
+                registro.actualizar_modulo(filas[0], self.obtener_horarios_modulo(modulo_id))
+            else:
+                registro.quitar_modulo(modulo_id)
+        self.db.al_confirmar(aplicar)
 
     def obtener_horarios_ocupados_docente(self, docente_id, semestre_actual=None):
         """
         Obtiene todos los horarios ocupados por módulos asignados a un docente.
         Si se proporciona semestre_actual, solo retorna módulos del mismo grupo (par/impar).
-        Retorna una lista de diccionarios con dia, hora_inicio, hora_fin y nombre del módulo.
+        Retorna una lista de diccionarios con dia, hora_inicio, hora_fin, slot y nombre del módulo.
         """
         query = """
-            SELECT mh.dia, mh.hora_inicio, mh.hora_fin, m.nombre as modulo_nombre, 
+            SELECT mh.dia, mh.hora_inicio, mh.hora_fin, mh.minuto_inicio, mh.minuto_fin,
+                   m.nombre as modulo_nombre, 
                    m.codigo as modulo_codigo, m.id as modulo_id, m.semestre
             FROM modulo_horarios mh
             JOIN modulos m ON mh.modulo_id = m.id
@@ -1043,19 +2017,20 @@ class SistemaDAO:
         
         # Filtrar por grupo de semestre (par/impar) si se proporciona
         if semestre_actual is not None:
-            query += " AND MOD(m.semestre, 2) = %s"
+            query += " AND m.semestre_paridad = %s"
             params.append(semestre_actual % 2)
         
-        return self.db.execute_query(query, tuple(params), fetch=True)
+        return _con_slots(self.db.execute_query(query, tuple(params), fetch=True))
 
     def obtener_horarios_ocupados_sala(self, sala_id, semestre_actual=None):
         """
         Obtiene todos los horarios ocupados por módulos asignados a una sala.
         Si se proporciona semestre_actual, solo retorna módulos del mismo grupo (par/impar).
-        Retorna una lista de diccionarios con dia, hora_inicio, hora_fin y nombre del módulo.
+        Retorna una lista de diccionarios con dia, hora_inicio, hora_fin, slot y nombre del módulo.
         """
         query = """
-            SELECT mh.dia, mh.hora_inicio, mh.hora_fin, m.nombre as modulo_nombre, 
+            SELECT mh.dia, mh.hora_inicio, mh.hora_fin, mh.minuto_inicio, mh.minuto_fin,
+                   m.nombre as modulo_nombre, 
                    m.codigo as modulo_codigo, m.id as modulo_id, m.semestre
             FROM modulo_horarios mh
             JOIN modulos m ON mh.modulo_id = m.id
@@ -1065,145 +2040,62 @@ class SistemaDAO:
         
         # Filtrar por grupo de semestre (par/impar) si se proporciona
         if semestre_actual is not None:
-            query += " AND MOD(m.semestre, 2) = %s"
+            query += " AND m.semestre_paridad = %s"
             params.append(semestre_actual % 2)
         
-        return self.db.execute_query(query, tuple(params), fetch=True)
+        return _con_slots(self.db.execute_query(query, tuple(params), fetch=True))
 
-    def validar_conflicto_sala(self, sala_id, nuevos_horarios, modulo_id_actual=None):
+    def ocupacion_docente(self, docente_id, semestre_actual=None, excluir_modulo_id=None):
         """
-        Valida que no haya conflictos de sala.
-        Retorna (tiene_conflicto, mensaje_error, modulo_conflicto)
+        Ocupacion (conflictos.py) del docente en la grilla semanal, con los
+        mismos filtros que obtener_horarios_ocupados_docente y sin los
+        horarios del módulo `excluir_modulo_id` (el que se está editando)
         """
-        if not sala_id or not nuevos_horarios:
-            return (False, "", None)
-        
-        # Obtener módulos que usan esta sala
-        query = """
-            SELECT m.id, m.nombre, m.codigo
-            FROM modulos m
-            WHERE m.sala_id = %s
-        """
-        if modulo_id_actual:
-            query += " AND m.id != %s"
-            modulos = self.db.execute_query(query, (sala_id, modulo_id_actual), fetch=True)
-        else:
-            modulos = self.db.execute_query(query, (sala_id,), fetch=True)
-        
-        if not modulos:
-            return (False, "", None)
-        
-        # Helper para convertir hora a minutos
-        def hora_a_minutos(hora_str):
-            if hasattr(hora_str, 'total_seconds'):
-                return int(hora_str.total_seconds() // 60)
-            partes = str(hora_str).split(':')[:2]
-            return int(partes[0]) * 60 + int(partes[1])
-        
-        # Helper para verificar solapamiento
-        def se_solapan(dia1, inicio1, fin1, dia2, inicio2, fin2):
-            if dia1.upper() != dia2.upper():
-                return False
-            
-            inicio1_min = hora_a_minutos(inicio1)
-            fin1_min = hora_a_minutos(fin1)
-            inicio2_min = hora_a_minutos(inicio2)
-            fin2_min = hora_a_minutos(fin2)
-            
-            return not (fin1_min <= inicio2_min or fin2_min <= inicio1_min)
-        
-        # Verificar cada nuevo horario contra horarios existentes
-        for nuevo_h in nuevos_horarios:
-            nuevo_dia = nuevo_h['dia'] if isinstance(nuevo_h, dict) else nuevo_h[0]
-            nuevo_inicio = nuevo_h['hora_inicio'] if isinstance(nuevo_h, dict) else nuevo_h[1]
-            nuevo_fin = nuevo_h['hora_fin'] if isinstance(nuevo_h, dict) else nuevo_h[2]
-            
-            for modulo in modulos:
-                horarios_existentes = self.obtener_horarios_modulo(modulo['id'])
-                if not horarios_existentes:
-                    continue
-                
-                for h_exist in horarios_existentes:
-                    if se_solapan(nuevo_dia, nuevo_inicio, nuevo_fin,
-                                h_exist['dia'], h_exist['hora_inicio'], h_exist['hora_fin']):
-                        mensaje = f"Conflicto de sala: La sala ya está ocupada por '{modulo['nombre']}' ({modulo['codigo']}) el {h_exist['dia']} a las {h_exist['hora_inicio']}"
-                        return (True, mensaje, modulo)
-        
-        return (False, "", None)
+        horarios = self.obtener_horarios_ocupados_docente(docente_id, semestre_actual)
+        return Ocupacion.desde_horarios(h for h in horarios if h['modulo_id'] != excluir_modulo_id)
+
+    def ocupacion_sala(self, sala_id, semestre_actual=None, excluir_modulo_id=None):
+        """Como ocupacion_docente, para una sala"""
+        horarios = self.obtener_horarios_ocupados_sala(sala_id, semestre_actual)
+        return Ocupacion.desde_horarios(h for h in horarios if h['modulo_id'] != excluir_modulo_id)
 
-    def validar_conflicto_semestre_par_impar(self, carrera_id, semestre, nuevos_horarios, modulo_id_actual=None):
+    def matriz_bloques(self, docente_id, sala_id=None, semestre=None, modulo_id=None, horarios_modulo=None):
         """
-        Valida que no haya topes de horario entre semestres pares e impares de la misma carrera.
-        Si el semestre actual es impar (1, 3, 5...), no debe topar con módulos de semestres pares (2, 4, 6...).
-        Si el semestre actual es par, no debe topar con módulos de semestres impares.
+        Estado de toda la grilla semanal para editar un módulo (ver
+        conflictos.matriz_estados) con dos consultas: horarios del módulo y de
+        los otros módulos del docente o la sala (del mismo grupo par/impar si
+        se da `semestre`), y disponibilidad del docente. `horarios_modulo`
+        reemplaza los horarios guardados del módulo (p. ej. [] si cambió el docente).
         """
-        if not carrera_id or not semestre or not nuevos_horarios:
-            return (False, "", None)
-        
-        es_impar = (int(semestre) % 2 != 0)
-        
-        # Determinar qué semestres verificar (el grupo opuesto)
-        # Si soy impar, busco conflictos con pares. Si soy par, busco conflictos con impares.
-        # La consulta SQL filtrará por (semestre % 2 = 0) o (semestre % 2 != 0)
-        
-        operador_mod = "=" if es_impar else "!="
-        
+        condicion = "(m.docente_id = %s OR m.sala_id = %s)"
+        # es_docente/es_sala y luego la condición
+        params = [docente_id, sala_id, docente_id, sala_id]
+        if semestre is not None:
+            condicion += " AND m.semestre_paridad = %s"
+            params.append(int(semestre) % 2)
         query = f"""
-            SELECT m.id, m.nombre, m.codigo, m.semestre
-            FROM modulos m
-            WHERE m.carrera_id = %s
-            AND m.semestre %% 2 {operador_mod} 0
+            SELECT mh.dia, mh.hora_inicio, mh.hora_fin, mh.minuto_inicio, mh.minuto_fin,
+                   m.id AS modulo_id, m.nombre AS modulo_nombre, m.codigo AS modulo_codigo,
+                   m.docente_id = %s AS es_docente, m.sala_id = %s AS es_sala
+            FROM modulo_horarios mh
+            JOIN modulos m ON mh.modulo_id = m.id
+            WHERE ({condicion}) OR m.id = %s
         """
-        
-        params = [carrera_id]
-        
-        if modulo_id_actual:
-            query += " AND m.id != %s"
-            params.append(modulo_id_actual)
-            
-        modulos_opuestos = self.db.execute_query(query, tuple(params), fetch=True)
-        
-        if not modulos_opuestos:
-            return (False, "", None)
-            
-        # Helper para convertir hora a minutos (reutilizado)
-        def hora_a_minutos(hora_str):
-            if hasattr(hora_str, 'total_seconds'):
-                return int(hora_str.total_seconds() // 60)
-            partes = str(hora_str).split(':')[:2]
-            return int(partes[0]) * 60 + int(partes[1])
-        
-        # Helper para verificar solapamiento (reutilizado)
-        def se_solapan(dia1, inicio1, fin1, dia2, inicio2, fin2):
-            if dia1.upper() != dia2.upper():
-                return False
-            
-            inicio1_min = hora_a_minutos(inicio1)
-            fin1_min = hora_a_minutos(fin1)
-            inicio2_min = hora_a_minutos(inicio2)
-            fin2_min = hora_a_minutos(fin2)
-            
-            return not (fin1_min <= inicio2_min or fin2_min <= inicio1_min)
-            
-        # Verificar cada nuevo horario contra horarios de módulos del grupo opuesto
-        for nuevo_h in nuevos_horarios:
-            nuevo_dia = nuevo_h['dia'] if isinstance(nuevo_h, dict) else nuevo_h[0]
-            nuevo_inicio = nuevo_h['hora_inicio'] if isinstance(nuevo_h, dict) else nuevo_h[1]
-            nuevo_fin = nuevo_h['hora_fin'] if isinstance(nuevo_h, dict) else nuevo_h[2]
-            
-            for modulo in modulos_opuestos:
-                horarios_existentes = self.obtener_horarios_modulo(modulo['id'])
-                if not horarios_existentes:
-                    continue
-                
-                for h_exist in horarios_existentes:
-                    if se_solapan(nuevo_dia, nuevo_inicio, nuevo_fin,
-                                h_exist['dia'], h_exist['hora_inicio'], h_exist['hora_fin']):
-                        tipo_semestre_opuesto = "par" if es_impar else "impar"
-                        mensaje = f"Conflicto de Semestre: El módulo '{modulo['nombre']}' es del semestre {modulo['semestre']} ({tipo_semestre_opuesto}) y tiene tope de horario el {h_exist['dia']} a las {h_exist['hora_inicio']}."
-                        return (True, mensaje, modulo)
-        
-        return (False, "", None)
+        params.append(modulo_id)
+        propia, docente, sala = Ocupacion(), Ocupacion(), Ocupacion()
+        for fila in _con_slots(self.db.execute_query(query, tuple(params), fetch=True)):
+            if fila['modulo_id'] == modulo_id:
+                if horarios_modulo is None:
+                    propia.agregar(fila)
+                continue
+            if fila['es_docente']:
+                docente.agregar(fila)
+            if sala_id and fila['es_sala']:
+                sala.agregar(fila)
+        for horario in horarios_modulo or ():
+            propia.agregar(horario)
+        disponibilidad = self.obtener_disponibilidad_docente(docente_id)
+        return matriz_estados(propia, docente, sala, disponibilidad)
 
 # Instancia global
 db_manager = SistemaDAO()
\ No newline at end of file
@@ -0,0 +1,332 @@
+"""
+Dialectos de base de datos soportados por Database/SistemaDAO.
+
+El DAO escribe SQL al estilo MySQL (parámetros %s, INSERT IGNORE, MOD...).
+Cada dialecto sabe conectarse a su motor y, si hace falta, traducir ese SQL.
+Se elige con la variable de entorno DB_ENGINE (mysql por defecto, o sqlite).
+"""
+
+import os
+import re
+import logging
+import sqlite3
+from functools import lru_cache
+
+import pymysql
+
+# Errores de los drivers; es una tupla, usable directamente en `except Error`
+Error = (pymysql.err.Error, sqlite3.Error)
+
+
+class DialectoMySQL:
+    """MySQL/MariaDB vía pymysql"""
+
+    nombre = 'mysql'
+    cursor_streaming = pymysql.cursors.SSDictCursor
+    # Filas como tuplas, para construir registros compactos (modelos.Registro)
+    cursor_tuplas = pymysql.cursors.Cursor
+    cursor_tuplas_streaming = pymysql.cursors.SSCursor
+
+    def __init__(self, db):
+        self.db = db
+
+    def conectar(self):
+        return pymysql.connect(
+            host=self.db.host,
+            database=self.db.database,
+            user=self.db.user,
+            password=self.db.password,
+            port=self.db.port,
+            connect_timeout=self.db.connect_timeout,
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            # Cada conexión prestada empieza sin transacción abierta; los métodos
+            # transaccionales llaman a begin() explícitamente.
+            autocommit=True
+        )
+
+    def existe_tabla(self, tabla):
+        filas = self.db.execute_query(
+            """SELECT 1 FROM information_schema.tables
+               WHERE table_schema = DATABASE() AND table_name = %s LIMIT 1""",
+            (tabla,), fetch=True)
+        return bool(filas)
+
+    def existe_indice(self, tabla, indice):
+        filas = self.db.execute_query(
+            """SELECT 1 FROM information_schema.statistics
+               WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1""",
+            (tabla, indice), fetch=True)
+        return bool(filas)
+
+    def existe_columna(self, tabla, columna):
+        filas = self.db.execute_query(
+            """SELECT 1 FROM information_schema.columns
+               WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1""",
+            (tabla, columna), fetch=True)
+        return bool(filas)
+
+    def columna_calculada(self, tabla, columna, tipo, expresion):
+        """DDL para agregar una columna calculada (persistida) a una tabla existente"""
+        return f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo} AS ({expresion}) STORED"
+
+    def expr_minutos(self, columna):
+        """Expresión SQL: columna 'HH:MM[:SS]' a minuto del día"""
+        return (f"CAST(SUBSTRING_INDEX({columna}, ':', 1) AS UNSIGNED) * 60 + "
+                f"CAST(SUBSTRING_INDEX(SUBSTRING_INDEX({columna}, ':', 2), ':', -1) AS UNSIGNED)")
+
+    def probar_conexion(self, timeout=2):
+        """Conexión rápida al servidor (sin seleccionar base) para fallar pronto"""
+        conn = pymysql.connect(
+            host=self.db.host,
+            user=self.db.user,
+            password=self.db.password,
+            port=self.db.port,
+            connect_timeout=timeout
+        )
+        conn.close()
+
+    def asegurar_base_de_datos(self):
+        """Crea la base de datos si no existe. Retorna True si ya existía."""
+        conn = pymysql.connect(
+            host=self.db.host,
+            user=self.db.user,
+            password=self.db.password,
+            port=self.db.port,
+            connect_timeout=self.db.connect_timeout,
+            charset='utf8mb4'
+        )
+        try:
+            cursor = conn.cursor()
+
+            # Verificar si la base de datos existe
+            cursor.execute("SHOW DATABASES LIKE %s", (self.db.database,))
+            db_existe = cursor.fetchone() is not None
+
+            if db_existe:
+                logging.info(f"Base de datos '{self.db.database}' ya existe.")
+            else:
+                logging.info(f"Base de datos '{self.db.database}' no existe. Creando...")
+                cursor.execute(f"CREATE DATABASE `{self.db.database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+                logging.info(f"Base de datos '{self.db.database}' creada exitosamente.")
+
+            cursor.close()
+            return db_existe
+        finally:
+            conn.close()
+
+
+# --- SQLite ---
+
+_RE_PARAMETROS = re.compile(r"%(%|s)")
+_REEMPLAZOS_SQLITE = [
+    (re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\)\s*ENGINE\s*=\s*\w+", re.I), ")"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+]
+
+
+@lru_cache(maxsize=1024)
+def traducir_sqlite(query, con_parametros=True):
+    """Traduce SQL estilo MySQL del DAO a SQLite (placeholders y sintaxis propia)"""
+    for patron, reemplazo in _REEMPLAZOS_SQLITE:
+        query = patron.sub(reemplazo, query)
+    if con_parametros:
+        # Igual que pymysql: %s es un parámetro y %% un '%' literal
+        query = _RE_PARAMETROS.sub(lambda m: '%' if m.group(1) == '%' else '?', query)
+    return query
+
+
+def _fila_dict(cursor, fila):
+    return {col[0]: valor for col, valor in zip(cursor.description, fila)}
+
+
+class CursorTuplasSQLite:
+    """Marca para ConexionSQLite.cursor(): filas como tuplas en vez de dicts"""
+
+
+class CursorSQLite:
+    """Cursor de sqlite3 con la interfaz de un DictCursor de pymysql"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        self._cursor.execute(traducir_sqlite(query, params is not None), params or ())
+        return self._cursor.rowcount
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(traducir_sqlite(query), seq_params)
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConexionSQLite:
+    """Conexión de sqlite3 con la interfaz de conexión de pymysql que usa el DAO"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.open = True
+
+    def cursor(self, cursorclass=None):
+        cursor = self._raw.cursor()
+        if cursorclass is CursorTuplasSQLite:
+            cursor.row_factory = None
+        return CursorSQLite(cursor)
+
+    def begin(self):
+        self._raw.execute("BEGIN")
+
+    def commit(self):
+        if self._raw.in_transaction:
+            self._raw.commit()
+
+    def rollback(self):
+        if self._raw.in_transaction:
+            self._raw.rollback()
+
+    def ping(self, reconnect=False):
+        self._raw.execute("SELECT 1")
+
+    def close(self):
+        self.open = False
+        self._raw.close()
+
+
+def _mod(a, b):
+    if a is None or b is None or b == 0:
+        return None
+    return a % b
+
+
+class DialectoSQLite:
+    """
+    SQLite en archivo (DB_NAME, con extensión .sqlite3 si no trae una) o en
+    memoria (DB_NAME=:memory:). Pensado para correr la app sin servidor MySQL,
+    pruebas locales y benchmarks del DAO.
+    """
+
+    nombre = 'sqlite'
+    cursor_streaming = None
+    cursor_tuplas = CursorTuplasSQLite
+    cursor_tuplas_streaming = CursorTuplasSQLite
+
+    def __init__(self, db):
+        self.db = db
+        self._ancla = None
+        nombre = db.database
+        if nombre == ':memory:':
+            # Memoria compartida entre las conexiones del pool; la conexión
+            # ancla mantiene viva la base mientras exista el dialecto.
+            self.ruta = f"file:{os.getenv('DB_MEMORY_NAME', 'sistema')}?mode=memory&cache=shared"
+            self.en_memoria = True
+        else:
+            self.ruta = nombre if os.path.splitext(nombre)[1] else f"{nombre}.sqlite3"
+            self.en_memoria = False
+
+    def _abrir(self):
+        raw = sqlite3.connect(
+            self.ruta,
+            uri=self.en_memoria,
+            timeout=self.db.connect_timeout,
+            isolation_level=None,  # autocommit; las transacciones usan BEGIN explícito
+            check_same_thread=False,  # el pool presta conexiones entre hilos
+        )
+        raw.row_factory = _fila_dict
+        raw.create_function('MOD', 2, _mod, deterministic=True)
+        raw.execute("PRAGMA foreign_keys = ON")
+        return raw
+
+    def conectar(self):
+        if self.en_memoria and self._ancla is None:
+            self._ancla = self._abrir()
+        raw = self._abrir()
+        if not self.en_memoria:
+            raw.execute("PRAGMA journal_mode = WAL")
+        return ConexionSQLite(raw)
+
+    def existe_tabla(self, tabla):
+        filas = self.db.execute_query(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", (tabla,), fetch=True)
+        return bool(filas)
+
+    def existe_indice(self, tabla, indice):
+        filas = self.db.execute_query(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s",
+            (tabla, indice), fetch=True)
+        return bool(filas)
+
+    def existe_columna(self, tabla, columna):
+        # table_xinfo incluye las columnas calculadas
+        filas = self.db.execute_query(f"PRAGMA table_xinfo({tabla})", fetch=True)
+        return any(f['name'] == columna for f in filas or [])
+
+    def columna_calculada(self, tabla, columna, tipo, expresion):
+        # SQLite sólo permite agregar columnas calculadas VIRTUAL con ALTER TABLE;
+        # igual pueden indexarse, que es lo que interesa.
+        return f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo} GENERATED ALWAYS AS ({expresion}) VIRTUAL"
+
+    def expr_minutos(self, columna):
+        """Expresión SQL: columna 'HH:MM[:SS]' a minuto del día"""
+        return (f"CAST(substr({columna}, 1, instr({columna}, ':') - 1) AS INTEGER) * 60 + "
+                f"CAST(substr({columna}, instr({columna}, ':') + 1, 2) AS INTEGER)")
+
+    def probar_conexion(self, timeout=2):
+        self._abrir().close()
+
+    def asegurar_base_de_datos(self):
+        """SQLite crea el archivo al conectar. Retorna True si ya existía."""
+        db_existe = not self.en_memoria and os.path.exists(self.ruta)
+        if db_existe:
+            logging.info(f"Base de datos SQLite '{self.ruta}' ya existe.")
+        else:
+            logging.info(f"Base de datos SQLite '{self.ruta}' se creará al conectar.")
+        return db_existe
+
+
+DIALECTOS = {
+    'mysql': DialectoMySQL,
+    'mariadb': DialectoMySQL,
+    'sqlite': DialectoSQLite,
+}
+
+
+def crear_dialecto(db, motor=None):
+    """Instancia el dialecto indicado por `motor` o por DB_ENGINE"""
+    motor = (motor or os.getenv('DB_ENGINE', 'mysql')).lower()
+    try:
+        return DIALECTOS[motor](db)
+    except KeyError:
+        raise ValueError(f"DB_ENGINE no soportado: '{motor}' (opciones: {', '.join(DIALECTOS)})")
@@ -0,0 +1,147 @@
+"""
+Exporta todos los topes de horario de la institución (docente, sala y
+semestres par/impar) a CSV, JSON o XLSX, un par de módulos por fila.
+
+    python exportar_conflictos.py --formato xlsx
+    python exportar_conflictos.py --formato csv --salida conflictos.csv
+
+Las filas se leen por lotes y se escriben a medida que llegan, así que la
+memoria no crece con la cantidad de conflictos.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+
+from database import SistemaDAO, DatabaseError
+from migraciones import migrar
+
+FORMATOS = ('csv', 'json', 'xlsx')
+
+COLUMNAS = [
+    'tipo', 'dia', 'inicio_solape', 'fin_solape',
+    'modulo_a_id', 'modulo_a_codigo', 'modulo_a_nombre', 'modulo_a_horario',
+    'modulo_a_docente', 'modulo_a_sala', 'modulo_a_carrera', 'modulo_a_semestre',
+    'modulo_b_id', 'modulo_b_codigo', 'modulo_b_nombre', 'modulo_b_horario',
+    'modulo_b_docente', 'modulo_b_sala', 'modulo_b_carrera', 'modulo_b_semestre',
+]
+
+
+def _fila(par):
+    """Valores de COLUMNAS para un ParConflicto"""
+    fila = [par.tipo, par.slot.dia, par.slot.hora_inicio, par.slot.hora_fin]
+    for modulo, horario in ((par.modulo_a, par.horario_a), (par.modulo_b, par.horario_b)):
+        fila += [
+            modulo['id'], modulo['codigo'], modulo['nombre'],
+            f"{horario['slot'].hora_inicio}-{horario['slot'].hora_fin}",
+            modulo.get('docente_nombre') or '', modulo.get('sala_nombre') or '',
+            modulo.get('carrera_nombre') or '', modulo['semestre'],
+        ]
+    return fila
+
+
+def _escribir_csv(filas, ruta):
+    with open(ruta, 'w', newline='', encoding='utf-8-sig') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(COLUMNAS)
+        total = 0
+        for fila in filas:
+            escritor.writerow(fila)
+            total += 1
+    return total
+
+
+def _escribir_json(filas, ruta):
+    # Arreglo JSON escrito objeto por objeto
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write('[')
+        total = 0
+        for fila in filas:
+            archivo.write(',\n' if total else '\n')
+            archivo.write(json.dumps(dict(zip(COLUMNAS, fila)), ensure_ascii=False))
+            total += 1
+        archivo.write('\n]\n')
+    return total
+
+
+def _escribir_xlsx(filas, ruta):
+    from openpyxl import Workbook
+
+    # Modo write_only: las filas van a disco sin quedar en memoria
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Conflictos")
+    hoja.append(COLUMNAS)
+    total = 0
+    for fila in filas:
+        hoja.append(fila)
+        total += 1
+    libro.save(ruta)
+    return total
+
+
+_ESCRITORES = {'csv': _escribir_csv, 'json': _escribir_json, 'xlsx': _escribir_xlsx}
+
+
+def exportar_conflictos(dao, formato, ruta, chunk_size=None):
+    """
+    Escribe los pares en conflicto en `ruta`. Retorna un dict con 'filas' y
+    los tiempos en segundos: 'primera_fila' (consulta hasta el primer par) y 'total'.
+    Si falla a mitad de camino se borra el archivo incompleto.
+    """
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato no soportado: {formato} (use {', '.join(FORMATOS)})")
+    tiempos = {}
+    inicio = time.perf_counter()
+
+    def filas():
+        for par in dao.iter_conflictos(chunk_size=chunk_size):
+            if 'primera_fila' not in tiempos:
+                tiempos['primera_fila'] = time.perf_counter() - inicio
+            yield _fila(par)
+
+    try:
+        total = _ESCRITORES[formato](filas(), ruta)
+    except BaseException:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise
+    tiempos['total'] = time.perf_counter() - inicio
+    tiempos.setdefault('primera_fila', tiempos['total'])
+    return {'filas': total, **tiempos}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta los conflictos de horario de la institución")
+    parser.add_argument('--formato', choices=FORMATOS, default='csv')
+    parser.add_argument('--salida', help="Archivo de salida (por defecto exports/conflictos_<fecha>.<formato>)")
+    parser.add_argument('--lote', type=int, default=None, help="Filas por lote leídas de la base")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ruta = args.salida
+    if not ruta:
+        os.makedirs('exports', exist_ok=True)
+        ruta = os.path.join('exports', f"conflictos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{args.formato}")
+
+    dao = SistemaDAO()
+    try:
+        # La consulta usa columnas que crean las migraciones; sin DDL si el esquema está al día
+        migrar(dao.db)
+        resultado = exportar_conflictos(dao, args.formato, ruta, chunk_size=args.lote)
+    except DatabaseError as e:
+        print(f"Error de base de datos, no se exportaron conflictos: {e}", file=sys.stderr)
+        return 1
+    velocidad = resultado['filas'] / resultado['total'] if resultado['total'] else 0
+    print(f"{resultado['filas']} conflictos exportados a {ruta}")
+    print(f"Primera fila: {resultado['primera_fila'] * 1000:.0f} ms | Total: {resultado['total'] * 1000:.0f} ms "
+          f"({velocidad:.0f} filas/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,16 +8,22 @@ import flet as ft
 import logging
 import os
 import threading
-from database import SistemaDAO
+from database import SistemaDAO, DatabaseError
+from modelos import a_minutos, BLOQUES_HORARIOS
+from conflictos import Ocupacion
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from reportes import ReportGenerator
 from chatbot import AIChatbot
+from busqueda import normalizar, LARGO_MINIMO_INDICE
 from gestion_datos import GestionDatos
 
 # Configurar logging para ver el flujo
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Tamaño de página de las listas y búsquedas que consultan al servidor
+TAMANO_PAGINA = 50
+
 class SistemaGestionFlet:
     """Sistema de Gestión Académica con Flet - Interfaz Moderna"""
     
@@ -84,11 +90,7 @@ class SistemaGestionFlet:
         # self.page.theme_mode = ft.ThemeMode.LIGHT
         
         # Define standard time blocks for the application (35-minute intervals)
-        self.bloques_horarios = [
-            "08:30", "09:05", "09:40", "10:15", "10:50", "11:25", "12:00", "12:35",
-            "13:10", "13:45", "14:20", "14:55", "15:30", "16:05", "16:40", "17:15",
-            "17:50", "18:25", "19:00", "19:35", "20:10", "20:45", "21:20", "21:55"
-        ]
+        self.bloques_horarios = list(BLOQUES_HORARIOS)
         
         # Limpiar cualquier control previo que pueda causar errores
         self.page.controls.clear()
@@ -267,15 +269,8 @@ class SistemaGestionFlet:
             
             # Quick connection test first
             try:
-                logging.info("Probando conexión rápida a MySQL...")
-                import pymysql
-                test_conn = pymysql.connect(
-                    host='localhost',
-                    user='root',
-                    password='',
-                    connect_timeout=2  # Very short timeout for test
-                )
-                test_conn.close()
+                logging.info(f"Probando conexión rápida ({self.dao.db.dialecto.nombre})...")
+                self.dao.db.dialecto.probar_conexion(timeout=2)  # Very short timeout for test
                 logging.info("Conexión rápida exitosa")
             except Exception as test_error:
                 logging.error(f"Prueba de conexión falló: {test_error}")
@@ -487,7 +482,12 @@ class SistemaGestionFlet:
             self.mostrar_mensaje("❌ Por favor complete todos los campos", 'error')
             return
         
-        usuario = self.dao.verificar_usuario(email, password)
+        try:
+            usuario = self.dao.verificar_usuario(email, password)
+        except DatabaseError as ex:
+            logging.error(f"Login fallido: error de base de datos: {ex}")
+            self.mostrar_mensaje("❌ No se pudo conectar con la base de datos. Intente nuevamente.", 'error')
+            return
         logging.info(f"Resultado de DAO: {'Usuario encontrado' if usuario else 'Usuario no encontrado'}")
         
         if usuario:
@@ -514,66 +514,18 @@ class SistemaGestionFlet:
             return
 
         try:
-            modulos = self.dao.obtener_modulos()
-            sin_docente = [m for m in modulos if not m.get('docente_id')]
+            # Módulos sin docente desde la foto; los conflictos, del registro
+            # incremental del DAO (se mantiene al guardar/borrar módulos)
+            snapshot = self.dao.obtener_snapshot()
+            sin_docente = [m for m in snapshot.modulos if not m.get('docente_id')]
             
-            # Detectar conflictos de horario
-            conflictos = []
-            logging.info(f"=== Iniciando detección de conflictos para {len(modulos)} módulos ===")
+            por_modulo = self.dao.registro_conflictos().por_modulo()
+            # Filas completas de la foto (las usa el editor), en su orden
+            conflictos = [
+                {'modulo': m, 'conflictos': [(c.tipo, c.mensaje) for c in por_modulo[m['id']]]}
+                for m in snapshot.modulos if m['id'] in por_modulo
+            ]
             
-            for m in modulos:
-                # Skip modules without teacher or room
-                if not m.get('docente_id') or not m.get('sala_id'):
-                    continue
-                
-                try:
-                    horarios = self.dao.obtener_horarios_modulo(m['id'])
-                    if not horarios:
-                        continue
-                    
-                    # Check for conflicts
-                    conflicto_info = {'modulo': m, 'conflictos': []}
-                    
-                    # Conflict with teacher
-                    try:
-                        tiene_conflicto, mensaje, _ = self.dao.validar_conflicto_horario_docente(
-                            m['docente_id'], horarios, m['id']
-                        )
-                        if tiene_conflicto:
-                            conflicto_info['conflictos'].append(('docente', mensaje))
-                            logging.info(f"Conflicto docente detectado en módulo {m['nombre']}: {mensaje}")
-                    except Exception as e:
-                        logging.error(f"Error validando conflicto docente para módulo {m['id']}: {e}")
-                    
-                    # Conflict with room
-                    try:
-                        tiene_conflicto, mensaje, _ = self.dao.validar_conflicto_sala(
-                            m['sala_id'], horarios, m['id']
-                        )
-                        if tiene_conflicto:
-                            conflicto_info['conflictos'].append(('sala', mensaje))
-                            logging.info(f"Conflicto sala detectado en módulo {m['nombre']}: {mensaje}")
-                    except Exception as e:
-                        logging.error(f"Error validando conflicto sala para módulo {m['id']}: {e}")
-                    
-                    # Conflict with semester (par/impar)
-                    if m.get('carrera_id') and m.get('semestre'):
-                        try:
-                            tiene_conflicto, mensaje, _ = self.dao.validar_conflicto_semestre_par_impar(
-                                m['carrera_id'], m['semestre'], horarios, m['id']
-                            )
-                            if tiene_conflicto:
-                                conflicto_info['conflictos'].append(('semestre', mensaje))
-                                logging.info(f"Conflicto semestre detectado en módulo {m['nombre']}: {mensaje}")
-                        except Exception as e:
-                            logging.error(f"Error validando conflicto semestre para módulo {m['id']}: {e}")
-                    
-                    if conflicto_info['conflictos']:
-                        conflictos.append(conflicto_info)
-                        
-                except Exception as e:
-                    logging.error(f"Error procesando módulo {m.get('id', 'unknown')}: {e}")
-                    
             logging.info(f"=== Detección completada: {len(conflictos)} módulos con conflictos ===")
                     
         except Exception as e:
@@ -671,8 +623,12 @@ class SistemaGestionFlet:
         if self.badge_notificaciones.page:
             self.badge_notificaciones.update()
 
-    def _crear_componente_notificaciones(self):
-        """Crea el componente de notificaciones con badge"""
+    def _crear_componente_notificaciones(self, kpis=None):
+        """
+        Crea el componente de notificaciones con badge. Con `kpis` (ver
+        SistemaDAO.obtener_kpis_dashboard) el badge se pinta con los conteos;
+        el detalle lo arma actualizar_notificaciones con el botón ya en la página.
+        """
         self.btn_notificaciones = ft.PopupMenuButton(
             icon=ft.Icons.NOTIFICATIONS_NONE,
             icon_color="white",
@@ -692,7 +648,18 @@ class SistemaGestionFlet:
             top=0
         )
         
-        self.actualizar_notificaciones()
+        if kpis:
+            total = kpis['modulos_sin_docente'] + kpis['modulos_con_conflicto']
+            self.btn_notificaciones.items = [
+                ft.PopupMenuItem(content=ft.Text("Cargando notificaciones...", color="grey"))
+            ]
+            if total:
+                self.btn_notificaciones.icon = ft.Icons.NOTIFICATIONS_ACTIVE
+                self.btn_notificaciones.tooltip = f"{total} notificación(es)"
+                self.badge_notificaciones.content = ft.Text(str(total), color="white", size=10, weight=ft.FontWeight.BOLD)
+                self.badge_notificaciones.visible = True
+        else:
+            self.actualizar_notificaciones()
         
         return ft.Stack([
             self.btn_notificaciones,
@@ -712,6 +679,19 @@ class SistemaGestionFlet:
         # Initialize Chat UI (restore button and panel)
         self.crear_chat_ui()
         
+        # Todos los indicadores del encabezado en una sola consulta
+        try:
+            kpis = self.dao.obtener_kpis_dashboard()
+        except Exception as ex:
+            logging.error(f"Error obteniendo indicadores del dashboard: {ex}")
+            kpis = None
+        # Uso de salas y docentes (cubo de ocupación, ver analitica.py)
+        try:
+            utilizacion = self.dao.resumen_utilizacion()
+        except Exception as ex:
+            logging.error(f"Error obteniendo utilización: {ex}")
+            utilizacion = None
+        
         # Header con gradiente
         header = ft.Container(
             content=ft.Row([
@@ -732,6 +712,14 @@ class SistemaGestionFlet:
                 
                 # Información del usuario y botón de logout
                 ft.Row([
+                    # Reporte de utilización de salas y docentes
+                    ft.IconButton(
+                        icon=ft.Icons.INSIGHTS,
+                        tooltip="Reporte de utilización (PDF)",
+                        icon_color='white',
+                        on_click=self.exportar_pdf_utilizacion,
+                        bgcolor='rgba(255,255,255,0.2)'
+                    ),
                     # Botón de Gestión de Datos
                     ft.IconButton(
                         icon=ft.Icons.STORAGE,
@@ -753,7 +741,7 @@ class SistemaGestionFlet:
                     padding=ft.padding.symmetric(horizontal=15, vertical=8),
                     border_radius=20
                 ),
-                self._crear_componente_notificaciones(),
+                self._crear_componente_notificaciones(kpis),
                 ft.IconButton(
                     icon=ft.Icons.LOGOUT,
                         tooltip="Cerrar Sesión",
@@ -810,15 +798,77 @@ class SistemaGestionFlet:
         ], expand=True, spacing=20)
         
         # Estructura principal
-        self.page.add(
-            ft.Column([
-                header,
-                ft.Container(content=contenido_principal, padding=20, expand=True)
-            ], expand=True, spacing=0)
-        )
+        secciones = [header]
+        if kpis:
+            secciones.append(self._crear_resumen_kpis(kpis, utilizacion))
+        secciones.append(ft.Container(content=contenido_principal, padding=20, expand=True))
+        self.page.add(ft.Column(secciones, expand=True, spacing=0))
         
         self.page.update()
+        
+        # El detalle de notificaciones (módulos y conflictos) se arma después de pintar
+        self.actualizar_notificaciones()
+
+    def _crear_resumen_kpis(self, kpis, utilizacion=None):
+        """
+        Franja con los indicadores de SistemaDAO.obtener_kpis_dashboard y, si
+        se dan, los de SistemaDAO.resumen_utilizacion
+        """
+        def indicador(icono, etiqueta, valor, alerta=False):
+            color = '#E74C3C' if alerta and valor else self.colores['text_primary']
+            return ft.Container(
+                content=ft.Row([
+                    ft.Icon(icono, size=18, color=color),
+                    ft.Text(str(valor), weight=ft.FontWeight.BOLD, size=14, color=color),
+                    ft.Text(etiqueta, size=12, color='grey'),
+                ], spacing=6),
+                padding=ft.padding.symmetric(horizontal=12, vertical=6),
+                border_radius=8,
+                bgcolor='white',
+            )
+        
+        return ft.Container(
+            content=ft.Row([
+                indicador(ft.Icons.PERSON, "docentes", kpis['docentes']),
+                indicador(ft.Icons.SCHOOL, "carreras", kpis['carreras']),
+                indicador(ft.Icons.MEETING_ROOM, "salas", kpis['salas']),
+                indicador(ft.Icons.BOOK, "módulos", kpis['modulos']),
+                indicador(ft.Icons.PERSON_OFF, "sin docente", kpis['modulos_sin_docente'], alerta=True),
+                indicador(ft.Icons.NO_MEETING_ROOM, "sin sala", kpis['modulos_sin_sala'], alerta=True),
+                indicador(ft.Icons.TRENDING_UP, "docentes sobrecargados", kpis['docentes_sobrecargados'], alerta=True),
+                indicador(ft.Icons.GROUPS, "salas al límite", kpis['salas_al_limite'], alerta=True),
+                indicador(ft.Icons.EVENT_BUSY, "módulos con conflicto", kpis['modulos_con_conflicto'], alerta=True),
+                *self._indicadores_utilizacion(indicador, utilizacion),
+            ], wrap=True, spacing=10),
+            padding=ft.padding.only(left=20, right=20, top=15),
+        )
     
+    def _indicadores_utilizacion(self, indicador, utilizacion):
+        if not utilizacion:
+            return []
+        salas = utilizacion['salas']
+        indicadores = [
+            indicador(ft.Icons.PIE_CHART, "uso de salas", f"{salas['uso_promedio']:.0f}%"),
+            indicador(ft.Icons.PIE_CHART_OUTLINE, "uso docente", f"{utilizacion['docentes']['uso_promedio']:.0f}%"),
+            indicador(ft.Icons.WEEKEND, "salas ociosas", salas['ociosas'], alerta=True),
+        ]
+        if salas['hora_punta']:
+            dia, bloque, ocupadas = salas['hora_punta']
+            indicadores.append(indicador(ft.Icons.SCHEDULE, f"salas en hora punta ({dia.capitalize()} {bloque})", ocupadas))
+        return indicadores
+
+    def exportar_pdf_utilizacion(self, e=None):
+        """Reporte PDF con heatmap y rankings de uso de salas y docentes"""
+        try:
+            cubos = self.dao.obtener_cubos_ocupacion()
+            filepath = self.report_generator.generar_reporte_utilizacion(cubos['sala'], cubos['docente'])
+            self.mostrar_mensaje(f"✅ Reporte generado: {filepath}", 'success')
+            import os
+            os.startfile(filepath)
+        except Exception as ex:
+            self.mostrar_mensaje(f"❌ Error al generar reporte: {ex}", 'error')
+            logging.error(f"Error generating utilization PDF: {ex}")
+
     def mostrar_gestion_datos(self, e=None):
         """Muestra la interfaz de gestión de datos (importar/exportar)"""
         self.ventana_activa = "gestion_datos"
@@ -941,9 +991,7 @@ class SistemaGestionFlet:
         """Muestra un modal con la grilla de disponibilidad de la sala"""
         logging.info(f"Abriendo horario para sala: {sala['nombre']}")
         try:
-            horarios_ocupados = self.dao.obtener_horarios_ocupados_sala(sala['id'])
-            if horarios_ocupados is None:
-                horarios_ocupados = []
+            ocupacion = self.dao.ocupacion_sala(sala['id'])
             
             # Definir bloques horarios estándar
             bloques = [
@@ -957,26 +1005,8 @@ class SistemaGestionFlet:
             # Helper para verificar ocupación
             def obtener_ocupacion(dia, inicio, fin):
                 """Verifica si un bloque está ocupado"""
-                def hora_a_minutos(h):
-                    """Convierte hora string o timedelta a minutos"""
-                    if isinstance(h, str):
-                        partes = h.split(':')
-                        return int(partes[0]) * 60 + int(partes[1])
-                    else:  # timedelta
-                        return int(h.total_seconds() // 60)
-                
-                inicio_min = hora_a_minutos(inicio)
-                fin_min = hora_a_minutos(fin)
-                
-                for h in horarios_ocupados:
-                    if h['dia'].upper() == dia.upper():
-                        h_inicio_min = hora_a_minutos(h['hora_inicio'])
-                        h_fin_min = hora_a_minutos(h['hora_fin'])
-                        
-                        # Verificar si hay solapamiento
-                        if (inicio_min < h_fin_min) and (fin_min > h_inicio_min):
-                            return h.get('modulo_nombre', 'Ocupado')
-                return None
+                h = ocupacion.ocupante_rango(dia, inicio, fin)
+                return h.get('modulo_nombre', 'Ocupado') if h else None
 
             # Crear cabecera de días
             headers = [ft.Container(width=80)] # Espacio para horas
@@ -1198,13 +1228,13 @@ class SistemaGestionFlet:
             self._actualizar_vista_carreras()
             return
 
-        # Realizar búsqueda
-        all_modulos = self.dao.obtener_modulos()
-        resultados = [
-            m for m in all_modulos 
-            if texto_busqueda in m['nombre'].lower() or 
-               texto_busqueda in m.get('codigo', '').lower()
-        ]
+        # Búsqueda en el índice (sin tildes, tolera errores de tipeo), por relevancia;
+        # con 1-2 letras, por subcadena en nombre o código
+        if len(normalizar(texto_busqueda)) < LARGO_MINIMO_INDICE:
+            pagina = self.dao.buscar_modulos_pagina(texto=texto_busqueda, limite=TAMANO_PAGINA)
+        else:
+            pagina = self.dao.buscar_indice_pagina(texto_busqueda, 'modulo', limite=TAMANO_PAGINA)
+        resultados = pagina['filas']
         
         self.carreras_list_view.controls.clear()
         
@@ -1223,11 +1253,7 @@ class SistemaGestionFlet:
             # Mostrar resultados como lista de tarjetas
             for mod in resultados:
                 # Obtener nombre de carrera
-                carrera_nombre = "Carrera Desconocida"
-                if mod.get('carrera_id'):
-                    carreras = self.dao.obtener_carreras()
-                    carrera = next((c for c in carreras if c['id'] == mod['carrera_id']), None)
-                    if carrera: carrera_nombre = carrera['nombre']
+                carrera_nombre = mod.get('carrera_nombre') or "Carrera Desconocida"
 
                 card = ft.Container(
                     content=ft.Row([
@@ -1251,6 +1277,12 @@ class SistemaGestionFlet:
                     shadow=ft.BoxShadow(blur_radius=5, color="#0D000000")
                 )
                 self.carreras_list_view.controls.append(card)
+            
+            if pagina['siguiente']:
+                self.carreras_list_view.controls.append(ft.Text(
+                    f"Mostrando {len(resultados)} de {pagina['total']} módulos. Refine la búsqueda para ver el resto.",
+                    size=12, color="grey"
+                ))
         
         self.carreras_list_view.update()
     
@@ -1486,24 +1518,13 @@ class SistemaGestionFlet:
         
         def exportar_pdf_carrera(e):
             try:
-                # Fetch all modules for this career with teacher and room names
-                modulos = self.dao.obtener_modulos_carrera(carrera['id'])
-                
-                # Enrich module data with teacher and room names
-                for m in modulos:
-                    if m.get('docente_id'):
-                        docentes = self.dao.obtener_docentes()
-                        docente = next((d for d in docentes if d['id'] == m['docente_id']), None)
-                        m['docente_nombre'] = docente['nombre'] if docente else 'Sin asignar'
-                    else:
-                        m['docente_nombre'] = 'Sin asignar'
-                    
-                    if m.get('sala_id'):
-                        salas = self.dao.obtener_salas()
-                        sala = next((s for s in salas if s['id'] == m['sala_id']), None)
-                        m['sala_nombre'] = sala['nombre'] if sala else 'Sin asignar'
-                    else:
-                        m['sala_nombre'] = 'Sin asignar'
+                # Módulos de la carrera con nombres de docente y sala (ya resueltos en la foto)
+                snapshot = self.dao.obtener_snapshot()
+                modulos = [
+                    dict(m, docente_nombre=m['docente_nombre'] or 'Sin asignar',
+                         sala_nombre=m['sala_nombre'] or 'Sin asignar')
+                    for m in snapshot.modulos_carrera(carrera['id'])
+                ]
                 
                 filepath = self.report_generator.generar_reporte_carrera(carrera, modulos)
                 
@@ -1575,28 +1596,44 @@ class SistemaGestionFlet:
         )
         self.page.update()
 
-    def _actualizar_vista_docentes(self, filtro=""):
-        """Recarga y muestra los docentes desde la base de datos."""
+    def _actualizar_vista_docentes(self, filtro="", despues=None):
+        """
+        Recarga y muestra los docentes desde la base de datos de a una página;
+        `despues` agrega la página siguiente. Con filtro se usa el índice de
+        búsqueda (resultados por relevancia), salvo filtros de 1-2 letras, que
+        se buscan por subcadena en el nombre.
+        """
         if not hasattr(self, 'docentes_list_view') or self.docentes_list_view is None:
             return
 
-        docentes_data = self.dao.obtener_docentes()
-        self.docentes_list_view.controls.clear()
-        
-        # Filtrar docentes por nombre
-        if filtro:
-            filtro_lower = filtro.lower()
-            docentes_data = [d for d in docentes_data if filtro_lower in d['nombre'].lower()]
-        
-        if not docentes_data:
+        filtro = (filtro or "").strip()
+        if filtro and len(normalizar(filtro)) < LARGO_MINIMO_INDICE:
+            pagina = self.dao.buscar_docentes_pagina(filtro=filtro, limite=TAMANO_PAGINA, despues=despues,
+                                                     con_total=despues is None)
+        elif filtro:
+            pagina = self.dao.buscar_indice_pagina(filtro, 'docente', limite=TAMANO_PAGINA, despues=despues)
+        else:
+            pagina = self.dao.buscar_docentes_pagina(limite=TAMANO_PAGINA, despues=despues, con_total=despues is None)
+        docentes_data = pagina['filas']
+        if despues is None:
+            self.docentes_list_view.controls.clear()
+            self._docentes_total = pagina['total']
+            self._docentes_mostrados = 0
+        elif self.docentes_list_view.controls:
+            # Quitar el botón "Cargar más" de la página anterior
+            self.docentes_list_view.controls.pop()
+        
+        if not docentes_data and despues is None:
             mensaje = "No se encontraron docentes." if filtro else "No hay docentes."
             self.docentes_list_view.controls.append(ft.Text(mensaje, text_align=ft.TextAlign.CENTER, color=self.colores['text_secondary']))
         else:
+            carga_docentes = self.dao.obtener_carga_docentes([d['id'] for d in docentes_data])
             for docente in docentes_data:
                 # Calcular horas asignadas y porcentaje
                 horas_contratadas = docente.get('horas_contratadas', 0)
-                horas_asignadas = self.dao.obtener_horas_asignadas_docente(docente['id'])
-                porcentaje = (horas_asignadas / horas_contratadas * 100) if horas_contratadas > 0 else 0
+                carga = carga_docentes.get(docente['id'], {})
+                horas_asignadas = carga.get('horas_asignadas', 0)
+                porcentaje = carga.get('porcentaje', 0)
                 
                 # Determinar color de la barra según porcentaje
                 if porcentaje >= 90:
@@ -1649,6 +1686,14 @@ class SistemaGestionFlet:
                     ink=True
                 )
                 self.docentes_list_view.controls.append(card)
+            
+            self._docentes_mostrados += len(docentes_data)
+            if pagina['siguiente']:
+                self.docentes_list_view.controls.append(ft.TextButton(
+                    f"Cargar más ({self._docentes_mostrados} de {self._docentes_total})",
+                    icon=ft.Icons.EXPAND_MORE,
+                    on_click=lambda e, sig=pagina['siguiente']: self._actualizar_vista_docentes(filtro, despues=sig)
+                ))
         
         self.page.update()
 
@@ -1768,8 +1813,7 @@ class SistemaGestionFlet:
                 return
 
             # Buscar la carrera
-            carreras = self.dao.obtener_carreras()
-            carrera = next((c for c in carreras if c['id'] == carrera_id), None)
+            carrera = self.dao.obtener_carrera_por_id(carrera_id)
             
             if not carrera:
                 self.mostrar_mensaje("❌ Error: No se encontró la carrera del módulo", 'error')
@@ -1811,6 +1855,7 @@ class SistemaGestionFlet:
         # --- 1. Header (Perfil y Progreso) ---
         horas_contratadas = docente.get('horas_contratadas', 0)
         modulos = self.dao.obtener_modulos_docente(docente['id'])
+        horarios_por_modulo = self.dao.obtener_horarios_modulos(docente_id=docente['id'])
         horas_asignadas = sum([m['horas_teoricas'] + m['horas_practicas'] for m in modulos]) if modulos else 0
         
         progreso = min(horas_asignadas / horas_contratadas, 1.0) if horas_contratadas > 0 else 0
@@ -1823,8 +1868,9 @@ class SistemaGestionFlet:
         def exportar_pdf(e):
             try:
                 modulos_full = self.dao.obtener_modulos_docente(docente['id'])
+                horarios_full = self.dao.obtener_horarios_modulos(docente_id=docente['id'])
                 for m in modulos_full:
-                    m['horarios'] = self.dao.obtener_horarios_modulo(m['id'])
+                    m['horarios'] = horarios_full.get(m['id'], [])
                 filepath = self.report_generator.generar_reporte_docente(docente, modulos_full)
                 self.mostrar_mensaje(f"✅ Reporte generado: {filepath}", 'success')
                 import os
@@ -1872,7 +1918,7 @@ class SistemaGestionFlet:
             lista_modulos.controls.append(ft.Text("Sin módulos asignados", color='grey'))
         else:
             for mod in modulos:
-                horarios = self.dao.obtener_horarios_modulo(mod['id'])
+                horarios = horarios_por_modulo.get(mod['id'])
                 horarios_texto = "Sin horario"
                 if horarios:
                     horarios_list = []
@@ -1931,25 +1977,12 @@ class SistemaGestionFlet:
             ("20:10", "20:45"), ("20:45", "21:20"), ("21:20", "21:55")
         ]
         
-        def hora_en_rango(hora_actual, hora_inicio, hora_fin):
-            try:
-                def h_to_m(h):
-                    parts = str(h).split(':')
-                    return int(parts[0]) * 60 + int(parts[1])
-                return h_to_m(hora_actual) >= h_to_m(hora_inicio) and h_to_m(hora_actual) < h_to_m(hora_fin)
-            except: return False
-
         modulos_con_horarios = []
         for mod in modulos:
-            horarios = self.dao.obtener_horarios_modulo(mod['id'])
+            horarios = horarios_por_modulo.get(mod['id'])
             if horarios:
                 for h in horarios:
-                    modulos_con_horarios.append({
-                        'modulo': mod,
-                        'dia': h['dia'],
-                        'hora_inicio': h['hora_inicio'],
-                        'hora_fin': h['hora_fin']
-                    })
+                    modulos_con_horarios.append({'modulo': mod, 'slot': h['slot']})
         
         disponibilidad = self.dao.obtener_disponibilidad_docente(docente['id'])
         
@@ -1960,8 +1993,9 @@ class SistemaGestionFlet:
         grid_rows = []
         for inicio, fin in bloques:
             row_cells = [ft.Container(content=ft.Text(inicio, size=10, weight=ft.FontWeight.BOLD), width=80, alignment=ft.Alignment(0, 0), bgcolor='#F8F9FA', border_radius=4, padding=5)]
+            inicio_min = a_minutos(inicio)
             for dia in dias:
-                modulos_en_bloque = [mh['modulo'] for mh in modulos_con_horarios if mh['dia'].upper() == dia and hora_en_rango(inicio, mh['hora_inicio'], mh['hora_fin'])]
+                modulos_en_bloque = [mh['modulo'] for mh in modulos_con_horarios if mh['slot'].dia == dia and mh['slot'].contiene(inicio_min)]
                 is_disponible = disponibilidad.get(dia, {}).get(inicio, True)
                 
                 if modulos_en_bloque:
@@ -2107,38 +2141,23 @@ class SistemaGestionFlet:
         
         # Load existing availability if editing
         disponibilidad_existente = {}
-        horarios_ocupados = []
         
         if docente:
             disp_data = self.dao.obtener_disponibilidad_docente(docente['id'])
             disponibilidad_existente = disp_data  # {dia: {hora: bool}}
             # --- Grilla Horaria ---
-            horarios_ocupados = self.dao.obtener_horarios_ocupados_docente(docente['id'])
+            ocupacion = self.dao.ocupacion_docente(docente['id'])
         else:
             # For new teachers, initialize empty availability
-            horarios_ocupados = []
-        logging.info(f"Grilla Docente: {len(horarios_ocupados)} bloques ocupados cargados desde BD")
+            ocupacion = Ocupacion()
+        logging.info(f"Grilla Docente: ocupación cargada para {len(ocupacion.mascaras)} días")
         
         dias = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES"]
-        # Helper to check if a slot is occupied
+        # Helper to check if a slot is occupied (bloque de 45 min de la grilla)
         def is_slot_occupied(dia, hora_bloque):
-            def h_to_m(h_str):
-                parts = str(h_str).split(':')
-                return int(parts[0]) * 60 + int(parts[1])
-            
-            bloque_min = h_to_m(hora_bloque)
-            # Assume block duration is 45 mins
-            bloque_fin_min = bloque_min + 45
-            
-            for ocupado in horarios_ocupados:
-                if ocupado['dia'].upper() == dia.upper():
-                    inicio = h_to_m(ocupado['hora_inicio'])
-                    fin = h_to_m(ocupado['hora_fin'])
-                    
-                    # Check overlap: (StartA <= EndB) and (EndA >= StartB)
-                    if (bloque_min < fin) and (bloque_fin_min > inicio):
-                        return True, ocupado['modulo_nombre']
-            return False, None
+            if ocupacion.esta_libre(dia, hora_bloque):
+                return False, None
+            return True, ocupacion.ocupantes(dia, hora_bloque)[0]['modulo_nombre']
 
         # Function to toggle entire column (day)
         def toggle_column(dia):
@@ -2317,27 +2336,29 @@ class SistemaGestionFlet:
                 )
                 docente_id = docente['id'] if docente else None
                 
-                logging.info(f"Llamando a dao.guardar_docente con id: {docente_id}")
-                # Save docente
-                saved_id = self.dao.guardar_docente(docente_data, docente_id)
-                logging.info(f"Docente guardado, ID: {saved_id}")
-                
-                # If new docente, use the returned ID
-                if not docente_id:
-                    docente_id = saved_id
-                
-                # Save availability
-                if docente_id:
-                    logging.info("Guardando disponibilidad...")
-                    # Convert container states to dictionary format
-                    disponibilidad_dict = {}
-                    for (dia, hora), cell in disponibilidad_checkboxes.items():
-                        if dia not in disponibilidad_dict:
-                            disponibilidad_dict[dia] = {}
-                        # Get the state from the container's data
-                        disponibilidad_dict[dia][hora] = cell.data['available']
+                # Convert container states to dictionary format
+                disponibilidad_dict = {}
+                for (dia, hora), cell in disponibilidad_checkboxes.items():
+                    if dia not in disponibilidad_dict:
+                        disponibilidad_dict[dia] = {}
+                    # Get the state from the container's data
+                    disponibilidad_dict[dia][hora] = cell.data['available']
+                
+                # Docente y disponibilidad en una sola transacción: o se guarda todo o nada
+                with self.dao.transaction():
+                    logging.info(f"Llamando a dao.guardar_docente con id: {docente_id}")
+                    saved_id = self.dao.guardar_docente(docente_data, docente_id)
+                    logging.info(f"Docente guardado, ID: {saved_id}")
+                    if not saved_id:
+                        raise RuntimeError("No se pudo guardar el docente")
+                    
+                    # If new docente, use the returned ID
+                    if not docente_id:
+                        docente_id = saved_id
                     
-                    self.dao.guardar_disponibilidad_docente(docente_id, disponibilidad_dict)
+                    logging.info("Guardando disponibilidad...")
+                    if not self.dao.guardar_disponibilidad_docente(docente_id, disponibilidad_dict):
+                        raise RuntimeError("No se pudo guardar la disponibilidad")
                     logging.info("Disponibilidad guardada.")
                 
                 self.mostrar_mensaje(f"✅ Docente '{nombre}' guardado exitosamente.", 'success')
@@ -2347,8 +2368,7 @@ class SistemaGestionFlet:
                 # Refresh detail view if we were editing (to show updated availability)
                 if docente:
                     # Fetch updated docente data
-                    docentes = self.dao.obtener_docentes()
-                    docente_actualizado = next((d for d in docentes if d['id'] == docente_id), None)
+                    docente_actualizado = self.dao.obtener_docente_por_id(docente_id)
                     if docente_actualizado:
                         self.mostrar_vista_detalle_docente(docente_actualizado)
 
@@ -2411,10 +2431,11 @@ class SistemaGestionFlet:
         logging.info("=== Diálogo de docente abierto ===")
     
     
-    def _crear_tarjeta_modulo(self, modulo, mostrar_editar=True, on_save=None):
+    def _crear_tarjeta_modulo(self, modulo, mostrar_editar=True, on_save=None, horarios=None):
         """Crea una tarjeta de módulo unificada con información de horarios"""
-        # Obtener horarios del módulo
-        horarios = self.dao.obtener_horarios_modulo(modulo['id'])
+        # Obtener horarios del módulo (si el llamador no los trajo en lote)
+        if horarios is None:
+            horarios = self.dao.obtener_horarios_modulo(modulo['id'])
         
         # Formatear horarios para mostrar
         horarios_texto = []
@@ -2444,32 +2465,11 @@ class SistemaGestionFlet:
         docente_id = modulo.get('docente_id')
         has_docente = docente_id is not None and docente_id > 0
         
-        # Check for schedule conflicts
+        # Check for schedule conflicts (registro incremental del DAO, O(1))
         has_conflicts = False
-        if has_docente and modulo.get('sala_id') and horarios:
+        if has_docente:
             try:
-                # Check teacher conflict
-                tiene_conflicto, _, _ = self.dao.validar_conflicto_horario_docente(
-                    docente_id, horarios, modulo['id']
-                )
-                if tiene_conflicto:
-                    has_conflicts = True
-                
-                # Check room conflict
-                if not has_conflicts:
-                    tiene_conflicto, _, _ = self.dao.validar_conflicto_sala(
-                        modulo['sala_id'], horarios, modulo['id']
-                    )
-                    if tiene_conflicto:
-                        has_conflicts = True
-                
-                # Check semester conflict
-                if not has_conflicts and modulo.get('carrera_id') and modulo.get('semestre'):
-                    tiene_conflicto, _, _ = self.dao.validar_conflicto_semestre_par_impar(
-                        modulo['carrera_id'], modulo['semestre'], horarios, modulo['id']
-                    )
-                    if tiene_conflicto:
-                        has_conflicts = True
+                has_conflicts = self.dao.tiene_conflictos(modulo['id'])
             except Exception as e:
                 logging.error(f"Error checking conflicts for module {modulo['id']}: {e}")
         
@@ -2581,8 +2581,10 @@ class SistemaGestionFlet:
             def refresh_callback(cid=carrera_id, sf=semestre_filtro, ft=filtro_texto):
                 self._actualizar_vista_modulos(cid, sf, ft)
 
+            horarios_por_modulo = self.dao.obtener_horarios_modulos([m['id'] for m in modulos])
             for modulo in modulos:
-                card = self._crear_tarjeta_modulo(modulo, mostrar_editar=True, on_save=refresh_callback)
+                card = self._crear_tarjeta_modulo(modulo, mostrar_editar=True, on_save=refresh_callback,
+                                                  horarios=horarios_por_modulo.get(modulo['id'], []))
                 # Wrap card in container with fixed width to simulate grid
                 cards_container.controls.append(ft.Container(content=card, width=300))
             
@@ -2811,107 +2813,14 @@ class SistemaGestionFlet:
                     # Si el campo está vacío pero estamos editando (raro, pero posible)
                     semestre_modulo = modulo.get('semestre')
 
-                # Fetch data con filtro de semestre
-                disponibilidad = self.dao.obtener_disponibilidad_docente(docente_id)
-                ocupados_docente = self.dao.obtener_horarios_ocupados_docente(docente_id, semestre_modulo) or []
-                ocupados_sala = []
-                if sala_id:
-                    ocupados_sala = self.dao.obtener_horarios_ocupados_sala(sala_id, semestre_modulo) or []
-                
-                # If editing, get current module schedules
-                mod_horarios = []
-                if modulo and str(modulo.get('docente_id')) == str(docente_id):
-                    mod_horarios = self.dao.obtener_horarios_modulo(modulo['id']) or []
-                    logging.info(f"Módulo {modulo.get('nombre')}: {len(mod_horarios)} horarios encontrados")
-                    for h in mod_horarios:
-                        logging.info(f"  - Horario: {h.get('dia')} {h.get('hora_inicio')}-{h.get('hora_fin')}")
-                
-                # DEBUG: Log room occupation data
-                logging.info(f"DEBUG actualizar_grilla: sala_id={sala_id}, ocupados_sala count={len(ocupados_sala) if ocupados_sala else 0}")
-                if sala_id and ocupados_sala:
-                    logging.info(f"DEBUG: Sala {sala_id} tiene {len(ocupados_sala)} horarios ocupados")
-                    for oc in ocupados_sala[:3]:  # Show first 3
-                        logging.info(f"  - {oc.get('dia')} {oc.get('hora_inicio')}-{oc.get('hora_fin')} por módulo ID {oc.get('modulo_id')} ({oc.get('modulo_nombre')})")
-                    if modulo:
-                        logging.info(f"DEBUG: Módulo actual ID: {modulo.get('id')}")
-                else:
-                    logging.info(f"DEBUG: NO room occupation data - sala_id={sala_id}, ocupados_sala={len(ocupados_sala) if ocupados_sala else 'None'}")
-
-
-                # Helper to check if slot is occupied by OTHER module
-                def get_slot_status(dia, hora_bloque):
-                    from datetime import timedelta
-                    def h_to_m(h_str):
-                        """Convierte hora string o timedelta a minutos"""
-                        if isinstance(h_str, timedelta):
-                            return int(h_str.total_seconds() / 60)
-                        h, m = map(int, h_str.split(':'))
-                        return h * 60 + m
-                    
-                    bloque_min = h_to_m(hora_bloque)
-                    bloque_fin_min = bloque_min + 45
-                    
-                    # 1. Check if this block belongs to THIS module
-                    is_this_module = False
-                    for h in mod_horarios:
-                        if h['dia'].upper() == dia.upper():
-                            h_inicio_min = h_to_m(h['hora_inicio'])
-                            h_fin_min = h_to_m(h['hora_fin'])
-                            if (bloque_min < h_fin_min) and (bloque_fin_min > h_inicio_min):
-                                is_this_module = True
-                                break
-                    
-                    # 2. Check if occupied by ANY OTHER module (Teacher)
-                    occupied_by_teacher = None
-                    for oc in ocupados_docente:
-                        if oc['dia'].upper() == dia.upper():
-                            inicio = h_to_m(oc['hora_inicio'])
-                            fin = h_to_m(oc['hora_fin'])
-                            if (bloque_min < fin) and (bloque_fin_min > inicio):
-                                # Skip if this is the current module
-                                if modulo and str(oc.get('modulo_id')) == str(modulo.get('id')):
-                                    continue
-                                occupied_by_teacher = oc
-                                break
-                    
-                    # 3. Check if occupied by ANY OTHER module (Room)
-                    occupied_by_room = None
-                    if sala_id:
-                        for oc in ocupados_sala:
-                            if oc['dia'].upper() == dia.upper():
-                                inicio = h_to_m(oc['hora_inicio'])
-                                fin = h_to_m(oc['hora_fin'])
-                                if (bloque_min < fin) and (bloque_fin_min > inicio):
-                                    # Skip if this is the current module
-                                    if modulo and str(oc.get('modulo_id')) == str(modulo.get('id')):
-                                        continue
-                                    occupied_by_room = oc
-                                    break
-
-                    # 4. Determine Status
-                    # If occupied by others, it's a conflict or locked
-                    if occupied_by_teacher:
-                        info = f"Docente ocupado en {occupied_by_teacher['modulo_nombre']}"
-                        if is_this_module:
-                            return "CONFLICT", info # It's mine but conflicts!
-                        return "LOCKED", info
-                    
-                    if occupied_by_room:
-                        info = f"Sala ocupada por {occupied_by_room['modulo_nombre']}"
-                        if is_this_module:
-                            return "CONFLICT", info # It's mine but conflicts!
-                        return "LOCKED", info
-
-                    # If no conflict, check if it's mine
-                    if is_this_module:
-                        return "SELECTED", None
-
-                    # Check availability preference
-                    is_teacher_available = disponibilidad.get(dia, {}).get(hora_bloque, True)
-                    if is_teacher_available:
-                        return "AVAILABLE", None
-                    else:
-                        return "UNAVAILABLE", None
+                # Estado de todas las celdas de una vez: horarios de OTROS módulos
+                # del docente/sala (mismo grupo par/impar) y los del módulo editado,
+                # que sólo se muestran si no cambió el docente
+                modulo_actual_id = modulo.get('id') if modulo else None
+                mismo_docente = modulo and str(modulo.get('docente_id')) == str(docente_id)
+                matriz = self.dao.matriz_bloques(
+                    docente_id, sala_id or None, semestre_modulo, modulo_actual_id,
+                    horarios_modulo=None if mismo_docente else [])
 
                 # Build Grid
                 dias = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES"]
@@ -2923,11 +2832,11 @@ class SistemaGestionFlet:
                 
                 rows = [ft.Row(headers)]
                 
-                for hora in self.bloques_horarios:
+                for i_hora, hora in enumerate(self.bloques_horarios):
                     row_cells = [ft.Container(width=80, content=ft.Text(hora, weight="bold"), bgcolor="#ECF0F1", padding=5, alignment=ft.Alignment(0, 0))]
                     
                     for dia in dias:
-                        status, info = get_slot_status(dia, hora)
+                        status, info = matriz[dia][i_hora]
                         
                         color = "#95A5A6" # Default Gray (Unavailable/Locked)
                         tooltip = "No disponible"
@@ -3206,77 +3115,17 @@ class SistemaGestionFlet:
                     )
                     
                     modulo_id = modulo['id'] if modulo else None
-                    docente_id = int(docente_dd.value) if docente_dd.value else None
-                    
-                    # Validar horas del docente
-                    if docente_id:
-                        docentes = self.dao.obtener_docentes()
-                        docente_actual = next((d for d in docentes if d['id'] == docente_id), None)
-                        
-                        if docente_actual:
-                            horas_contratadas = docente_actual['horas_contratadas']
-                            horas_asignadas = self.dao.obtener_horas_asignadas_docente(docente_id)
-                            
-                            # Si estamos editando, restar las horas del módulo actual (ACADEMIC)
-                            if modulo_id:
-                                horas_actuales_modulo = modulo.get('horas_teoricas', 0) + modulo.get('horas_practicas', 0)
-                                # Note: horas_asignadas from DAO might be mixed or just sum of modules. 
-                                # Let's recalculate from scratch to be safe and consistent with other checks
-                                modulos_docente = self.dao.obtener_modulos_docente(docente_id)
-                                horas_asignadas_academicas = sum([m['horas_teoricas'] + m['horas_practicas'] for m in modulos_docente if m['id'] != modulo_id])
-                            else:
-                                modulos_docente = self.dao.obtener_modulos_docente(docente_id)
-                                horas_asignadas_academicas = sum([m['horas_teoricas'] + m['horas_practicas'] for m in modulos_docente])
-                            
-                            # Calcular horas del nuevo módulo (ACADEMIC)
-                            horas_nuevo_modulo_academicas = int(horas_t_field.value) + int(horas_p_field.value)
-                            
-                            total_academicas = horas_asignadas_academicas + horas_nuevo_modulo_academicas
-                            total_cronologicas = total_academicas * 0.75
-                            
-                            if total_cronologicas > horas_contratadas:
-                                horas_disponibles_chrono = horas_contratadas - (horas_asignadas_academicas * 0.75)
-                                self.mostrar_mensaje(f"❌ Conflicto de horas: El docente solo tiene {horas_disponibles_chrono:.1f}h cronológicas disponibles.", 'error')
-                                return
-
-                    # Validar conflicto de semestre (Par vs Impar)
-                    logging.info("Validando conflictos de semestre (Par vs Impar)...")
-                    if carrera_dd.value and semestre_field.value and final_schedules:
-                        tiene_conflicto_semestre, msg_conflicto_semestre, mod_conflicto_semestre = self.dao.validar_conflicto_semestre_par_impar(
-                            int(carrera_dd.value),
-                            int(semestre_field.value),
-                            final_schedules,
-                            modulo_id
-                        )
-                        
-                        if tiene_conflicto_semestre:
-                            self.mostrar_mensaje(f"❌ {msg_conflicto_semestre}", 'error')
-                            logging.warning(f"Conflicto de semestre: {msg_conflicto_semestre}")
-                            return
-
-                    # Validar conflicto de horario del docente
-                    logging.info("Validando conflictos de horario del docente...")
-                    if docente_id and final_schedules:
-                        tiene_conflicto, mensaje, mod_conflicto = self.dao.validar_conflicto_horario_docente(
-                            docente_id, final_schedules, modulo_id
-                        )
-                        if tiene_conflicto:
-                            self.mostrar_mensaje(f"❌ {mensaje}", 'error')
-                            logging.warning(f"Conflicto de horario docente: {mensaje}")
-                            return
                     
-                    # Validar conflicto de sala
-                    logging.info("Validando conflictos de sala...")
-                    if sala_dd.value and final_schedules:
-                        tiene_conflicto, mensaje, mod_conflicto = self.dao.validar_conflicto_sala(
-                            int(sala_dd.value), final_schedules, modulo_id
-                        )
-                        if tiene_conflicto:
-                            self.mostrar_mensaje(f"❌ {mensaje}", 'error')
-                            logging.warning(f"Conflicto de sala: {mensaje}")
-                            return
+                    # Horas del docente y topes de semestre, docente y sala en
+                    # una sola consulta; se muestran todas las violaciones juntas
+                    logging.info("Validando horas y conflictos del módulo...")
+                    violaciones = self.dao.validar_modulo(modulo_data, final_schedules, modulo_id)
+                    if violaciones:
+                        for tipo, mensaje in violaciones:
+                            logging.warning(f"Conflicto de {tipo}: {mensaje}")
+                        self.mostrar_mensaje("\n".join(f"❌ {mensaje}" for _, mensaje in violaciones), 'error')
+                        return
 
-                    logging.info("Guardando módulo en base de datos...")
                     logging.info("Guardando módulo en base de datos...")
                     resultado = self.dao.guardar_modulo(modulo_data, final_schedules, modulo_id)
                     
@@ -3394,6 +3243,7 @@ class SistemaGestionFlet:
              self.horarios_list_view.controls.append(ft.Text("No hay datos para mostrar horarios.", text_align=ft.TextAlign.CENTER))
              return
 
+        horarios_por_modulo = self.dao.obtener_horarios_modulos()
         for carrera in carreras:
             modulos = self.dao.obtener_modulos_carrera(carrera['id'])
             if modulos:
@@ -3404,7 +3254,7 @@ class SistemaGestionFlet:
                 )
                 
                 for modulo in modulos:
-                    horarios = self.dao.obtener_horarios_modulo(modulo['id'])
+                    horarios = horarios_por_modulo.get(modulo['id'])
                     horarios_str = "Sin horario asignado"
                     if horarios:
                         horarios_str = "\n".join([f"• {h['dia']}: {h['hora_inicio']} - {h['hora_fin']}" for h in horarios])
@@ -3810,8 +3660,7 @@ class SistemaGestionFlet:
                     if link.startswith('docente://'):
                         docente_id = int(link.replace('docente://',''))
                         # Get teacher data
-                        docentes = self.dao.obtener_docentes()
-                        docente = next((d for d in docentes if d['id'] == docente_id), None)
+                        docente = self.dao.obtener_docente_por_id(docente_id)
                         if docente:
                             # Navigate to teacher detail view
                             self.mostrar_detalle_docente(docente)
@@ -3826,8 +3675,7 @@ class SistemaGestionFlet:
                     elif link.startswith('carrera://'):
                         carrera_id = int(link.replace('carrera://',''))
                         # Navigate to assignment view for that career
-                        carreras = self.dao.obtener_carreras()
-                        carrera = next((c for c in carreras if c['id'] == carrera_id), None)
+                        carrera = self.dao.obtener_carrera_por_id(carrera_id)
                         if carrera:
                             self.mostrar_vista_asignacion(carrera)
                             # Close chat panel
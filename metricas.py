@@ -0,0 +1,230 @@
+"""
+Métricas de consultas SQL: latencia, filas y llamador por huella de consulta,
+con registro de consultas lentas.
+"""
+
+import os
+import re
+import atexit
+import sys
+import time
+import logging
+import threading
+import traceback
+from collections import deque, Counter
+from functools import lru_cache
+
+_RE_CADENA = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PARAMETRO = re.compile(r"%s|%\(\w+\)s")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def huella_consulta(query):
+    """Normaliza una consulta: literales y parámetros a '?', listas colapsadas, espacios simples"""
+    huella = _RE_CADENA.sub('?', query)
+    huella = _RE_PARAMETRO.sub('?', huella)
+    huella = _RE_NUMERO.sub('?', huella)
+    huella = _RE_LISTA.sub('(?+)', huella)
+    return _RE_ESPACIOS.sub(' ', huella).strip()
+
+
+def _percentil(muestras_ordenadas, p):
+    if not muestras_ordenadas:
+        return 0.0
+    indice = min(len(muestras_ordenadas) - 1, int(round(p / 100 * (len(muestras_ordenadas) - 1))))
+    return muestras_ordenadas[indice]
+
+
+class _EstadisticaConsulta:
+    __slots__ = ('llamadas', 'total', 'maximo', 'filas', 'errores', 'muestras', 'llamadores')
+
+    def __init__(self, max_muestras):
+        self.llamadas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.filas = 0
+        self.errores = 0
+        self.muestras = deque(maxlen=max_muestras)
+        self.llamadores = Counter()
+
+
+class RegistroConsultas:
+    """
+    Registro en memoria de las consultas ejecutadas, agregado por huella.
+
+    Los percentiles se calculan sobre las últimas `max_muestras` ejecuciones
+    de cada huella; el máximo y los totales son exactos.
+    """
+
+    def __init__(self, umbral_lento_ms=500, max_muestras=1024, activo=True):
+        self.umbral_lento_ms = umbral_lento_ms
+        self.max_muestras = max_muestras
+        self.activo = activo
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._lentas = 0
+
+    def registrar(self, query, duracion, filas=None, params=None, llamador=None, error=False):
+        """Registra una ejecución (duración en segundos)"""
+        if not self.activo:
+            return
+        huella = huella_consulta(query)
+        with self._lock:
+            stat = self._stats.get(huella)
+            if stat is None:
+                stat = self._stats[huella] = _EstadisticaConsulta(self.max_muestras)
+            stat.llamadas += 1
+            stat.total += duracion
+            stat.maximo = max(stat.maximo, duracion)
+            stat.muestras.append(duracion)
+            if filas is not None and filas >= 0:
+                stat.filas += filas
+            if error:
+                stat.errores += 1
+            if llamador:
+                stat.llamadores[llamador] += 1
+
+        duracion_ms = duracion * 1000
+        if duracion_ms >= self.umbral_lento_ms:
+            with self._lock:
+                self._lentas += 1
+            pila = ''.join(traceback.format_stack(limit=12)[:-3])
+            logging.warning(
+                f"Consulta lenta ({duracion_ms:.0f} ms, {filas} filas) desde {llamador}: "
+                f"{huella}\nParámetros: {params!r}\nPila:\n{pila}"
+            )
+
+    def snapshot(self, top=10, orden='total_ms'):
+        """Retorna las `top` huellas con mayor `orden` (total_ms, p95_ms, max_ms, llamadas...)"""
+        with self._lock:
+            copia = [
+                (huella, stat.llamadas, stat.total, stat.maximo, stat.filas, stat.errores,
+                 sorted(stat.muestras), stat.llamadores.most_common(3))
+                for huella, stat in self._stats.items()
+            ]
+        filas = []
+        for huella, llamadas, total, maximo, n_filas, errores, muestras, llamadores in copia:
+            filas.append({
+                'huella': huella,
+                'llamadas': llamadas,
+                'total_ms': total * 1000,
+                'promedio_ms': total / llamadas * 1000,
+                'p50_ms': _percentil(muestras, 50) * 1000,
+                'p95_ms': _percentil(muestras, 95) * 1000,
+                'max_ms': maximo * 1000,
+                'filas': n_filas,
+                'errores': errores,
+                'llamadores': [nombre for nombre, _ in llamadores],
+            })
+        filas.sort(key=lambda f: f[orden], reverse=True)
+        return filas[:top] if top else filas
+
+    def resumen(self):
+        """Totales globales del registro"""
+        with self._lock:
+            return {
+                'huellas': len(self._stats),
+                'llamadas': sum(s.llamadas for s in self._stats.values()),
+                'total_ms': sum(s.total for s in self._stats.values()) * 1000,
+                'lentas': self._lentas,
+                'umbral_lento_ms': self.umbral_lento_ms,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._lentas = 0
+
+
+def formatear_snapshot(filas):
+    """Formatea un snapshot como tabla de texto para logs o consola"""
+    lineas = [f"{'llamadas':>8} {'total ms':>10} {'p50':>8} {'p95':>8} {'max':>8} {'filas':>8}  consulta"]
+    for f in filas:
+        consulta = f['huella'] if len(f['huella']) <= 100 else f['huella'][:97] + '...'
+        lineas.append(
+            f"{f['llamadas']:>8} {f['total_ms']:>10.1f} {f['p50_ms']:>8.1f} {f['p95_ms']:>8.1f} "
+            f"{f['max_ms']:>8.1f} {f['filas']:>8}  {consulta}"
+        )
+        if f['llamadores']:
+            lineas.append(f"{'':>47}  ← {', '.join(f['llamadores'])}")
+    return '\n'.join(lineas)
+
+
+def metodo_llamador(omitir_modulo, omitir_tipo):
+    """
+    Nombre 'Clase.metodo' del primer frame de la pila que no pertenece a
+    `omitir_tipo` dentro del módulo `omitir_modulo` (ni a este módulo).
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        modulo = frame.f_globals.get('__name__')
+        propio = frame.f_locals.get('self')
+        if modulo != __name__ and not (modulo == omitir_modulo and isinstance(propio, omitir_tipo)):
+            if propio is not None:
+                return f"{type(propio).__name__}.{frame.f_code.co_name}"
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return None
+
+
+class CursorInstrumentado:
+    """Envuelve un cursor de pymysql y registra cada execute/executemany"""
+
+    def __init__(self, cursor, registro, llamador=None):
+        self._cursor = cursor
+        self._registro = registro
+        self._llamador = llamador
+
+    def _medir(self, metodo, query, params):
+        inicio = time.perf_counter()
+        error = False
+        try:
+            return metodo(query, params)
+        except Exception:
+            error = True
+            raise
+        finally:
+            filas = self._cursor.rowcount
+            # Los cursores sin buffer no conocen el total al ejecutar
+            if not isinstance(filas, int) or filas < 0 or filas >= 2 ** 63:
+                filas = None
+            self._registro.registrar(query, time.perf_counter() - inicio, filas,
+                                     params, self._llamador, error)
+
+    def execute(self, query, params=None):
+        return self._medir(self._cursor.execute, query, params)
+
+    def executemany(self, query, params):
+        return self._medir(self._cursor.executemany, query, params)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+registro = RegistroConsultas(
+    umbral_lento_ms=float(os.getenv('DB_SLOW_QUERY_MS', 500)),
+    max_muestras=int(os.getenv('DB_STATS_SAMPLES', 1024)),
+    activo=os.getenv('DB_QUERY_STATS', '1') not in ('0', 'false', 'False', ''),
+)
+
+
+def _volcar_al_salir():
+    filas = registro.snapshot(top=int(os.getenv('DB_STATS_TOP', 15)))
+    if filas:
+        logging.info(f"Consultas más costosas del proceso:\n{formatear_snapshot(filas)}")
+
+
+if os.getenv('DB_STATS_AL_SALIR', '0') not in ('0', 'false', 'False', ''):
+    atexit.register(_volcar_al_salir)
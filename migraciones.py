@@ -0,0 +1,246 @@
+"""
+Migraciones versionadas del esquema.
+
+La tabla `schema_version` registra las migraciones aplicadas. Al iniciar,
+`migrar()` consulta la versión actual y sólo ejecuta DDL si hay migraciones
+pendientes. Cada migración es idempotente (verifica antes de crear), de modo
+que puede reaplicarse sin error sobre una base creada por versiones antiguas.
+"""
+
+import logging
+from database import TABLAS_VERSIONADAS
+
+TABLAS_BASE = [
+    """
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        email VARCHAR(255) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        nombre VARCHAR(255),
+        rol VARCHAR(50)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS salas (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        capacidad INT,
+        tipo VARCHAR(100)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS carreras (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        jornada VARCHAR(50),
+        alumnos_proyectados INT
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS docentes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        titulo VARCHAR(255),
+        contrato VARCHAR(50),
+        horas_contratadas INT,
+        email VARCHAR(255) UNIQUE,
+        evaluacion DECIMAL(3,2)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS modulos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        codigo VARCHAR(50),
+        horas_teoricas INT,
+        horas_practicas INT,
+        alumnos_proyectados INT,
+        semestre INT,
+        carrera_id INT,
+        docente_id INT,
+        sala_id INT,
+        FOREIGN KEY (carrera_id) REFERENCES carreras(id) ON DELETE SET NULL,
+        FOREIGN KEY (docente_id) REFERENCES docentes(id) ON DELETE SET NULL,
+        FOREIGN KEY (sala_id) REFERENCES salas(id) ON DELETE SET NULL
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS carrera_semestres (
+        carrera_id INT,
+        semestre INT,
+        PRIMARY KEY (carrera_id, semestre),
+        FOREIGN KEY (carrera_id) REFERENCES carreras(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS carrera_salas (
+        carrera_id INT,
+        sala_id INT,
+        PRIMARY KEY (carrera_id, sala_id),
+        FOREIGN KEY (carrera_id) REFERENCES carreras(id) ON DELETE CASCADE,
+        FOREIGN KEY (sala_id) REFERENCES salas(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS modulo_horarios (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        modulo_id INT,
+        dia VARCHAR(20),
+        hora_inicio VARCHAR(10),
+        hora_fin VARCHAR(10),
+        FOREIGN KEY (modulo_id) REFERENCES modulos(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS disponibilidad_docentes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        docente_id INT,
+        dia VARCHAR(20),
+        hora VARCHAR(10),
+        estado VARCHAR(20),
+        FOREIGN KEY (docente_id) REFERENCES docentes(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """
+]
+
+
+def _m001_esquema_base(db):
+    """Tablas base (esquema original)"""
+    for tabla_query in TABLAS_BASE:
+        db.execute_query(tabla_query)
+
+
+def _crear_indice(db, tabla, indice, columnas, unico=False):
+    if db.dialecto.existe_indice(tabla, indice):
+        return
+    tipo = "UNIQUE INDEX" if unico else "INDEX"
+    db.execute_query(f"CREATE {tipo} {indice} ON {tabla} ({columnas})")
+    logging.info(f"Índice {indice} creado en {tabla}({columnas})")
+
+
+def _m002_indices_consultas(db):
+    """Índices compuestos para horarios por módulo/día y módulos por carrera/semestre"""
+    _crear_indice(db, 'modulo_horarios', 'idx_modulo_horarios_modulo_dia', 'modulo_id, dia')
+    _crear_indice(db, 'modulos', 'idx_modulos_carrera_semestre', 'carrera_id, semestre')
+
+
+def _m003_paridad_semestre(db):
+    """Columna calculada semestre_paridad (semestre % 2) indexada junto a la carrera"""
+    if not db.dialecto.existe_columna('modulos', 'semestre_paridad'):
+        db.execute_query(db.dialecto.columna_calculada('modulos', 'semestre_paridad', 'INT', 'MOD(semestre, 2)'))
+    _crear_indice(db, 'modulos', 'idx_modulos_carrera_paridad', 'carrera_id, semestre_paridad')
+
+
+def _m004_disponibilidad_unica(db):
+    """Clave única (docente_id, dia, hora) en disponibilidad_docentes"""
+    if db.dialecto.existe_indice('disponibilidad_docentes', 'uq_disponibilidad_docente_dia_hora'):
+        return
+    # Eliminar duplicados conservando la fila más reciente. La tabla derivada
+    # evita el error 1093 de MySQL (subconsulta sobre la tabla que se modifica).
+    eliminadas = db.execute_query("""
+        DELETE FROM disponibilidad_docentes
+        WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT MAX(id) AS id FROM disponibilidad_docentes
+                GROUP BY docente_id, dia, hora
+            ) AS vigentes
+        )
+    """)
+    if eliminadas:
+        logging.info(f"Se eliminaron {eliminadas} filas duplicadas de disponibilidad_docentes")
+    _crear_indice(db, 'disponibilidad_docentes', 'uq_disponibilidad_docente_dia_hora',
+                  'docente_id, dia, hora', unico=True)
+
+
+def _agregar_columna_minutos(db, tabla, columna, origen):
+    if not db.dialecto.existe_columna(tabla, columna):
+        db.execute_query(db.dialecto.columna_calculada(tabla, columna, 'INT', db.dialecto.expr_minutos(origen)))
+
+
+def _m005_minutos_del_dia(db):
+    """Columnas enteras de minuto del día derivadas de las horas VARCHAR"""
+    # Calculadas: siempre coinciden con hora_inicio/hora_fin/hora sin cambiar
+    # a quienes escriben, y permiten predicados de solapamiento indexables.
+    _agregar_columna_minutos(db, 'modulo_horarios', 'minuto_inicio', 'hora_inicio')
+    _agregar_columna_minutos(db, 'modulo_horarios', 'minuto_fin', 'hora_fin')
+    _agregar_columna_minutos(db, 'disponibilidad_docentes', 'minuto', 'hora')
+    _crear_indice(db, 'modulo_horarios', 'idx_modulo_horarios_dia_minutos', 'dia, minuto_inicio, minuto_fin')
+
+
+def _m006_version_datos(db):
+    """Contador de versión por tabla, incrementado por cada escritura de SistemaDAO"""
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS version_datos (
+            tabla VARCHAR(64) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB;
+    """)
+    for tabla in TABLAS_VERSIONADAS:
+        db.execute_query("INSERT IGNORE INTO version_datos (tabla, version) VALUES (%s, 0)", (tabla,))
+
+
+def _m007_indices_busqueda(db):
+    """Índices (nombre, id) para la paginación keyset de buscar_docentes_pagina y buscar_modulos_pagina"""
+    _crear_indice(db, 'docentes', 'idx_docentes_nombre', 'nombre, id')
+    _crear_indice(db, 'modulos', 'idx_modulos_nombre', 'nombre, id')
+
+
+def _m008_indices_docente_sala(db):
+    """Índices modulos(docente_id) y modulos(sala_id): SQLite no indexa las claves foráneas"""
+    _crear_indice(db, 'modulos', 'idx_modulos_docente', 'docente_id')
+    _crear_indice(db, 'modulos', 'idx_modulos_sala', 'sala_id')
+
+
+# (versión, descripción, función). Sólo se agregan al final; nunca se reordenan.
+MIGRACIONES = [
+    (1, "Esquema base", _m001_esquema_base),
+    (2, "Índices modulo_horarios(modulo_id, dia) y modulos(carrera_id, semestre)", _m002_indices_consultas),
+    (3, "Columna calculada modulos.semestre_paridad con índice", _m003_paridad_semestre),
+    (4, "Clave única en disponibilidad_docentes(docente_id, dia, hora)", _m004_disponibilidad_unica),
+    (5, "Columnas de minuto del día en modulo_horarios y disponibilidad_docentes", _m005_minutos_del_dia),
+    (6, "Tabla version_datos con un contador por tabla", _m006_version_datos),
+    (7, "Índices docentes(nombre, id) y modulos(nombre, id)", _m007_indices_busqueda),
+    (8, "Índices modulos(docente_id) y modulos(sala_id)", _m008_indices_docente_sala),
+]
+
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+
+def version_actual(db):
+    """Versión del esquema aplicada, o None si la tabla schema_version no existe"""
+    if not db.dialecto.existe_tabla('schema_version'):
+        return None
+    filas = db.execute_query("SELECT MAX(version) AS version FROM schema_version", fetch=True)
+    return (filas[0]['version'] or 0) if filas else 0
+
+
+def migrar(db):
+    """Aplica en orden las migraciones pendientes. Retorna la versión final."""
+    actual = version_actual(db)
+    if actual is not None and actual >= VERSION_ESQUEMA:
+        logging.info(f"Esquema al día (versión {actual}); no se ejecuta DDL.")
+        return actual
+
+    if actual is None:
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                descripcion VARCHAR(255),
+                aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB;
+        """)
+        actual = 0
+
+    for version, descripcion, aplicar in MIGRACIONES:
+        if version <= actual:
+            continue
+        logging.info(f"Aplicando migración {version}: {descripcion}...")
+        aplicar(db)
+        db.execute_query(
+            "INSERT IGNORE INTO schema_version (version, descripcion) VALUES (%s, %s)",
+            (version, descripcion)
+        )
+        actual = version
+
+    logging.info(f"Esquema migrado a la versión {actual}.")
+    return actual
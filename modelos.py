@@ -0,0 +1,235 @@
+"""
+Tipos de valor compartidos por el DAO, la interfaz y los reportes.
+"""
+
+from collections.abc import Mapping, MutableMapping
+from datetime import timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+
+def a_minutos(valor):
+    """Convierte 'HH:MM[:SS]', timedelta (columnas TIME) o minutos a minuto del día"""
+    if valor is None:
+        return None
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, timedelta):
+        return int(valor.total_seconds() // 60)
+    partes = str(valor).strip().split(':')
+    return int(partes[0]) * 60 + int(partes[1])
+
+
+def formatear_hora(minutos):
+    """Minuto del día a 'HH:MM'"""
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+# Grilla semanal de la interfaz: bloques de 45 minutos (hora académica) que
+# empiezan cada 35, así que cada bloque se solapa con el siguiente.
+DIAS_SEMANA = ("LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES")
+BLOQUES_HORARIOS = (
+    "08:30", "09:05", "09:40", "10:15", "10:50", "11:25", "12:00", "12:35",
+    "13:10", "13:45", "14:20", "14:55", "15:30", "16:05", "16:40", "17:15",
+    "17:50", "18:25", "19:00", "19:35", "20:10", "20:45", "21:20", "21:55",
+)
+DURACION_BLOQUE = 45
+_INICIOS_BLOQUES = tuple(a_minutos(b) for b in BLOQUES_HORARIOS)
+_INDICE_BLOQUE = {b: i for i, b in enumerate(BLOQUES_HORARIOS)}
+
+
+@lru_cache(maxsize=4096)
+def mascara_rango(inicio, fin):
+    """Máscara de bits de los bloques de la grilla que se solapan con [inicio, fin) en minutos"""
+    mascara = 0
+    for i, bloque in enumerate(_INICIOS_BLOQUES):
+        if bloque < fin and inicio < bloque + DURACION_BLOQUE:
+            mascara |= 1 << i
+    return mascara
+
+
+def dentro_de_grilla(inicio, fin):
+    """True si [inicio, fin) cae entero en la grilla (donde la máscara es exacta para detectar solapes)"""
+    return _INICIOS_BLOQUES[0] <= inicio and fin <= _INICIOS_BLOQUES[-1] + DURACION_BLOQUE
+
+
+def indice_bloque(bloque):
+    """Posición en BLOQUES_HORARIOS de un bloque dado como 'HH:MM' o como índice"""
+    return bloque if isinstance(bloque, int) else _INDICE_BLOQUE[bloque]
+
+
+def bloques_de_mascara(mascara):
+    """Índices de los bloques marcados en `mascara`"""
+    return [i for i in range(len(BLOQUES_HORARIOS)) if mascara >> i & 1]
+
+
+class Slot(NamedTuple):
+    """Bloque horario normalizado: día en mayúsculas y minutos desde medianoche [inicio, fin)"""
+    dia: str
+    inicio: int
+    fin: int
+
+    @classmethod
+    def crear(cls, dia, inicio, fin):
+        return cls(str(dia).upper(), a_minutos(inicio), a_minutos(fin))
+
+    @classmethod
+    def desde_fila(cls, fila):
+        """Desde una fila de modulo_horarios (usa minuto_inicio/minuto_fin si vienen)"""
+        inicio = fila.get('minuto_inicio')
+        fin = fila.get('minuto_fin')
+        if inicio is None or fin is None:
+            inicio, fin = a_minutos(fila['hora_inicio']), a_minutos(fila['hora_fin'])
+        return cls(str(fila['dia']).upper(), int(inicio), int(fin))
+
+    @classmethod
+    def desde_horario(cls, horario):
+        """Desde un dict con dia/hora_inicio/hora_fin o una tupla (dia, inicio, fin)"""
+        if isinstance(horario, Slot):
+            return horario
+        if isinstance(horario, Mapping):
+            return cls.desde_fila(horario)
+        return cls.crear(horario[0], horario[1], horario[2])
+
+    @property
+    def hora_inicio(self):
+        return formatear_hora(self.inicio)
+
+    @property
+    def hora_fin(self):
+        return formatear_hora(self.fin)
+
+    @property
+    def duracion(self):
+        return self.fin - self.inicio
+
+    @property
+    def mascara(self):
+        """Bloques de la grilla (BLOQUES_HORARIOS) que toca, como máscara de bits"""
+        return mascara_rango(self.inicio, self.fin)
+
+    def se_solapa(self, otro):
+        return self.dia == otro.dia and self.inicio < otro.fin and otro.inicio < self.fin
+
+    def solapa_rango(self, dia, inicio, fin):
+        """Como se_solapa, con el otro bloque dado en minutos"""
+        return self.dia == dia and self.inicio < fin and inicio < self.fin
+
+    def contiene(self, minuto):
+        return self.inicio <= minuto < self.fin
+
+
+class Registro(MutableMapping):
+    """
+    Fila compacta con __slots__ que se usa como dict: fila['nombre'],
+    fila.get('sala_nombre'), 'id' in fila, dict(fila), fila['extra'] = ...
+    Las columnas conocidas van en slots; las demás (columnas nuevas o datos
+    que agregue quien la use) en un dict aparte que sólo se crea si hace falta.
+    Una columna que la consulta no trajo no está en la fila, como en un dict.
+    """
+
+    __slots__ = ('_extra',)
+    _CLAVES = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._CLAVES = frozenset(cls.__slots__)
+
+    def __init__(self, datos=(), **valores):
+        self._extra = None
+        self.update(datos, **valores)
+
+    @classmethod
+    def constructor(cls, columnas):
+        """Función fila_tupla -> registro para un resultado con esas columnas (en orden)"""
+        en_slots = [(i, getattr(cls, c).__set__) for i, c in enumerate(columnas) if c in cls._CLAVES]
+        extra = [(i, c) for i, c in enumerate(columnas) if c not in cls._CLAVES]
+        nuevo = object.__new__
+
+        def crear(fila):
+            registro = nuevo(cls)
+            for i, asignar in en_slots:
+                asignar(registro, fila[i])
+            registro._extra = {c: fila[i] for i, c in extra} if extra else None
+            return registro
+        return crear
+
+    @classmethod
+    def desde_tuplas(cls, descripcion, filas):
+        """Registros desde filas tupla y el cursor.description de la consulta"""
+        crear = cls.constructor([col[0] for col in descripcion])
+        return [crear(fila) for fila in filas]
+
+    def __getitem__(self, clave):
+        if clave in self._CLAVES:
+            try:
+                return getattr(self, clave)
+            except AttributeError:
+                raise KeyError(clave) from None
+        if self._extra is not None and clave in self._extra:
+            return self._extra[clave]
+        raise KeyError(clave)
+
+    def get(self, clave, defecto=None):
+        try:
+            return self[clave]
+        except KeyError:
+            return defecto
+
+    def __setitem__(self, clave, valor):
+        if clave in self._CLAVES:
+            setattr(self, clave, valor)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[clave] = valor
+
+    def __delitem__(self, clave):
+        if clave in self._CLAVES:
+            try:
+                delattr(self, clave)
+            except AttributeError:
+                raise KeyError(clave) from None
+        elif self._extra is not None and clave in self._extra:
+            del self._extra[clave]
+        else:
+            raise KeyError(clave)
+
+    def __iter__(self):
+        for clave in self.__slots__:
+            if hasattr(self, clave):
+                yield clave
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def copy(self):
+        return type(self)(self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class Sala(Registro):
+    __slots__ = ('id', 'nombre', 'capacidad', 'tipo')
+
+
+class Carrera(Registro):
+    __slots__ = ('id', 'nombre', 'jornada', 'alumnos_proyectados')
+
+
+class Docente(Registro):
+    __slots__ = ('id', 'nombre', 'titulo', 'contrato', 'horas_contratadas', 'email', 'evaluacion')
+
+
+class Modulo(Registro):
+    # Columnas de modulos, las de los JOIN habituales y los horarios que agrega la interfaz
+    __slots__ = ('id', 'nombre', 'codigo', 'horas_teoricas', 'horas_practicas', 'alumnos_proyectados',
+                 'semestre', 'carrera_id', 'docente_id', 'sala_id', 'semestre_paridad',
+                 'carrera_nombre', 'docente_nombre', 'sala_nombre', 'horarios')
+
+
+class Horario(Registro):
+    __slots__ = ('id', 'modulo_id', 'dia', 'hora_inicio', 'hora_fin', 'minuto_inicio', 'minuto_fin', 'slot')
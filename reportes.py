@@ -5,6 +5,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 import os
 from datetime import datetime
+from modelos import Slot, a_minutos, DIAS_SEMANA, BLOQUES_HORARIOS
 
 class ReportGenerator:
     def __init__(self, output_dir="reportes"):
@@ -132,28 +133,6 @@ class ReportGenerator:
             
             dias = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES"]
             
-            # Helper function to check if a time is within a range
-            def hora_en_rango(hora_actual, hora_inicio, hora_fin):
-                """Verifica si una hora está dentro de un rango"""
-                def hora_a_minutos(hora_str):
-                    # Handle both string and timedelta
-                    if hasattr(hora_str, 'total_seconds'):
-                        total_seconds = int(hora_str.total_seconds())
-                        return (total_seconds // 3600) * 60 + ((total_seconds % 3600) // 60)
-                    # Remove seconds if present
-                    hora_str = str(hora_str).split(':')[:2]
-                    hora_str = ':'.join(hora_str)
-                    partes = hora_str.split(':')
-                    return int(partes[0]) * 60 + int(partes[1])
-                
-                try:
-                    actual_min = hora_a_minutos(hora_actual)
-                    inicio_min = hora_a_minutos(hora_inicio)
-                    fin_min = hora_a_minutos(hora_fin)
-                    return actual_min >= inicio_min and actual_min < fin_min
-                except:
-                    return False
-            
             # Build grid data
             grid_data = []
             
@@ -164,6 +143,7 @@ class ReportGenerator:
             # For each time block
             for bloque in bloques_horarios:
                 row = [bloque]
+                bloque_min = a_minutos(bloque)
                 
                 for dia in dias:
                     cell_content = ""
@@ -171,7 +151,12 @@ class ReportGenerator:
                     for m in modulos:
                         schedules = m.get('horarios', [])
                         for h in schedules:
-                            if h['dia'].upper() == dia and hora_en_rango(bloque, h['hora_inicio'], h['hora_fin']):
+                            try:
+                                slot = h.get('slot') or Slot.desde_fila(h)
+                            except (ValueError, TypeError, IndexError):
+                                # Horario con hora nula o mal formada (datos antiguos): se omite
+                                continue
+                            if slot.dia == dia and slot.contiene(bloque_min):
                                 # Format cell content
                                 codigo = m.get('codigo', 'N/A')
                                 nombre = m.get('nombre', 'N/A')
@@ -346,3 +331,109 @@ class ReportGenerator:
         # Build PDF
         doc.build(elements)
         return filepath
+
+    def generar_reporte_utilizacion(self, cubo_salas, cubo_docentes):
+        """
+        Genera un reporte PDF de utilización del campus a partir de los cubos
+        de ocupación (analitica.CuboOcupacion) de salas y docentes.
+        """
+        filename = f"Reporte_Utilizacion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        filepath = os.path.join(self.output_dir, filename)
+        
+        doc = SimpleDocTemplate(filepath, pagesize=letter)
+        elements = []
+        styles = getSampleStyleSheet()
+        
+        # Title
+        title_style = ParagraphStyle(
+            'TitleCustom',
+            parent=styles['Title'],
+            fontSize=24,
+            spaceAfter=30
+        )
+        elements.append(Paragraph("Reporte de Utilización", title_style))
+        elements.append(Paragraph(f"Generado el: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
+        elements.append(Spacer(1, 20))
+        
+        # Summary
+        elements.append(Paragraph("Resumen", styles['Heading2']))
+        summary_data = []
+        for etiqueta, cubo in (("Salas", cubo_salas), ("Docentes", cubo_docentes)):
+            resumen = cubo.resumen()
+            punta = resumen['hora_punta']
+            summary_data += [
+                [f"{etiqueta} (uso promedio):", f"{resumen['uso_promedio']:.1f}%"],
+                [f"{etiqueta} (hora punta):", f"{punta[0]} {punta[1]} ({punta[2]})" if punta else "N/A"],
+                [f"{etiqueta} con uso <= 10%:", str(resumen['ociosas'])],
+            ]
+        summary_table = Table(summary_data, colWidths=[2.5*inch, 2.5*inch])
+        summary_table.setStyle(TableStyle([
+            ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'),
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('BACKGROUND', (0,0), (0,-1), colors.lightblue),
+            ('PADDING', (0,0), (-1,-1), 6),
+        ]))
+        elements.append(summary_table)
+        elements.append(Spacer(1, 20))
+        
+        # Heatmap: % of rooms in use per block and day
+        elements.append(Paragraph("Mapa de calor: % de salas ocupadas", styles['Heading2']))
+        mapa = cubo_salas.mapa_calor(porcentaje=True)
+        dias = DIAS_SEMANA
+        heat_data = [["Bloque"] + list(dias)]
+        heat_style = [
+            ('BACKGROUND', (0,0), (-1,0), colors.darkblue),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('FONTSIZE', (0,0), (-1,-1), 8),
+        ]
+        for b, bloque in enumerate(BLOQUES_HORARIOS):
+            heat_data.append([bloque] + [f"{mapa[d, b]:.0f}%" for d in range(len(dias))])
+            for d in range(len(dias)):
+                # Blanco (0%) a rojo (100%)
+                intensidad = 1 - min(float(mapa[d, b]), 100) / 100
+                heat_style.append(('BACKGROUND', (d + 1, b + 1), (d + 1, b + 1), colors.Color(1, intensidad, intensidad)))
+        heat_table = Table(heat_data, colWidths=[0.8*inch] + [1.1*inch] * len(dias))
+        heat_table.setStyle(TableStyle(heat_style))
+        elements.append(heat_table)
+        elements.append(PageBreak())
+        
+        # Rankings
+        for titulo, filas in (
+            ("Salas más utilizadas", cubo_salas.ranking(10)),
+            ("Salas ociosas (uso <= 10%)", cubo_salas.ociosas(10.0)),
+            ("Docentes con más bloques asignados", cubo_docentes.ranking(10)),
+        ):
+            elements.append(Paragraph(titulo, styles['Heading2']))
+            if not filas:
+                elements.append(Paragraph("Sin resultados.", styles['Normal']))
+                elements.append(Spacer(1, 15))
+                continue
+            es_sala = 'capacidad' in filas[0][0]
+            table_data = [["Nombre", "Capacidad" if es_sala else "Contrato", "Uso semanal"]]
+            for entidad, uso in filas:
+                table_data.append([
+                    entidad.get('nombre', 'N/A'),
+                    str(entidad.get('capacidad', 'N/A')) if es_sala else str(entidad.get('contrato') or 'N/A'),
+                    f"{uso:.1f}%",
+                ])
+            ranking_table = Table(table_data, colWidths=[3.5*inch, 1.3*inch, 1.3*inch])
+            ranking_table.setStyle(TableStyle([
+                ('BACKGROUND', (0,0), (-1,0), colors.darkblue),
+                ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+                ('BACKGROUND', (0,1), (-1,-1), colors.beige),
+                ('GRID', (0,0), (-1,-1), 1, colors.black),
+                ('FONTSIZE', (0,1), (-1,-1), 9),
+            ]))
+            elements.append(ranking_table)
+            elements.append(Spacer(1, 15))
+        
+        # Build PDF
+        doc.build(elements)
+        return filepath
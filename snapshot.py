@@ -0,0 +1,189 @@
+"""
+Foto en memoria del sistema académico (salas, carreras, docentes, módulos,
+horarios y disponibilidad) con índices por entidad.
+
+Se carga con un número fijo de consultas, dentro de una misma transacción de
+lectura, y luego es inmutable: las filas son mappings de sólo lectura y los
+índices tuplas, así que una misma foto puede compartirse entre hilos y vistas.
+Quien necesite modificar una fila debe copiarla (`dict(fila)`).
+"""
+
+import time
+import logging
+from types import MappingProxyType
+
+from modelos import Slot
+
+_VACIO = ()
+
+
+def _congelar(fila, **extra):
+    datos = dict(fila)
+    datos.update(extra)
+    return MappingProxyType(datos)
+
+
+def _indexar(filas, clave):
+    """{clave(fila): tupla de filas} conservando el orden de `filas`"""
+    indice = {}
+    for fila in filas:
+        valor = clave(fila)
+        if valor is not None:
+            indice.setdefault(valor, []).append(fila)
+    return MappingProxyType({k: tuple(v) for k, v in indice.items()})
+
+
+class SistemaSnapshot:
+    """Foto inmutable del sistema; crear con SistemaSnapshot.cargar(dao)"""
+
+    CONSULTAS = {
+        'salas': "SELECT * FROM salas ORDER BY nombre",
+        'carreras': "SELECT * FROM carreras ORDER BY nombre",
+        'docentes': "SELECT * FROM docentes ORDER BY nombre",
+        'modulos': """SELECT m.*, c.nombre as carrera_nombre, d.nombre as docente_nombre,
+                             s.nombre as sala_nombre
+                      FROM modulos m
+                      LEFT JOIN carreras c ON m.carrera_id = c.id
+                      LEFT JOIN docentes d ON m.docente_id = d.id
+                      LEFT JOIN salas s ON m.sala_id = s.id
+                      ORDER BY m.carrera_id, m.semestre, m.id""",
+        'horarios': "SELECT * FROM modulo_horarios ORDER BY modulo_id, id",
+        'disponibilidad': """SELECT docente_id, dia, hora, estado FROM disponibilidad_docentes
+                             ORDER BY docente_id, id""",
+        'carrera_semestres': "SELECT carrera_id, semestre FROM carrera_semestres ORDER BY carrera_id, semestre",
+        'carrera_salas': "SELECT carrera_id, sala_id FROM carrera_salas",
+    }
+
+    def __init__(self, filas, cargado_en=None, versiones=None):
+        """
+        `filas`: {nombre de consulta: lista de filas}, con las claves de CONSULTAS.
+        `versiones`: contadores de version_datos leídos junto con las filas.
+        """
+        asignar = lambda nombre, valor: object.__setattr__(self, nombre, valor)
+        asignar('cargado_en', cargado_en if cargado_en is not None else time.time())
+        asignar('versiones', MappingProxyType(dict(versiones)) if versiones is not None else None)
+
+        salas = tuple(map(_congelar, filas['salas']))
+        carreras = tuple(map(_congelar, filas['carreras']))
+        docentes = tuple(map(_congelar, filas['docentes']))
+        modulos = tuple(map(_congelar, filas['modulos']))
+        horarios = tuple(_congelar(h, slot=Slot.desde_fila(h)) for h in filas['horarios'])
+
+        asignar('salas', salas)
+        asignar('carreras', carreras)
+        asignar('docentes', docentes)
+        asignar('modulos', modulos)
+        asignar('horarios', horarios)
+
+        asignar('sala_por_id', MappingProxyType({s['id']: s for s in salas}))
+        asignar('carrera_por_id', MappingProxyType({c['id']: c for c in carreras}))
+        asignar('docente_por_id', MappingProxyType({d['id']: d for d in docentes}))
+        asignar('modulo_por_id', MappingProxyType({m['id']: m for m in modulos}))
+
+        asignar('modulos_por_docente', _indexar(modulos, lambda m: m.get('docente_id')))
+        asignar('modulos_por_sala', _indexar(modulos, lambda m: m.get('sala_id')))
+        asignar('modulos_por_carrera', _indexar(modulos, lambda m: m.get('carrera_id')))
+        asignar('modulos_por_semestre', _indexar(
+            modulos, lambda m: (m['carrera_id'], m['semestre']) if m.get('carrera_id') else None))
+        asignar('horarios_por_modulo', _indexar(horarios, lambda h: h['modulo_id']))
+        # Por día, ordenados por inicio (útil para barridos y búsquedas por rango)
+        por_dia = {}
+        for h in horarios:
+            por_dia.setdefault(h['slot'].dia, []).append(h)
+        asignar('horarios_por_dia', MappingProxyType({
+            dia: tuple(sorted(lista, key=lambda h: (h['slot'].inicio, h['slot'].fin)))
+            for dia, lista in por_dia.items()
+        }))
+
+        semestres = {}
+        for fila in filas['carrera_semestres']:
+            semestres.setdefault(fila['carrera_id'], []).append(fila['semestre'])
+        asignar('semestres_por_carrera', MappingProxyType({k: tuple(v) for k, v in semestres.items()}))
+        salas_carrera = {}
+        for fila in filas['carrera_salas']:
+            sala = self.sala_por_id.get(fila['sala_id'])
+            if sala is not None:
+                salas_carrera.setdefault(fila['carrera_id'], []).append(sala)
+        asignar('salas_por_carrera', MappingProxyType({
+            k: tuple(sorted(v, key=lambda s: s['nombre'])) for k, v in salas_carrera.items()
+        }))
+
+        disponibilidad = {}
+        for fila in filas['disponibilidad']:
+            por_dia = disponibilidad.setdefault(fila['docente_id'], {}).setdefault(fila['dia'], {})
+            por_dia[fila['hora']] = (fila['estado'] == 'disponible')
+        asignar('disponibilidad_por_docente', MappingProxyType({
+            docente_id: MappingProxyType({dia: MappingProxyType(horas) for dia, horas in dias.items()})
+            for docente_id, dias in disponibilidad.items()
+        }))
+
+        asignar('carga_por_docente', MappingProxyType(self._calcular_carga()))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("SistemaSnapshot es inmutable")
+
+    __delattr__ = __setattr__
+
+    @classmethod
+    def cargar(cls, dao):
+        """
+        Carga la foto con len(CONSULTAS) consultas, más la de versiones, en una
+        transacción de lectura
+        """
+        inicio = time.perf_counter()
+        with dao.transaction():
+            versiones = dao.versiones_datos()
+            filas = {
+                nombre: dao.db.execute_query(query, fetch=True) or []
+                for nombre, query in cls.CONSULTAS.items()
+            }
+        snapshot = cls(filas, versiones=versiones)
+        logging.info(
+            f"Snapshot cargado en {(time.perf_counter() - inicio) * 1000:.0f} ms: "
+            f"{len(snapshot.modulos)} módulos, {len(snapshot.horarios)} horarios, "
+            f"{len(snapshot.docentes)} docentes"
+        )
+        return snapshot
+
+    def _calcular_carga(self):
+        # Mismo formato que SistemaDAO.obtener_carga_docentes
+        carga = {}
+        for docente in self.docentes:
+            modulos = self.modulos_por_docente.get(docente['id'], _VACIO)
+            asignadas = sum((m['horas_teoricas'] or 0) + (m['horas_practicas'] or 0) for m in modulos)
+            contratadas = docente.get('horas_contratadas') or 0
+            carga[docente['id']] = MappingProxyType({
+                'horas_asignadas': asignadas,
+                # Hora académica = 45 minutos
+                'horas_cronologicas': asignadas * 0.75,
+                'horas_contratadas': contratadas,
+                'porcentaje': (asignadas / contratadas * 100) if contratadas > 0 else 0,
+                'modulos': len(modulos),
+            })
+        return carga
+
+    # --- Consultas sobre la foto ---
+
+    def modulos_docente(self, docente_id):
+        return self.modulos_por_docente.get(docente_id, _VACIO)
+
+    def modulos_sala(self, sala_id):
+        return self.modulos_por_sala.get(sala_id, _VACIO)
+
+    def modulos_carrera(self, carrera_id, semestre=None):
+        if semestre is None:
+            return self.modulos_por_carrera.get(carrera_id, _VACIO)
+        return self.modulos_por_semestre.get((carrera_id, semestre), _VACIO)
+
+    def horarios_modulo(self, modulo_id):
+        return self.horarios_por_modulo.get(modulo_id, _VACIO)
+
+    def horarios_dia(self, dia):
+        return self.horarios_por_dia.get(str(dia).upper(), _VACIO)
+
+    def disponibilidad_docente(self, docente_id):
+        """{dia: {hora: bool}}, como SistemaDAO.obtener_disponibilidad_docente"""
+        return self.disponibilidad_por_docente.get(docente_id, MappingProxyType({}))
+
+    def carga_docente(self, docente_id):
+        return self.carga_por_docente.get(docente_id)